@@ -4,6 +4,7 @@ import { useParams, useNavigate } from "react-router-dom";
 import axios from "axios";
 import ProcessedVideoViewer from "../components/ProcessedVideoViewer";
 import EditVideoModal from "../components/EditVideoModal";
+import websocketService from "../services/websocketService";
 
 // Helper functions defined outside component to avoid ESLint issues
 const formatVideoTime = (time) => {
@@ -92,6 +93,9 @@ function GroupVideos() {
   const [error, setError] = useState(null);
   const [isPolling, setIsPolling] = useState(false);
   const [pendingVideos, setPendingVideos] = useState([]);
+  const [notificationsLive, setNotificationsLive] = useState(false);
+  const [progressStreamLive, setProgressStreamLive] = useState(false);
+  const [videoProgress, setVideoProgress] = useState({});
 
   const fetchGroupData = useCallback(async () => {
     if (!locationId || !groupId) return;
@@ -203,9 +207,62 @@ function GroupVideos() {
     fetchGroupData();
   }, [fetchGroupData]);
 
+  // Refetch when the server reports a change to this group; polling is only the fallback
+  useEffect(() => {
+    if (!locationId || !groupId) return;
+
+    const socket = websocketService.connectToNotifications(
+      { group_ids: [groupId], location_ids: [locationId] },
+      (change) => {
+        console.log(`🔔 ${change.kind} for video ${change.video_id}`);
+        fetchGroupData();
+        checkForPendingVideos();
+        // Picks up videos that joined the group since the stream subscribed
+        websocketService.updateProgressStream('subscribe', { group_ids: [groupId] });
+      }
+    );
+    if (!socket) return;
+
+    socket.addEventListener('open', () => setNotificationsLive(true));
+    socket.addEventListener('close', () => setNotificationsLive(false));
+    return () => {
+      setNotificationsLive(false);
+      socket.close();
+    };
+  }, [locationId, groupId, fetchGroupData, checkForPendingVideos]);
+
+  // Progress of the group's processing videos over one socket
+  useEffect(() => {
+    if (!groupId) return;
+
+    const socket = websocketService.connectToProgressStream(
+      { group_ids: [groupId] },
+      (batch) => {
+        const completedIds = Object.keys(batch.completed || {});
+        setVideoProgress((previous) => {
+          const next = { ...previous, ...batch.updates };
+          completedIds.forEach((videoId) => delete next[videoId]);
+          return next;
+        });
+        if (completedIds.length > 0) {
+          fetchGroupData();
+          checkForPendingVideos();
+        }
+      }
+    );
+    if (!socket) return;
+
+    socket.addEventListener('open', () => setProgressStreamLive(true));
+    socket.addEventListener('close', () => setProgressStreamLive(false));
+    return () => {
+      setProgressStreamLive(false);
+      socket.close();
+    };
+  }, [groupId, fetchGroupData, checkForPendingVideos]);
+
   // ✅ ADD: Auto-refresh polling effect
   useEffect(() => {
-    if (!isPolling) return;
+    if (!isPolling || notificationsLive) return;
 
     const pollInterval = setInterval(() => {
       console.log("🔄 Auto-refreshing group videos...");
@@ -213,7 +270,7 @@ function GroupVideos() {
     }, 5000); // Refresh every 5 seconds
 
     return () => clearInterval(pollInterval);
-  }, [isPolling, fetchGroupData]);
+  }, [isPolling, notificationsLive, fetchGroupData]);
 
   // ✅ ADD: Enable polling when component mounts
   useEffect(() => {
@@ -221,12 +278,13 @@ function GroupVideos() {
     return () => setIsPolling(false);
   }, []);
 
-  // Check for pending videos on mount and periodically
+  // Check for pending videos on mount, and periodically while no socket reports on them
   useEffect(() => {
     checkForPendingVideos();
+    if (progressStreamLive || notificationsLive) return;
     const interval = setInterval(checkForPendingVideos, 10000); // Every 10 seconds
     return () => clearInterval(interval);
-  }, [checkForPendingVideos]);
+  }, [checkForPendingVideos, progressStreamLive, notificationsLive]);
 
   useEffect(() => {
     fetchGroupData();
@@ -503,6 +561,22 @@ function GroupVideos() {
                         {formatDuration(video.duration)}
                       </p>
 
+                      {videoProgress[video.id] && (
+                        <div style={{ margin: '0 0 8px 0' }}>
+                          <div style={{ height: '6px', backgroundColor: '#e5e7eb', borderRadius: '3px', overflow: 'hidden' }}>
+                            <div style={{
+                              width: `${videoProgress[video.id].progress}%`,
+                              height: '100%',
+                              backgroundColor: '#3b82f6',
+                              transition: 'width 0.3s ease'
+                            }}></div>
+                          </div>
+                          <span style={{ color: '#6b7280', fontSize: '12px' }}>
+                            {Math.round(videoProgress[video.id].progress)}% • {videoProgress[video.id].message}
+                          </span>
+                        </div>
+                      )}
+
                       {video.vehicle_count > 0 && (
                         <div style={{ display: 'flex', gap: '16px', alignItems: 'center', flexWrap: 'wrap' }}>
                           <span style={{
@@ -58,6 +58,91 @@
         this.socket = null;
       }
     }
+
+    // One socket for the progress of many videos, e.g. every processing video of a group.
+    // onBatch receives {updates: {videoId: {progress, message}}, completed: {videoId: message},
+    // live: {videoId: [live_stats]}} (live only while per-second counts are streaming).
+    // Returns the socket so callers can close it and watch onclose.
+    connectToProgressStream(subscription, onBatch) {
+      const wsUrl = `ws://127.0.0.1:8000/ws/progress-stream/`;
+      this.streamSubscription = subscription;
+
+      try {
+        const socket = new WebSocket(wsUrl);
+        this.streamSocket = socket;
+
+        socket.onopen = () => {
+          socket.send(JSON.stringify({ action: 'subscribe', ...this.streamSubscription }));
+        };
+
+        socket.onmessage = (event) => {
+          const data = JSON.parse(event.data);
+          if (data.type === 'progress_batch' && onBatch) {
+            onBatch(data);
+          }
+        };
+
+        socket.onclose = () => {
+          if (this.streamSocket === socket) {
+            this.streamSocket = null;
+          }
+        };
+
+        socket.onerror = (error) => {
+          console.error('Progress stream error:', error);
+        };
+
+        return socket;
+      } catch (error) {
+        console.error('Progress stream connection failed:', error);
+        return null;
+      }
+    }
+
+    // subscription: {video_ids, group_ids, location_ids}, any of them optional
+    updateProgressStream(action, subscription) {
+      if (this.streamSocket && this.streamSocket.readyState === WebSocket.OPEN) {
+        this.streamSocket.send(JSON.stringify({ action, ...subscription }));
+      }
+    }
+
+    disconnectProgressStream() {
+      if (this.streamSocket) {
+        this.streamSocket.close();
+        this.streamSocket = null;
+      }
+    }
+
+    // Data-change events for {location_ids, group_ids, all}; onChange receives
+    // {kind, video_id, group_id, previous_group_id, location_id, status}.
+    // Returns the socket so callers can close it and watch onclose.
+    connectToNotifications(subscription, onChange) {
+      const wsUrl = `ws://127.0.0.1:8000/ws/notifications/`;
+
+      try {
+        const socket = new WebSocket(wsUrl);
+
+        socket.onopen = () => {
+          socket.send(JSON.stringify({ action: 'subscribe', ...subscription }));
+        };
+
+        socket.onmessage = (event) => {
+          const data = JSON.parse(event.data);
+          if (data.type === 'data_changed' && onChange) {
+            onChange(data);
+          }
+        };
+
+        socket.onerror = (error) => {
+          console.error('Notification socket error:', error);
+        };
+
+        return socket;
+      } catch (error) {
+        console.error('Notification socket connection failed:', error);
+        return null;
+      }
+    }
   }
 
   export default new WebSocketService();
\ No newline at end of file
@@ -1,9 +1,21 @@
 """
 ASGI config for trapick project.
+
+HTTP goes to Django; WebSockets (progress and notifications) to the
+consumers in trapickapp/routing.py.
 """
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trapick.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+# Set up Django before the consumers import models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from trapickapp.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': URLRouter(websocket_urlpatterns),
+})
@@ -0,0 +1,14 @@
+"""
+Celery app for trapick project.
+
+Start a worker with:  celery -A trapick worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trapick.settings')
+
+app = Celery('trapick')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -19,7 +19,7 @@ RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
 if RENDER_EXTERNAL_HOSTNAME:
     ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
 
-# Application definition - REMOVE CHANNELS if not using WebSockets
+# Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -30,15 +30,19 @@ INSTALLED_APPS = [
     'trapickapp',
     'corsheaders',
     'rest_framework',
-    # 'channels',  # COMMENT OUT OR REMOVE if not using WebSockets
+    'channels',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # gzip/Brotli for JSON and text; skips video, binary downloads and Range responses
+    'trapickapp.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # 304s for unchanged analytics responses, keyed on DataVersion counters
+    'trapickapp.middleware.DataVersionETagMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -64,8 +68,8 @@ TEMPLATES = [
     },
 ]
 
-# COMMENT OUT ASGI if not using WebSockets
-# ASGI_APPLICATION = 'trapick.asgi.application'
+# ASGI entry point - used by daphne/uvicorn for the async streaming media views
+ASGI_APPLICATION = 'trapick.asgi.application'
 
 # Database
 DATABASES = {
@@ -104,6 +108,20 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Storage lifecycle: originals older than this move to the cold tier (daily, see
+# CELERY_BEAT_SCHEDULE); 0 turns the automatic move off
+MEDIA_ARCHIVE_AFTER_DAYS = int(os.environ.get('MEDIA_ARCHIVE_AFTER_DAYS', 30))
+MEDIA_COLD_STORAGE = {
+    'BACKEND': 'trapickapp.storage_tiers.LocalDirectoryColdStorage',
+    'OPTIONS': {
+        'location': os.environ.get('MEDIA_COLD_ROOT', os.path.join(BASE_DIR, 'media_cold')),
+        'compress': os.environ.get('MEDIA_COLD_COMPRESS', 'False').lower() == 'true',
+    },
+}
+
+# Bytes read per chunk when streaming media from the async video views
+MEDIA_STREAM_CHUNK_SIZE = int(os.environ.get('MEDIA_STREAM_CHUNK_SIZE', 256 * 1024))
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000", 
@@ -111,29 +129,133 @@ CORS_ALLOWED_ORIGINS = [
     "https://trapick.onrender.com",  # Add your actual domain
 ]
 
-# REMOVE Channels and Redis config if not needed
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
-#         'CONFIG': {
-#             "hosts": [os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0')],
-#         },
-#     },
-# }
-
-# REMOVE Redis cache if not needed
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
-#         'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
-#         'TIMEOUT': 3600,
-#     }
-# }
+# WebSocket progress and notifications. Several nodes or a separate Celery
+# worker need Redis; a single ASGI process running tasks on threads uses the
+# bounded in-process layer (see trapickapp/channel_layers.py)
+CHANNEL_REDIS_URL = os.environ.get('CHANNEL_REDIS_URL', os.environ.get('REDIS_URL', ''))
+CHANNEL_CAPACITY = int(os.environ.get('CHANNEL_CAPACITY', 200))
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [CHANNEL_REDIS_URL],
+                'capacity': CHANNEL_CAPACITY,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'trapickapp.channel_layers.BoundedInMemoryChannelLayer',
+            'CONFIG': {
+                'capacity': CHANNEL_CAPACITY,
+                # Seconds a producer waits for a full channel before it is dropped
+                'send_timeout': 1.0,
+                'group_send_timeout': 0.1,
+            },
+        },
+    }
+
+# Cache - Redis when configured, otherwise a per-process LocMemCache that
+# evicts least recently used entries beyond MAX_ENTRIES
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', os.environ.get('REDIS_URL', ''))
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'TIMEOUT': 3600,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'trapick',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 2000))},
+        }
+    }
+
+# Analytics results cached by data version (see trapickapp/result_cache.py)
+RESULT_CACHE_ALIAS = 'default'
+RESULT_CACHE_TIMEOUT = int(os.environ.get('RESULT_CACHE_TIMEOUT', 300))
+# Dashboard snapshots older than this are rebuilt in the background (see trapickapp/snapshots.py)
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get('SNAPSHOT_MAX_AGE_SECONDS', 60))
+
+# Video processing progress shared across processes (see trapickapp/progress.py)
+PROGRESS_REDIS_URL = os.environ.get('PROGRESS_REDIS_URL', os.environ.get('REDIS_URL', ''))
+PROGRESS_BACKEND = os.environ.get('PROGRESS_BACKEND', (
+    'trapickapp.progress.RedisProgressBackend' if PROGRESS_REDIS_URL
+    else 'trapickapp.progress.DatabaseProgressBackend'
+))
+PROGRESS_TTL_SECONDS = int(os.environ.get('PROGRESS_TTL_SECONDS', 600))
+# Progress is broadcast at most this often per video, and only on changes of at least PROGRESS_MIN_DELTA percent
+PROGRESS_MIN_INTERVAL_SECONDS = float(os.environ.get('PROGRESS_MIN_INTERVAL_SECONDS', 0.5))
+PROGRESS_MIN_DELTA = float(os.environ.get('PROGRESS_MIN_DELTA', 1.0))
+# ws/progress-stream/: batching window and videos one connection may watch
+PROGRESS_STREAM_BATCH_SECONDS = float(os.environ.get('PROGRESS_STREAM_BATCH_SECONDS', 0.25))
+PROGRESS_STREAM_MAX_SUBSCRIPTIONS = int(os.environ.get('PROGRESS_STREAM_MAX_SUBSCRIPTIONS', 500))
+# Outbound messages queued per WebSocket; progress beyond this is dropped oldest
+# first, and a client with this many undelivered completions is disconnected
+WS_SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', 100))
+WS_SEND_QUEUE_HARD_LIMIT = int(os.environ.get('WS_SEND_QUEUE_HARD_LIMIT', 400))
+# Live per-second counts are published this often while a video is processed
+LIVE_STATS_INTERVAL_SECONDS = float(os.environ.get('LIVE_STATS_INTERVAL_SECONDS', 1.0))
+
+# Detectors kept loaded per worker process (see trapickapp/detectors.py)
+DETECTOR_REGISTRY_SIZE = int(os.environ.get('DETECTOR_REGISTRY_SIZE', 4))
+DETECTOR_WARMUP = os.environ.get('DETECTOR_WARMUP', 'true').lower() == 'true'
+
+# Celery - without a broker tasks run on a background thread in the web process
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', os.environ.get('REDIS_URL', ''))
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_BEAT_SCHEDULE = {
+    # Runs whichever delta export jobs are due (see trapickapp/delta_exports.py)
+    'run-scheduled-exports': {
+        'task': 'trapickapp.tasks.run_scheduled_exports',
+        'schedule': 300.0,
+    },
+    # Aborts upload sessions idle for UPLOAD_SESSION_MAX_AGE_HOURS and deletes their partial files
+    'cleanup-stale-uploads': {
+        'task': 'trapickapp.tasks.cleanup_stale_uploads',
+        'schedule': 3600.0,
+    },
+}
+if MEDIA_ARCHIVE_AFTER_DAYS > 0:
+    # Moves originals older than MEDIA_ARCHIVE_AFTER_DAYS to the cold tier; 0 leaves it to archive_media
+    CELERY_BEAT_SCHEDULE['archive-old-originals'] = {
+        'task': 'trapickapp.tasks.archive_old_originals',
+        'schedule': 86400.0,
+    }
+
+# Longest time a DataVersion ETag stays valid when no signal reports a change
+ETAG_TIME_BUCKET_SECONDS = int(os.environ.get('ETAG_TIME_BUCKET_SECONDS', 300))
+
+# Rendered report charts, evicted least recently used first (see trapickapp/charts.py)
+CHART_CACHE_DIR = os.path.join(MEDIA_ROOT, 'cache', 'charts')
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Incremental exports; jobs are configured in the 'delta_exports' SystemConfig entry
+EXPORT_OUTBOX_DIR = os.environ.get('EXPORT_OUTBOX_DIR', os.path.join(BASE_DIR, 'exports', 'outbox'))
+# Rows newer than this are left for the next run so in-flight transactions are not skipped
+DELTA_EXPORT_LAG_SECONDS = int(os.environ.get('DELTA_EXPORT_LAG_SECONDS', 60))
+
+# Resumable chunked uploads
+UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, 'uploads', 'partial')
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # Suggested to clients
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 20 * 1024 * 1024 * 1024))
+UPLOAD_SESSION_MAX_AGE_HOURS = int(os.environ.get('UPLOAD_SESSION_MAX_AGE_HOURS', 72))
 
 # REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'trapickapp.renderers.ORJSONRenderer',
+        'trapickapp.renderers.MessagePackRenderer',
+    ],
     'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
 }
 
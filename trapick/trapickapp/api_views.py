@@ -15,7 +15,7 @@ from django.utils import timezone
 from django.utils.dateparse import parse_date
 from datetime import timedelta
 from .progress import ProgressTracker
-from .models import VideoFile, TrafficAnalysis, Location, ProcessingProfile, VehicleType, Detection, TrafficReport, FrameAnalysis, HourlyTrafficSummary, DailyTrafficSummary, TrafficPrediction, SystemConfig, LocationDateGroup
+from .models import VideoFile, TrafficAnalysis, Location, ProcessingProfile, VehicleType, Detection, TrafficReport, FrameAnalysis, HourlyTrafficSummary, DailyTrafficSummary, TrafficPrediction, SystemConfig, LocationDateGroup, UploadSession
 from django.db import models
 from django.db.models import Prefetch, Q, Sum
 import csv
@@ -232,52 +232,18 @@ class GroupAnalysisAPI(APIView):
 
 class AnalysisOverviewAPI(APIView):
     def get(self, request):
-        """Provide overview data for the Home page with REAL data"""
-        from .services import calculate_real_weekly_data, get_system_overview_stats, get_peak_hours_analysis
-        
+        """Provide overview data for the Home page, served from a stale-while-revalidate snapshot"""
+        from .snapshots import get_snapshot
+
         try:
-            # Get real data
-            weekly_data = calculate_real_weekly_data()
-            system_stats = get_system_overview_stats()
-            areas_data = get_peak_hours_analysis()
-            
-            # Ensure weekly_data is always a 7-element array
-            if not weekly_data or len(weekly_data) != 7:
-                weekly_data = [0, 0, 0, 0, 0, 0, 0]
-            
-            total_vehicles = sum(weekly_data)
-            
-            # Ensure we have valid peak hour data
-            peak_hour = '8:00 AM'
-            if system_stats.get('peak_hour'):
-                peak_hour = system_stats['peak_hour']
-            
-            # Ensure we have valid areas data
-            if not areas_data:
-                areas_data = [
-                    {
-                        'name': 'No data available',
-                        'morning_peak': 'N/A',
-                        'evening_peak': 'N/A', 
-                        'morning_volume': 0,
-                        'evening_volume': 0,
-                        'total_analysis_vehicles': 0
-                    }
-                ]
-            
-            response_data = {
-                'weekly_data': weekly_data,
-                'total_vehicles': total_vehicles,
-                'congested_roads': system_stats.get('congested_roads', 0),
-                'peak_hour': peak_hour,
-                'daily_average': total_vehicles // 7 if total_vehicles > 0 else 0,
-                'system_stats': system_stats,
-                'areas': areas_data
-            }
-            
-            print("📊 Sending overview data:", response_data)
-            return Response(response_data)
-            
+            snapshot = get_snapshot('overview')
+            response = Response(snapshot['data'])
+            response['X-Snapshot-Built-At'] = snapshot['built_at']
+            if snapshot['stale']:
+                # Being rebuilt in the background; keep it out of client caches meanwhile
+                response['Cache-Control'] = 'no-store'
+            return response
+
         except Exception as e:
             print(f"❌ Error in AnalysisOverviewAPI: {e}")
             import traceback
@@ -386,6 +352,16 @@ class DebugDataAPI(APIView):
         return Response(stats)
 
 
+class DebugMetricsAPI(APIView):
+    """
+    In-process metrics of the worker answering the request (cache hit rates etc.)
+    GET /api/debug/metrics/?prefix=result_cache.
+    """
+
+    def get(self, request):
+        from .metrics import snapshot
+        return Response(snapshot(request.query_params.get('prefix', '')))
+
 class AnalysisResultsAPI(APIView):
     def get(self, request, upload_id):
         try:
@@ -394,7 +370,8 @@ class AnalysisResultsAPI(APIView):
             if video_obj.processing_status != 'completed':
                 return Response({
                     'status': video_obj.processing_status,
-                    'message': 'Processing not completed yet'
+                    'message': 'Processing not completed yet',
+                    'progress': ProgressTracker(video_obj.id).get_progress()
                 })
             
             # Check if analysis exists
@@ -788,181 +765,299 @@ class ExportAnalysisCSVAPI(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+def _rendered_report_response(request, video_id, file_format):
+    """
+    Serve the cached PDF/Excel render of a video's analysis, rendering it on a miss.
+    With ?async=1 a miss is queued for the Celery worker (once, however often
+    the client polls) and answered with 202.
+    """
+    from .reports import REPORT_FORMATS, get_cached_report, queue_report_render, render_report
+
+    try:
+        video_obj = VideoFile.objects.get(id=video_id)
+
+        if not hasattr(video_obj, 'traffic_analysis'):
+            return Response({'error': 'No analysis data available'}, status=404)
+
+        analysis = video_obj.traffic_analysis
+        report = get_cached_report(analysis, file_format)
+        if report:
+            print(f"📄 Serving cached {file_format} report for {video_obj.filename}")
+        elif request.query_params.get('async') in ('1', 'true'):
+            queue_report_render(analysis, file_format)
+            return Response({
+                'status': 'rendering',
+                'message': 'Report is being generated. Request this URL again to download it.',
+                # Keeps ?async=1, so polling never falls back to an inline render
+                'download_url': request.build_absolute_uri(),
+            }, status=status.HTTP_202_ACCEPTED)
+        else:
+            report = render_report(analysis, file_format)
+
+        spec = REPORT_FORMATS[file_format]
+        return FileResponse(
+            report.artifact.open('rb'),
+            as_attachment=True,
+            filename=f'analysis_{video_obj.filename}_{report.generated_at.strftime("%Y%m%d_%H%M%S")}.{spec["extension"]}',
+            content_type=spec['content_type'],
+        )
+
+    except VideoFile.DoesNotExist:
+        return Response({'error': 'Video not found'}, status=404)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
 class ExportAnalysisPDFAPI(APIView):
     def get(self, request, video_id):
         """Export analysis data as PDF"""
+        return _rendered_report_response(request, video_id, 'pdf')
+
+class ExportAnalysisExcelAPI(APIView):
+    def get(self, request, video_id):
+        """Export analysis data as Excel"""
+        return _rendered_report_response(request, video_id, 'excel')
+        
+class ConsolidatedReportAPI(APIView):
+    """
+    Consolidated CSV/Excel/PDF report for a whole group or a location over a date range
+    GET /api/groups/{group_id}/report/{csv|excel|pdf}/
+    GET /api/locations/{location_id}/report/{csv|excel|pdf}/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
+    """
+    CONTENT_TYPES = {
+        'csv': ('text/csv', 'csv'),
+        'excel': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+        'pdf': ('application/pdf', 'pdf'),
+    }
+
+    def get(self, request, report_format, group_id=None, location_id=None):
+        import tempfile
+        from .exports import ExportScopeError, resolve_scope, streaming_response
+        from .reports import (
+            consolidated_summary, iter_consolidated_csv, render_consolidated_charts,
+            write_consolidated_excel, write_consolidated_pdf,
+        )
+
+        if report_format not in self.CONTENT_TYPES:
+            return Response({'error': f'Unknown report format "{report_format}"'}, status=status.HTTP_404_NOT_FOUND)
+
         try:
-            video_obj = VideoFile.objects.get(id=video_id)
-            
-            if not hasattr(video_obj, 'traffic_analysis'):
-                return Response({'error': 'No analysis data available'}, status=404)
-            
-            analysis = video_obj.traffic_analysis
-            
-            # Create PDF in memory
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            styles = getSampleStyleSheet()
-            
-            # Create custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                textColor=colors.HexColor('#1e40af')
+            start_date = request.query_params.get('start_date')
+            end_date = request.query_params.get('end_date')
+            video_filters, label = resolve_scope(
+                group_id=group_id, location_id=location_id, start_date=start_date, end_date=end_date
             )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=12,
-                spaceAfter=12,
-                textColor=colors.HexColor('#374151')
+            if group_id:
+                group = LocationDateGroup.objects.select_related('location').get(id=group_id)
+                title = f'{group.location.display_name} - {group.date.isoformat()}'
+            else:
+                location = Location.objects.get(id=location_id)
+                title = f'{location.display_name} ({start_date or "all dates"} to {end_date or "today"})'
+
+            summary = consolidated_summary(video_filters)
+            if not summary['totals']['video_count']:
+                return Response({'error': 'No analyses found for this scope'}, status=status.HTTP_404_NOT_FOUND)
+
+            content_type, extension = self.CONTENT_TYPES[report_format]
+            filename = f'report_{label}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+            print(f"📊 Building consolidated {report_format} report for {label}")
+
+            if report_format == 'csv':
+                return streaming_response(
+                    request, iter_consolidated_csv(title, summary, video_filters), content_type, filename
+                )
+
+            chart_images = render_consolidated_charts(summary)
+            # Written to a temp file and streamed from there, never held in memory whole
+            report_file = tempfile.TemporaryFile()
+            writer = write_consolidated_excel if report_format == 'excel' else write_consolidated_pdf
+            writer(report_file, title, summary, chart_images, video_filters)
+            report_file.seek(0)
+            return FileResponse(report_file, as_attachment=True, filename=filename, content_type=content_type)
+
+        except ExportScopeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"❌ Consolidated report failed: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class RawDataExportCSVAPI(APIView):
+    """
+    Stream raw Detection/FrameAnalysis rows or traffic rollups as CSV
+    GET /api/export/raw/{dataset}/csv/?video_id=...
+    GET /api/export/raw/{dataset}/csv/?group_id=...
+    GET /api/export/raw/{dataset}/csv/?location_id=...&start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
+    """
+
+    def get(self, request, dataset):
+        from .exports import DATASETS, ExportScopeError, resolve_scope, streaming_csv_response
+
+        if dataset not in DATASETS:
+            return Response(
+                {'error': f'Unknown dataset "{dataset}". Choose from: {", ".join(DATASETS)}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # Build PDF content
-            content = []
-            
-            # Title
-            content.append(Paragraph('Traffic Analysis Report', title_style))
-            content.append(Paragraph(f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', styles['Normal']))
-            content.append(Spacer(1, 20))
-            
-            # Video Information
-            content.append(Paragraph('Video Information', heading_style))
-            video_info = [
-                ['Filename:', video_obj.filename],
-                ['Upload Date:', video_obj.uploaded_at.strftime("%Y-%m-%d %H:%M:%S")],
-                ['Duration:', f"{video_obj.duration_seconds or 0} seconds"],
-                ['Processing Status:', video_obj.processing_status]
-            ]
-            video_table = Table(video_info, colWidths=[150, 300])
-            video_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            content.append(video_table)
-            content.append(Spacer(1, 20))
-            
-            # Analysis Summary
-            content.append(Paragraph('Analysis Summary', heading_style))
-            summary_data = [
-                ['Total Vehicles:', str(analysis.total_vehicles)],
-                ['Processing Time:', f"{analysis.processing_time_seconds} seconds"],
-                ['Congestion Level:', analysis.congestion_level],
-                ['Traffic Pattern:', analysis.traffic_pattern]
-            ]
-            summary_table = Table(summary_data, colWidths=[150, 300])
-            summary_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-            ]))
-            content.append(summary_table)
-            content.append(Spacer(1, 20))
-            
-            # Vehicle Breakdown
-            content.append(Paragraph('Vehicle Breakdown', heading_style))
-            vehicle_data = [
-                ['Vehicle Type', 'Count'],
-                ['Cars', str(analysis.car_count)],
-                ['Trucks', str(analysis.truck_count)],
-                ['Motorcycles', str(analysis.motorcycle_count)],
-                ['Buses', str(analysis.bus_count)],
-                ['Bicycles', str(analysis.bicycle_count)],
-                ['Other Vehicles', str(analysis.other_count)]
-            ]
-            vehicle_table = Table(vehicle_data, colWidths=[200, 100])
-            vehicle_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
-            ]))
-            content.append(vehicle_table)
-            
-            # Build PDF
-            doc.build(content)
-            
-            # Get PDF value from buffer
-            pdf = buffer.getvalue()
-            buffer.close()
-            
-            # Create HTTP response
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="analysis_{video_obj.filename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-            response.write(pdf)
-            
-            return response
-            
-        except VideoFile.DoesNotExist:
-            return Response({'error': 'Video not found'}, status=404)
+
+        try:
+            video_filters, label = resolve_scope(
+                video_id=request.query_params.get('video_id'),
+                group_id=request.query_params.get('group_id'),
+                location_id=request.query_params.get('location_id'),
+                start_date=request.query_params.get('start_date'),
+                end_date=request.query_params.get('end_date'),
+            )
+            response = streaming_csv_response(request, dataset, video_filters, label)
+        except ExportScopeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, ValidationError):
+            return Response({'error': 'Invalid id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        print(f"📤 Streaming {dataset} export for {label}")
+        return response
+
+class ColumnarExportAPI(APIView):
+    """
+    Download a dataset export as a single Parquet or Arrow IPC file
+    GET /api/export/raw/{dataset}/{parquet|arrow}/?video_id=... | group_id=... | location_id=...&start_date=...&end_date=...
+    """
+
+    def get(self, request, dataset, export_format):
+        import tempfile
+        from .columnar_exports import COLUMNAR_FORMATS, PYARROW_AVAILABLE, write_dataset
+        from .exports import DATASETS, ExportScopeError, resolve_scope
+
+        if export_format not in COLUMNAR_FORMATS:
+            return Response({'error': f'Unknown format "{export_format}"'}, status=status.HTTP_404_NOT_FOUND)
+        if dataset not in DATASETS:
+            return Response(
+                {'error': f'Unknown dataset "{dataset}". Choose from: {", ".join(DATASETS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not PYARROW_AVAILABLE:
+            return Response({'error': 'Columnar exports require pyarrow on the server'},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        try:
+            video_filters, label = resolve_scope(
+                video_id=request.query_params.get('video_id'),
+                group_id=request.query_params.get('group_id'),
+                location_id=request.query_params.get('location_id'),
+                start_date=request.query_params.get('start_date'),
+                end_date=request.query_params.get('end_date'),
+            )
+            # Spooled to disk so the response can be sent without holding it in memory
+            export_file = tempfile.TemporaryFile()
+            rows = write_dataset(dataset, video_filters, export_file, fmt=export_format)
+        except ExportScopeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, ValidationError):
+            return Response({'error': 'Invalid id'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            return Response({'error': str(e)}, status=500)
+            print(f"❌ {export_format} export of {dataset} failed: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        print(f"📦 {export_format} export of {dataset} for {label}: {rows} rows")
+        export_file.seek(0)
+        extension = COLUMNAR_FORMATS[export_format]['extension']
+        return FileResponse(
+            export_file,
+            as_attachment=True,
+            filename=f'{dataset}_{label}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}',
+            content_type=COLUMNAR_FORMATS[export_format]['content_type'],
+        )
+
+class ChartImageAPI(APIView):
+    """
+    Chart image of a video, group or location, served from the chart cache
+    GET /api/charts/{vehicle_breakdown|hourly_profile|congestion}/{png|svg}/?video_id=... | group_id=... | location_id=...&start_date=...&end_date=...
+    """
+
+    def get(self, request, chart, chart_format):
+        from .charts import CHART_FORMATS, CHARTS, get_chart
+        from .exports import ExportScopeError, resolve_scope
+        from .reports import consolidated_chart_data, consolidated_summary
+
+        if chart not in CHARTS:
+            return Response(
+                {'error': f'Unknown chart "{chart}". Choose from: {", ".join(CHARTS)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if chart_format not in CHART_FORMATS:
+            return Response({'error': f'Unknown chart format "{chart_format}"'}, status=status.HTTP_404_NOT_FOUND)
 
-class ExportAnalysisExcelAPI(APIView):
-    def get(self, request, video_id):
-        """Export analysis data as Excel"""
         try:
-            video_obj = VideoFile.objects.get(id=video_id)
-            
-            if not hasattr(video_obj, 'traffic_analysis'):
-                return Response({'error': 'No analysis data available'}, status=404)
-            
-            analysis = video_obj.traffic_analysis
-            
-            # Create Excel workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Traffic Analysis"
-            
-            # Add headers and data
-            ws.append(['Traffic Analysis Report', f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'])
-            ws.append(['Video File:', video_obj.filename])
-            ws.append([])
-            
-            # Summary section
-            ws.append(['SUMMARY'])
-            ws.append(['Total Vehicles:', analysis.total_vehicles])
-            ws.append(['Processing Time:', analysis.processing_time_seconds])
-            ws.append(['Congestion Level:', analysis.congestion_level])
-            ws.append([])
-            
-            # Vehicle breakdown
-            ws.append(['VEHICLE BREAKDOWN'])
-            ws.append(['Vehicle Type', 'Count'])
-            ws.append(['Cars', analysis.car_count])
-            ws.append(['Trucks', analysis.truck_count])
-            ws.append(['Motorcycles', analysis.motorcycle_count])
-            ws.append(['Buses', analysis.bus_count])
-            ws.append(['Bicycles', analysis.bicycle_count])
-            ws.append(['Others', analysis.other_count])
-            
-            # Save to BytesIO
-            buffer = BytesIO()
-            wb.save(buffer)
-            buffer.seek(0)
-            
-            # Create HTTP response
-            response = HttpResponse(
-                buffer.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            video_filters, _ = resolve_scope(
+                video_id=request.query_params.get('video_id'),
+                group_id=request.query_params.get('group_id'),
+                location_id=request.query_params.get('location_id'),
+                start_date=request.query_params.get('start_date'),
+                end_date=request.query_params.get('end_date'),
             )
-            response['Content-Disposition'] = f'attachment; filename="analysis_{video_obj.filename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-            
-            return response
-            
-        except VideoFile.DoesNotExist:
-            return Response({'error': 'Video not found'}, status=404)
+            summary = consolidated_summary(video_filters)
+            if not summary['totals']['video_count']:
+                return Response({'error': 'No analyses found for this scope'}, status=status.HTTP_404_NOT_FOUND)
+            image = get_chart(chart, consolidated_chart_data(summary)[chart], chart_format)
+        except ExportScopeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, ValidationError):
+            return Response({'error': 'Invalid id'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            return Response({'error': str(e)}, status=500)
-        
+            print(f"❌ Rendering {chart} chart failed: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return HttpResponse(image, content_type=CHART_FORMATS[chart_format])
+
+class ChartSeriesAPI(APIView):
+    """
+    Compact, server-downsampled time series for the frontend charts
+    GET /api/series/traffic/?video_id=... | group_id=... | location_id=...&start_date=...&end_date=...&width=800
+    GET /api/series/hourly/?location_id=...&start_date=...&end_date=...&width=800  (default: last 7 days)
+    GET /api/series/predictions/?location_id=...&start_date=...&end_date=...       (default: tomorrow)
+    """
+    SERIES = ('traffic', 'hourly', 'predictions')
+
+    def get(self, request, series):
+        from .exports import ExportScopeError, resolve_scope
+        from .series import clamp_width, hourly_series, prediction_series, traffic_series
+
+        if series not in self.SERIES:
+            return Response(
+                {'error': f'Unknown series "{series}". Choose from: {", ".join(self.SERIES)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        params = request.query_params
+        try:
+            width = clamp_width(params.get('width'))
+            if series == 'traffic':
+                video_filters, _ = resolve_scope(
+                    video_id=params.get('video_id'),
+                    group_id=params.get('group_id'),
+                    location_id=params.get('location_id'),
+                    start_date=params.get('start_date'),
+                    end_date=params.get('end_date'),
+                )
+                return Response(traffic_series(video_filters, width))
+
+            today = timezone.now().date()
+            default_start = today - timedelta(days=6) if series == 'hourly' else today + timedelta(days=1)
+            start_date = parse_date(params['start_date']) if params.get('start_date') else default_start
+            end_date = parse_date(params['end_date']) if params.get('end_date') else (
+                today if series == 'hourly' else start_date
+            )
+            if start_date is None or end_date is None:
+                return Response({'error': 'Invalid date. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            build = hourly_series if series == 'hourly' else prediction_series
+            return Response(build(start_date, end_date, params.get('location_id') or None, width))
+
+        except ExportScopeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, ValidationError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"❌ Building {series} series failed: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class GeneratePredictionsAPI(APIView):
     def post(self, request):
         try:
@@ -1941,6 +2036,12 @@ class VideoDeleteAPI(APIView):
                 os.remove(video.processed_video_path.path)
                 files_deleted.append('processed video') 
                 print(f"✓ Deleted processed video file")
+
+            if video.storage_tier == 'cold' or video.tier_changed_at:
+                from .storage_tiers import delete_cold_copy
+                delete_cold_copy(video)
+                files_deleted.append('archived original')
+                print(f"✓ Deleted archived original from cold storage")
             
             # Delete from database
             video.delete()
@@ -2046,4 +2147,142 @@ class SimpleGroupVideosAPI(APIView):
         except LocationDateGroup.DoesNotExist:
             return Response({'error': 'Group not found'}, status=404)
         except Exception as e:
-            return Response({'error': str(e)}, status=500)
\ No newline at end of file
+            return Response({'error': str(e)}, status=500)
+
+class UploadSessionListAPI(APIView):
+    """
+    Start a resumable chunked upload
+    POST /api/uploads/ {"filename": ..., "size": ..., "location_id": ..., "video_date": ...}
+    """
+
+    def post(self, request):
+        from .uploads import UploadError, create_upload_session
+
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        metadata = {
+            key: (value.isoformat() if hasattr(value, 'isoformat') else value)
+            for key, value in data.items()
+            if key not in ('filename', 'size')
+        }
+
+        try:
+            session = create_upload_session(data['filename'], data['size'], metadata, request.user)
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+
+        response = Response({
+            **UploadSessionSerializer(session).data,
+            'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+        }, status=status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(f'{request.path.rstrip("/")}/{session.id}/')
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.total_size)
+        return response
+
+
+class UploadSessionDetailAPI(APIView):
+    """
+    Query, continue or abort a resumable upload
+    HEAD/GET /api/uploads/{upload_id}/   -> current Upload-Offset
+    PATCH    /api/uploads/{upload_id}/   -> raw chunk body with Upload-Offset (+ Upload-Checksum)
+    DELETE   /api/uploads/{upload_id}/   -> abort and discard the partial file
+    """
+
+    def get_object(self, upload_id):
+        try:
+            return UploadSession.objects.get(id=upload_id)
+        except UploadSession.DoesNotExist:
+            return None
+
+    def _session_response(self, session, extra=None, status_code=status.HTTP_200_OK):
+        data = UploadSessionSerializer(session).data
+        if extra:
+            data.update(extra)
+        response = Response(data, status=status_code)
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.total_size)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def get(self, request, upload_id):
+        session = self.get_object(upload_id)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self._session_response(session)
+
+    def patch(self, request, upload_id):
+        from .uploads import UploadError, finalize_upload, parse_checksum_header, write_chunk
+
+        session = self.get_object(upload_id)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if session.status == 'completed':
+            # Retry after the final response was lost
+            return self._session_response(session, {
+                'video_id': str(session.video_file_id) if session.video_file_id else None,
+            })
+        if session.status != 'active':
+            # Aborted or expired: the client has to start a new session
+            return self._session_response(
+                session, {'error': f'Upload session is {session.status}. Start a new upload.'},
+                status_code=status.HTTP_410_GONE
+            )
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_length = request.META.get('CONTENT_LENGTH')
+        content_length = int(content_length) if content_length else None
+
+        try:
+            checksum = parse_checksum_header(request.headers.get('Upload-Checksum'))
+            if content_length:
+                # Read the raw body directly; request.data would buffer the whole chunk
+                write_chunk(session, request.stream, offset, content_length, checksum)
+
+            if session.is_complete:
+                video_obj, duplicate = finalize_upload(session)
+                if duplicate:
+                    analysis = TrafficAnalysis.objects.filter(video_file=video_obj).first()
+                    if analysis and video_obj.processing_status == 'completed':
+                        message = 'Identical video already uploaded, linked to the existing analysis'
+                    elif video_obj.processing_status == 'processing':
+                        message = 'Identical video already uploaded and being processed'
+                    else:
+                        message = 'Identical video already uploaded, its processing was queued again'
+                    return self._session_response(session, {
+                        'message': message,
+                        'video_id': str(video_obj.id),
+                        'duplicate': True,
+                        'analysis_id': str(analysis.id) if analysis else None,
+                    })
+                return self._session_response(session, {
+                    'message': 'Upload complete, processing queued',
+                    'video_id': str(video_obj.id),
+                    'duplicate': False,
+                })
+        except UploadError as e:
+            print(f"❌ [UploadSessionDetailAPI] Chunk rejected for {upload_id}: {e.message}")
+            session.refresh_from_db()
+            return self._session_response(session, {'error': e.message}, status_code=e.status_code)
+
+        return self._session_response(session, status_code=status.HTTP_200_OK)
+
+    def delete(self, request, upload_id):
+        from .uploads import abort_upload
+
+        session = self.get_object(upload_id)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+        if session.status == 'completed':
+            return Response({'error': 'Upload already completed'}, status=status.HTTP_409_CONFLICT)
+
+        abort_upload(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,59 @@
+# trapickapp/async_views.py
+"""
+Async media endpoints for ASGI deployments.
+
+These are plain Django async views (DRF's APIView is sync-only) so that
+streaming a video to a slow client does not tie up a worker thread for the
+whole transfer. Under WSGI they still work: Django runs them through
+async_to_sync and the file is streamed from a sync generator instead (see
+build_streaming_file_response).
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from .media_streaming import build_streaming_file_response, find_processed_video_path
+from .models import VideoFile
+
+
+async def _stream_processed_video(request, video_id, disposition):
+    # require_GET only learns about async views in Django 5.0
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    try:
+        video_obj = await VideoFile.objects.aget(id=video_id)
+    except VideoFile.DoesNotExist:
+        return JsonResponse({'error': 'Video not found'}, status=404)
+
+    if disposition == 'inline' and video_obj.processing_status != 'completed':
+        return JsonResponse({'error': 'Video processing not completed yet'}, status=400)
+
+    file_path = await sync_to_async(find_processed_video_path, thread_sensitive=False)(video_obj)
+    if not file_path:
+        return JsonResponse(
+            {'error': 'Processed video not found. The video may still be processing or encountered an error.'},
+            status=404
+        )
+
+    return build_streaming_file_response(
+        request,
+        file_path,
+        video_obj.filename,
+        disposition=disposition,
+    )
+
+
+async def stream_processed_video(request, video_id):
+    """
+    Stream processed video for inline viewing
+    Frontend calls: GET /api/video/{video_id}/stream/
+    """
+    return await _stream_processed_video(request, video_id, 'inline')
+
+
+async def stream_processed_video_download(request, video_id):
+    """
+    Stream processed video as an attachment
+    Frontend calls: GET /api/video/{video_id}/stream/download/
+    """
+    return await _stream_processed_video(request, video_id, 'attachment')
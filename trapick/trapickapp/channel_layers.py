@@ -0,0 +1,239 @@
+# trapickapp/channel_layers.py
+"""
+Channel layer for single-node deployments without Redis.
+
+BoundedInMemoryChannelLayer keeps every channel's messages in the memory of
+the server process, like channels' InMemoryChannelLayer, with two
+differences that matter here:
+
+- It is safe to use from several threads and event loops. Progress and
+  notifications are sent with ``async_to_sync`` from Celery-less task
+  threads, i.e. from other event loops than the one the consumers wait on;
+  receivers are woken with ``call_soon_threadsafe``.
+- Queues are bounded (``capacity`` per channel) with backpressure: a full
+  channel makes ``send`` wait up to ``send_timeout`` seconds for the consumer
+  to catch up before raising ChannelFull, and ``group_send`` waits up to
+  ``group_send_timeout`` per member before dropping the message for that
+  member only. Drops and waits are counted in metrics.py.
+
+Messages still only reach consumers of the same process, so this fits a
+single ASGI server process running the tasks on threads (no CELERY_BROKER_URL).
+Anything with several processes needs channels_redis; see CHANNEL_LAYERS in
+settings.py.
+"""
+import asyncio
+import random
+import string
+import threading
+import time
+from collections import deque
+from copy import deepcopy
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+from . import metrics
+
+
+class _Waiters:
+    """Coroutines waiting for a change, possibly on different event loops"""
+
+    def __init__(self):
+        self._events = []
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self):
+        event = asyncio.Event()
+        self._events.append((asyncio.get_running_loop(), event))
+        return event
+
+    def discard(self, event):
+        self._events = [(loop, waiting) for loop, waiting in self._events if waiting is not event]
+
+    def notify_all(self):
+        events, self._events = self._events, []
+        for loop, event in events:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop has been closed
+                pass
+
+
+class _Channel:
+    __slots__ = ('messages', 'readers', 'writers')
+
+    def __init__(self):
+        # (expires_at, message)
+        self.messages = deque()
+        self.readers = _Waiters()
+        self.writers = _Waiters()
+
+
+class BoundedInMemoryChannelLayer(BaseChannelLayer):
+    """In-process, thread-safe channel layer with bounded queues and backpressure"""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 send_timeout=1.0, group_send_timeout=0.1, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.group_expiry = group_expiry
+        self.send_timeout = send_timeout
+        self.group_send_timeout = group_send_timeout
+        self.channels = {}
+        self.groups = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+
+    def _channel(self, name):
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = _Channel()
+        return channel
+
+    def _drop_expired(self, name, channel, now):
+        """Remove expired messages; a channel that let them expire leaves its groups"""
+        expired = False
+        while channel.messages and channel.messages[0][0] < now:
+            channel.messages.popleft()
+            expired = True
+        if expired:
+            metrics.incr('channel_layer.expired')
+            for members in self.groups.values():
+                members.pop(name, None)
+            channel.writers.notify_all()
+
+    def _sweep(self):
+        """Forget channels nobody reads anymore, once a minute; caller holds the lock"""
+        if time.monotonic() - self._swept_at < 60:
+            return
+        self._swept_at = time.monotonic()
+        now = time.time()
+        for name, channel in list(self.channels.items()):
+            self._drop_expired(name, channel, now)
+            if not channel.messages and not channel.readers and not channel.writers:
+                del self.channels[name]
+        metrics.set_gauge('channel_layer.channels', len(self.channels))
+
+    def _try_put(self, name, message):
+        """Queue a message unless the channel is full; caller holds the lock"""
+        self._sweep()
+        channel = self._channel(name)
+        self._drop_expired(name, channel, time.time())
+        if len(channel.messages) >= self.get_capacity(name):
+            return channel
+        channel.messages.append((time.time() + self.expiry, message))
+        channel.readers.notify_all()
+        return None
+
+    async def _put(self, name, message, timeout):
+        """Queue a message, waiting up to ``timeout`` seconds for room"""
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                full = self._try_put(name, message)
+                if full is None:
+                    if waited:
+                        metrics.incr('channel_layer.backpressure_waits')
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.incr('channel_layer.full')
+                    raise ChannelFull(name)
+                room = full.writers.add()
+            waited = True
+            try:
+                await asyncio.wait_for(room.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    full.writers.discard(room)
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        await self._put(channel, deepcopy(message), self.send_timeout)
+        metrics.incr('channel_layer.sent')
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        while True:
+            with self._lock:
+                queue = self._channel(channel)
+                self._drop_expired(channel, queue, time.time())
+                if queue.messages:
+                    _, message = queue.messages.popleft()
+                    queue.writers.notify_all()
+                    if not queue.messages and not queue.readers and not queue.writers:
+                        self.channels.pop(channel, None)
+                    return message
+                arrived = queue.readers.add()
+            try:
+                await arrived.wait()
+            finally:
+                with self._lock:
+                    queue.readers.discard(arrived)
+
+    async def new_channel(self, prefix='specific.'):
+        return '%s.inmemory!%s' % (prefix, ''.join(random.choice(string.ascii_letters) for _ in range(12)))
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        with self._lock:
+            self.groups.setdefault(group, {})[channel] = time.time()
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        with self._lock:
+            members = self.groups.get(group)
+            if members:
+                members.pop(channel, None)
+                if not members:
+                    self.groups.pop(group, None)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        with self._lock:
+            members = self.groups.get(group, {})
+            joined_after = time.time() - self.group_expiry
+            for channel in [channel for channel, joined in members.items() if joined < joined_after]:
+                members.pop(channel, None)
+            channels = list(members)
+            blocked = [channel for channel in channels if self._try_put(channel, deepcopy(message))]
+        metrics.incr('channel_layer.sent', len(channels) - len(blocked))
+
+        if blocked:
+            results = await asyncio.gather(
+                *(self._put(channel, deepcopy(message), self.group_send_timeout) for channel in blocked),
+                return_exceptions=True,
+            )
+            dropped = sum(isinstance(result, ChannelFull) for result in results)
+            metrics.incr('channel_layer.sent', len(blocked) - dropped)
+            # A slow consumer only loses its own copy
+            metrics.incr('channel_layer.dropped', dropped)
+
+    # Flush extension
+
+    async def flush(self):
+        with self._lock:
+            for channel in self.channels.values():
+                channel.readers.notify_all()
+                channel.writers.notify_all()
+            self.channels = {}
+            self.groups = {}
+
+    async def close(self):
+        pass
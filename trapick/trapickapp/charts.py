@@ -0,0 +1,193 @@
+# trapickapp/charts.py
+"""
+Matplotlib charts used in the exported reports.
+
+Figures are drawn with the object-oriented API on an Agg canvas rather than
+pyplot, so concurrent requests never share pyplot's global figure state.
+matplotlib itself is imported on first use to keep it out of startup time.
+
+``get_chart`` puts an on-disk cache in front of the renderers. Output is
+keyed by a hash of the chart kind, format and input series, so the same data
+is drawn once and every later report or image request reads the file back
+without importing matplotlib at all. The cache is bounded by
+CHART_CACHE_MAX_BYTES; hits refresh a file's mtime and the least recently
+used files are evicted first.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHART_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Part of every cache key; bump it when the look of the charts changes
+CHART_STYLE_VERSION = 1
+
+VEHICLE_COLORS = {
+    'Cars': '#3b82f6',
+    'Trucks': '#ef4444',
+    'Motorcycles': '#f59e0b',
+    'Buses': '#10b981',
+    'Bicycles': '#8b5cf6',
+    'Others': '#6b7280',
+}
+
+CONGESTION_COLORS = {
+    'very_low': '#10b981',
+    'low': '#84cc16',
+    'medium': '#f59e0b',
+    'high': '#f97316',
+    'severe': '#ef4444',
+}
+
+
+def _new_figure(width=6, height=3.2):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(width, height), dpi=100)
+    FigureCanvasAgg(figure)
+    return figure, figure.add_subplot(1, 1, 1)
+
+
+def _to_bytes(figure, fmt):
+    buffer = BytesIO()
+    figure.tight_layout()
+    figure.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def render_vehicle_breakdown(counts, fmt='png'):
+    """Bar chart of vehicle counts, ``counts`` being {'Cars': 12, ...}"""
+    figure, ax = _new_figure()
+    labels = list(counts)
+    ax.bar(labels, [counts[label] for label in labels],
+           color=[VEHICLE_COLORS.get(label, '#6b7280') for label in labels])
+    ax.set_title('Vehicle Breakdown')
+    ax.set_ylabel('Vehicles')
+    return _to_bytes(figure, fmt)
+
+
+def render_hourly_profile(hourly, fmt='png'):
+    """Vehicles per hour of day, ``hourly`` being {hour: count}"""
+    figure, ax = _new_figure()
+    hours = list(range(24))
+    ax.bar(hours, [hourly.get(hour, 0) for hour in hours], color='#3b82f6')
+    ax.set_xticks(hours[::2])
+    ax.set_xticklabels([f'{hour:02d}:00' for hour in hours[::2]], rotation=45, fontsize=7)
+    ax.set_title('Traffic by Hour of Day')
+    ax.set_ylabel('Vehicles')
+    return _to_bytes(figure, fmt)
+
+
+def render_congestion_distribution(levels, fmt='png'):
+    """Number of videos per congestion level, ``levels`` being {'low': 3, ...}"""
+    figure, ax = _new_figure()
+    names = [level for level in CONGESTION_COLORS if level in levels]
+    ax.bar([name.replace('_', ' ').title() for name in names], [levels[name] for name in names],
+           color=[CONGESTION_COLORS[name] for name in names])
+    ax.set_title('Congestion Levels')
+    ax.set_ylabel('Videos')
+    return _to_bytes(figure, fmt)
+
+
+CHARTS = {
+    'vehicle_breakdown': render_vehicle_breakdown,
+    'hourly_profile': render_hourly_profile,
+    'congestion': render_congestion_distribution,
+}
+
+
+def _cache_dir():
+    return getattr(settings, 'CHART_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache', 'charts'))
+
+
+def chart_key(kind, data, fmt):
+    """Content hash identifying a rendered chart"""
+    payload = json.dumps([CHART_STYLE_VERSION, kind, fmt, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_path(key, fmt):
+    return os.path.join(_cache_dir(), key[:2], f'{key}.{fmt}')
+
+
+def get_chart(kind, data, fmt='png'):
+    """Chart bytes for ``data``, from the disk cache or freshly rendered"""
+    if kind not in CHARTS:
+        raise ValueError(f'Unknown chart "{kind}". Choose from: {", ".join(CHARTS)}')
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f'Unknown chart format "{fmt}". Choose from: {", ".join(CHART_FORMATS)}')
+
+    path = _cache_path(chart_key(kind, data, fmt), fmt)
+    try:
+        with open(path, 'rb') as f:
+            image = f.read()
+        os.utime(path)
+        return image
+    except FileNotFoundError:
+        pass
+
+    image = CHARTS[kind](data, fmt)
+    try:
+        _store(path, image)
+    except OSError as e:
+        # A read-only or full cache directory must not fail the report
+        logger.warning(f"⚠️ Could not cache chart {os.path.basename(path)}: {e}")
+    return image
+
+
+def _store(path, image):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(image)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    prune_cache()
+
+
+def prune_cache(max_bytes=None):
+    """Evict least recently used charts until the cache fits in ``max_bytes``. Returns files removed."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+    entries = []
+    total = 0
+    for root, _, files in os.walk(_cache_dir()):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    # Evict down to 90% so a full cache is not pruned again on every write
+    target = max_bytes * 0.9
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,218 @@
+# trapickapp/columnar_exports.py
+"""
+Parquet / Arrow IPC exports of the datasets defined in ``exports.py``.
+
+Rows come off a server-side cursor one row group at a time and are
+converted to an Arrow table per batch, so memory is bounded by the row
+group size rather than the export size. Partitioned exports write a
+Hive-style tree (``date=2025-01-31/location_id=3/part-00000.parquet``)
+that pandas.read_parquet / pyarrow.dataset load directly; rows are
+ordered by partition so only one file is open at a time. Partition columns
+are taken from the video's LocationDateGroup and, as usual for Hive
+layouts, are not repeated inside the files.
+
+pyarrow is optional: without it PYARROW_AVAILABLE is False and callers
+should report the export format as unavailable.
+"""
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.db import models
+
+from .exports import DATASETS, export_queryset
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+COLUMNAR_FORMATS = {
+    'parquet': {'extension': 'parquet', 'content_type': 'application/vnd.apache.parquet'},
+    'arrow': {'extension': 'arrow', 'content_type': 'application/vnd.apache.arrow.file'},
+}
+
+ROW_GROUP_SIZE = getattr(settings, 'EXPORT_ROW_GROUP_SIZE', 100_000)
+
+PARTITION_KEYS = ('date', 'location_id')
+
+# Hive convention for rows whose partition value is NULL
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+def _field_for_lookup(model, lookup):
+    """Resolve an ORM lookup like 'video_file__location_date_group__date' to its model field"""
+    for part in lookup.split('__'):
+        # get_field also accepts attnames such as 'location_id'
+        field = model._meta.get_field(part)
+        if field.is_relation:
+            model = field.related_model
+    while field.is_relation:
+        field = field.target_field
+    return field
+
+
+def _arrow_type(field):
+    if isinstance(field, models.JSONField):
+        return pa.string()
+    internal_type = field.get_internal_type()
+    if internal_type in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+                         'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField'):
+        return pa.int64()
+    if internal_type == 'FloatField':
+        return pa.float64()
+    if internal_type == 'BooleanField':
+        return pa.bool_()
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    if internal_type == 'DateField':
+        return pa.date32()
+    # UUIDs, char and text fields
+    return pa.string()
+
+
+def dataset_schema(dataset, exclude=()):
+    """Arrow schema of a dataset, derived from the model fields behind its columns"""
+    spec = DATASETS[dataset]
+    return pa.schema([
+        pa.field(header, _arrow_type(_field_for_lookup(spec['model'], lookup)))
+        for header, lookup in spec['columns']
+        if header not in exclude
+    ])
+
+
+def _to_table(schema, rows):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_string(field.type):
+            values = [
+                None if value is None
+                else json.dumps(value, separators=(',', ':')) if isinstance(value, (dict, list))
+                else str(value)
+                for value in values
+            ]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _BatchWriter:
+    """Writes Arrow tables to one Parquet or Arrow IPC file"""
+
+    def __init__(self, sink, schema, fmt, compression):
+        self.rows = 0
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(sink, schema, compression=compression)
+        else:
+            # Arrow IPC only supports lz4 and zstd buffers
+            ipc_compression = compression if compression in ('lz4', 'zstd') else None
+            options = pa_ipc.IpcWriteOptions(compression=ipc_compression)
+            self._writer = pa_ipc.new_file(sink, schema, options=options)
+
+    def write(self, table):
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        self._writer.close()
+
+
+def _batches(queryset, size):
+    batch = []
+    for row in queryset.iterator(chunk_size=size):
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_dataset(dataset, video_filters, sink, fmt='parquet', compression='zstd', row_group_size=ROW_GROUP_SIZE):
+    """Write a whole export to one file (a path or writable file object). Returns the row count."""
+    return write_queryset(dataset, export_queryset(dataset, video_filters), sink,
+                          fmt=fmt, compression=compression, row_group_size=row_group_size)
+
+
+def write_queryset(dataset, queryset, sink, fmt='parquet', compression='zstd', row_group_size=ROW_GROUP_SIZE):
+    """Write rows of an already filtered ``export_queryset`` to one file. Returns the row count."""
+    schema = dataset_schema(dataset)
+    writer = _BatchWriter(sink, schema, fmt, compression)
+    try:
+        for batch in _batches(queryset, row_group_size):
+            writer.write(_to_table(schema, batch))
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def _partition_dir(keys, values):
+    parts = []
+    for key, value in zip(keys, values):
+        if value is None:
+            value = NULL_PARTITION
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        parts.append(f'{key}={value}')
+    return os.path.join(*parts)
+
+
+def write_partitioned_dataset(dataset, video_filters, output_dir, partition_by=PARTITION_KEYS,
+                              fmt='parquet', compression='zstd', row_group_size=ROW_GROUP_SIZE):
+    """
+    Write an export as a Hive-partitioned directory tree under ``output_dir``.
+
+    Returns a list of ``{'path', 'rows'}`` for the files written.
+    """
+    spec = DATASETS[dataset]
+    schema = dataset_schema(dataset, exclude=partition_by)
+    keep = [i for i, (header, _) in enumerate(spec['columns']) if header not in partition_by]
+    partition_lookups = [spec['partitions'][key] for key in partition_by]
+    queryset = export_queryset(dataset, video_filters, extra_lookups=partition_lookups, partitioned=True)
+    width = len(spec['columns'])
+    extension = COLUMNAR_FORMATS[fmt]['extension']
+
+    files = []
+    current_key = None
+    writer = None
+    pending = []
+
+    def flush():
+        if pending:
+            writer.write(_to_table(schema, pending))
+            pending.clear()
+
+    try:
+        for row in queryset.iterator(chunk_size=row_group_size):
+            key = row[width:]
+            if key != current_key:
+                if writer:
+                    flush()
+                    writer.close()
+                    files[-1]['rows'] = writer.rows
+                    writer = None
+                directory = os.path.join(output_dir, dataset, _partition_dir(partition_by, key))
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f'part-00000.{extension}')
+                writer = _BatchWriter(path, schema, fmt, compression)
+                files.append({'path': path, 'rows': 0})
+                current_key = key
+
+            pending.append(tuple(row[i] for i in keep))
+            if len(pending) >= row_group_size:
+                flush()
+        if writer:
+            flush()
+            files[-1]['rows'] = writer.rows
+    finally:
+        if writer:
+            writer.close()
+
+    logger.info(f"📦 Wrote {len(files)} {fmt} partitions for {dataset} under {output_dir}")
+    return files
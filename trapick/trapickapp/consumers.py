@@ -1,12 +1,141 @@
 # trapickapp/consumers.py
 import json
+import re
+import uuid
+from collections import OrderedDict, deque
+from itertools import count
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from . import metrics
 from .models import VideoFile
-from .progress import progress_store
+from .progress import get_progress
 import asyncio
 
-class VideoProgressConsumer(AsyncWebsocketConsumer):
+# Messages queued across all connections of this process, and the deepest single queue seen
+_queued_total = 0
+_depth_max = 0
+
+
+def _track_queued(delta, depth=0):
+    global _queued_total, _depth_max
+    _queued_total += delta
+    metrics.set_gauge('ws_send_queue.depth', _queued_total)
+    if depth > _depth_max:
+        _depth_max = depth
+        metrics.set_gauge('ws_send_queue.depth_max', depth)
+
+
+class BoundedSendMixin:
+    """
+    Bounded outbound queue per connection, drained by one writer task.
+
+    ``send`` queues a message that must be delivered (completions, live
+    stats, replies). ``send_droppable`` queues one that may be lost to a slow client: with a
+    ``key`` it replaces the queued message of the same key (latest progress
+    wins), and once WS_SEND_QUEUE_SIZE messages are waiting the oldest
+    droppable one is discarded. Guaranteed messages are never dropped; a
+    client that lets WS_SEND_QUEUE_HARD_LIMIT of them pile up is
+    disconnected (code 1013) and reconnects with fresh state. Depth, drops
+    and disconnects are recorded in metrics.py.
+    """
+
+    def _send_queue_state(self):
+        if not hasattr(self, '_outbox'):
+            # id -> (key, text, droppable); key -> id of the queued message
+            self._outbox = OrderedDict()
+            self._outbox_keys = {}
+            self._outbox_ids = count()
+            self._outbox_ready = asyncio.Event()
+            self._writer = None
+            self._outbox_closed = False
+        return self._outbox
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if close or bytes_data is not None:
+            # Closing frames and binary data bypass the queue, in order behind it
+            await self._drain()
+            await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+            return
+        self._enqueue(text_data, key=None, droppable=False)
+
+    async def send_droppable(self, text_data, key=None):
+        self._enqueue(text_data, key=key, droppable=True)
+
+    def _enqueue(self, text, key, droppable):
+        outbox = self._send_queue_state()
+        if self._outbox_closed:
+            return
+        if key is not None and key in self._outbox_keys:
+            message_id = self._outbox_keys[key]
+            outbox[message_id] = (key, text, droppable)
+            metrics.incr('ws_send_queue.coalesced')
+            return
+
+        limit = getattr(settings, 'WS_SEND_QUEUE_SIZE', 100)
+        if len(outbox) >= limit:
+            oldest = next((message_id for message_id, entry in outbox.items() if entry[2]), None)
+            if oldest is not None:
+                self._discard(oldest)
+                metrics.incr('ws_send_queue.dropped')
+            elif droppable:
+                metrics.incr('ws_send_queue.dropped')
+                return
+            elif len(outbox) >= getattr(settings, 'WS_SEND_QUEUE_HARD_LIMIT', limit * 4):
+                metrics.incr('ws_send_queue.overflow_closed')
+                self._close_slow_client()
+                return
+
+        message_id = next(self._outbox_ids)
+        outbox[message_id] = (key, text, droppable)
+        if key is not None:
+            self._outbox_keys[key] = message_id
+        _track_queued(1, len(outbox))
+        self._outbox_ready.set()
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_loop())
+
+    def _discard(self, message_id):
+        key, _, _ = self._outbox.pop(message_id)
+        if key is not None:
+            self._outbox_keys.pop(key, None)
+        _track_queued(-1)
+
+    async def _write_loop(self):
+        while True:
+            await self._outbox_ready.wait()
+            await self._drain()
+            self._outbox_ready.clear()
+
+    async def _drain(self):
+        outbox = self._send_queue_state()
+        while outbox:
+            message_id = next(iter(outbox))
+            text = outbox[message_id][1]
+            self._discard(message_id)
+            await super().send(text_data=text)
+            metrics.incr('ws_send_queue.sent')
+
+    def _close_slow_client(self):
+        self._stop_writer()
+        asyncio.ensure_future(super().close(code=1013))
+
+    def _stop_writer(self):
+        outbox = self._send_queue_state()
+        self._outbox_closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        _track_queued(-len(outbox))
+        outbox.clear()
+        self._outbox_keys.clear()
+
+    async def websocket_disconnect(self, message):
+        self._stop_writer()
+        await super().websocket_disconnect(message)
+
+
+class VideoProgressConsumer(BoundedSendMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.video_id = self.scope['url_route']['kwargs']['video_id']
         self.room_group_name = f'video_progress_{self.video_id}'
@@ -20,7 +149,7 @@ class VideoProgressConsumer(AsyncWebsocketConsumer):
         await self.accept()
         
         # Send current progress immediately upon connection
-        progress_data = progress_store.get(self.video_id)
+        progress_data = await database_sync_to_async(get_progress)(self.video_id)
         if progress_data:
             await self.send(text_data=json.dumps({
                 'type': 'progress_update',
@@ -36,12 +165,12 @@ class VideoProgressConsumer(AsyncWebsocketConsumer):
         )
 
     async def progress_update(self, event):
-        # Send progress update to WebSocket
-        await self.send(text_data=json.dumps({
+        # Send progress update to WebSocket; a newer one replaces it while still queued
+        await self.send_droppable(json.dumps({
             'type': 'progress_update',
             'progress': event['progress'],
             'message': event['message']
-        }))
+        }), key='progress')
 
     async def processing_complete(self, event):
         # Send completion notification
@@ -51,8 +180,201 @@ class VideoProgressConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+    async def live_stats(self, event):
+        # Per-second counts while processing; the rows are deltas of earlier
+        # messages (see live_stats.py), so none of them may be dropped
+        await self.send(text_data=json.dumps(event))
+
+# Ids usable in channel group names
+_ID_RE = re.compile(r'^[A-Za-z0-9-]{1,64}$')
+
+
+def _valid_stream_ids(ids):
+    """Groups are UUIDs and locations integers; anything else would make the ORM raise"""
+    if any(not _ID_RE.match(value) for values in ids.values() for value in values):
+        return False
+    if any(not value.isdigit() for value in ids['location_ids']):
+        return False
+    try:
+        ids['group_ids'] = [str(uuid.UUID(value)) for value in ids['group_ids']]
+    except ValueError:
+        return False
+    return True
+
+
+def _resolve_videos(group_ids, location_ids):
+    """Ids of the unfinished videos of location-date groups and locations"""
+    videos = VideoFile.objects.exclude(processing_status__in=['completed', 'failed'])
+    ids = set()
+    if group_ids:
+        ids.update(videos.filter(location_date_group_id__in=group_ids).values_list('id', flat=True))
+    if location_ids:
+        ids.update(videos.filter(location_date_group__location_id__in=location_ids).values_list('id', flat=True))
+    return [str(video_id) for video_id in ids]
+
+
+def _current_progress(video_ids):
+    return {video_id: data for video_id in video_ids if (data := get_progress(video_id))}
+
+
+class ProgressStreamConsumer(BoundedSendMixin, AsyncWebsocketConsumer):
+    """
+    Progress of many videos over one socket.
+
+    The client sends
+        {"action": "subscribe", "video_ids": [...], "group_ids": [...], "location_ids": [...]}
+        {"action": "unsubscribe", "video_ids": [...]}
+    where groups and locations expand to their videos still being processed.
+    Updates are collected per connection and sent every
+    PROGRESS_STREAM_BATCH_SECONDS as one frame:
+        {"type": "progress_batch",
+         "updates": {video_id: {"progress", "message"}},
+         "completed": {video_id: message},
+         "live": {video_id: [live_stats, ...]}}
+    keeping only the latest update of each video. ``live`` holds the
+    delta-encoded per-second counts (see live_stats.py) in order and is left
+    out when there are none.
+    """
+
+    async def connect(self):
+        self.video_ids = set()
+        self.updates = {}
+        self.completed = {}
+        self.live = {}
+        self.flush_task = None
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if self.flush_task:
+            self.flush_task.cancel()
+        for video_id in self.video_ids:
+            await self.channel_layer.group_discard(f'video_progress_{video_id}', self.channel_name)
+        self.video_ids.clear()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            request = json.loads(text_data or '')
+            action = request.get('action')
+            ids = {
+                field: [str(value) for value in request.get(field) or []]
+                for field in ('video_ids', 'group_ids', 'location_ids')
+            }
+        except (ValueError, AttributeError, TypeError):
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid JSON message'}))
+            return
+
+        if not _valid_stream_ids(ids):
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid id'}))
+            return
+
+        if action == 'subscribe':
+            await self.subscribe(ids['video_ids'], ids['group_ids'], ids['location_ids'])
+        elif action == 'unsubscribe':
+            video_ids = set(ids['video_ids'])
+            if ids['group_ids'] or ids['location_ids']:
+                video_ids.update(await database_sync_to_async(_resolve_videos)(ids['group_ids'], ids['location_ids']))
+            for video_id in video_ids & self.video_ids:
+                await self.unsubscribe(video_id)
+            await self.send(text_data=json.dumps({'type': 'subscriptions', 'video_ids': sorted(self.video_ids)}))
+        else:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': f'Unknown action: {action}'}))
+
+    async def subscribe(self, video_ids, group_ids, location_ids):
+        video_ids = set(video_ids)
+        if group_ids or location_ids:
+            video_ids.update(await database_sync_to_async(_resolve_videos)(group_ids, location_ids))
+
+        limit = getattr(settings, 'PROGRESS_STREAM_MAX_SUBSCRIPTIONS', 500)
+        requested = sorted(video_ids - self.video_ids)
+        new_ids = requested[:max(0, limit - len(self.video_ids))]
+        for video_id in new_ids:
+            await self.channel_layer.group_add(f'video_progress_{video_id}', self.channel_name)
+            self.video_ids.add(video_id)
+
+        # Where the new videos are at now, in the same shape as later batches
+        current = await database_sync_to_async(_current_progress)(new_ids)
+        await self.send(text_data=json.dumps({
+            'type': 'subscriptions',
+            'video_ids': sorted(self.video_ids),
+            'truncated': len(new_ids) < len(requested),
+        }))
+        if current:
+            await self.send(text_data=json.dumps({
+                'type': 'progress_batch',
+                'updates': {
+                    video_id: {'progress': data['progress'], 'message': data['message']}
+                    for video_id, data in current.items()
+                },
+                'completed': {},
+            }))
+
+    async def unsubscribe(self, video_id):
+        await self.channel_layer.group_discard(f'video_progress_{video_id}', self.channel_name)
+        self.video_ids.discard(video_id)
+        self.updates.pop(video_id, None)
+        self.live.pop(video_id, None)
+
+    def schedule_flush(self):
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(getattr(settings, 'PROGRESS_STREAM_BATCH_SECONDS', 0.25))
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self.updates and not self.completed and not self.live:
+            return
+        batch = {'type': 'progress_batch', 'updates': self.updates, 'completed': self.completed}
+        if self.live:
+            batch['live'] = self.live
+        completed = self.completed
+        self.updates, self.completed, self.live = {}, {}, {}
+        if completed or 'live' in batch:
+            # Completions and live stats deltas must arrive
+            await self.send(text_data=json.dumps(batch))
+        else:
+            # Progress only: if dropped, the client shows older progress until the
+            # video's next update or its completion, which is always delivered
+            await self.send_droppable(json.dumps(batch))
+        # Nothing more will come for finished videos
+        for video_id in completed:
+            if video_id in self.video_ids:
+                await self.unsubscribe(video_id)
+
+    async def progress_update(self, event):
+        video_id = event.get('video_id')
+        if video_id in self.video_ids:
+            self.updates[video_id] = {'progress': event['progress'], 'message': event['message']}
+            self.schedule_flush()
+
+    async def processing_complete(self, event):
+        video_id = event['video_id']
+        if video_id in self.video_ids:
+            self.completed[video_id] = event['message']
+            self.schedule_flush()
+
+    async def live_stats(self, event):
+        video_id = event['video_id']
+        if video_id in self.video_ids:
+            # Deltas build on each other, so every message is kept, in order
+            self.live.setdefault(video_id, []).append({key: value for key, value in event.items() if key != 'type'})
+            self.schedule_flush()
+
+
+class NotificationConsumer(BoundedSendMixin, AsyncWebsocketConsumer):
+    """
+    Data-change events (see notifications.py) for the locations and groups a
+    client displays. The client sends
+        {"action": "subscribe", "location_ids": [...], "group_ids": [...], "all": true}
+    and "unsubscribe" likewise, then refetches whatever a data_changed event names.
+    """
+
     async def connect(self):
+        self.subscriptions = set()
+        # Ids of recent events, which arrive once per subscribed group they were sent to
+        self.recent_ids = deque(maxlen=64)
         await self.accept()
         await self.send(text_data=json.dumps({
             'type': 'connection_established',
@@ -60,7 +382,48 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         }))
 
     async def disconnect(self, close_code):
-        pass
+        for group_name in self.subscriptions:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+        self.subscriptions.clear()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        from .notifications import ALL_GROUP, group_group_name, location_group_name
+
+        try:
+            request = json.loads(text_data or '')
+            action = request.get('action')
+            location_ids = [str(value) for value in request.get('location_ids') or []]
+            group_ids = [str(value) for value in request.get('group_ids') or []]
+        except (ValueError, AttributeError, TypeError):
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid JSON message'}))
+            return
+
+        if any(not _ID_RE.match(value) for value in location_ids + group_ids):
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid id'}))
+            return
+
+        group_names = {location_group_name(value) for value in location_ids}
+        group_names.update(group_group_name(value) for value in group_ids)
+        if request.get('all'):
+            group_names.add(ALL_GROUP)
+
+        if action == 'subscribe':
+            limit = getattr(settings, 'PROGRESS_STREAM_MAX_SUBSCRIPTIONS', 500)
+            for group_name in sorted(group_names - self.subscriptions)[:max(0, limit - len(self.subscriptions))]:
+                await self.channel_layer.group_add(group_name, self.channel_name)
+                self.subscriptions.add(group_name)
+        elif action == 'unsubscribe':
+            for group_name in group_names & self.subscriptions:
+                await self.channel_layer.group_discard(group_name, self.channel_name)
+                self.subscriptions.discard(group_name)
+        else:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': f'Unknown action: {action}'}))
+            return
+
+        await self.send(text_data=json.dumps({'type': 'subscriptions', 'groups': sorted(self.subscriptions)}))
 
-    async def receive(self, text_data):
-        pass
\ No newline at end of file
+    async def data_changed(self, event):
+        if event['id'] in self.recent_ids:
+            return
+        self.recent_ids.append(event['id'])
+        await self.send(text_data=json.dumps(event))
@@ -0,0 +1,252 @@
+# trapickapp/delta_exports.py
+"""
+Scheduled incremental exports of analyses and detections.
+
+Jobs are configured in the 'delta_exports' SystemConfig entry:
+
+    {"jobs": [{"name": "warehouse", "datasets": ["analyses", "detections"],
+               "format": "ndjson", "interval_minutes": 60, "enabled": true}]}
+
+Each run exports only the rows created after the job's high-water mark
+(kept per dataset in the 'delta_export_state:<name>' SystemConfig entry) and
+at least DELTA_EXPORT_LAG_SECONDS ago, so rows from transactions still in
+flight are picked up by the next run instead of being skipped. Files land in
+``EXPORT_OUTBOX_DIR/<job>/<dataset>/`` as gzipped NDJSON or Parquet. They
+are written under a temporary name and renamed once complete, and the mark
+only moves after the rename, so a failed run is simply repeated.
+"""
+import gzip
+import logging
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .exports import DATASETS, EXPORT_CHUNK_SIZE, export_queryset
+from .models import SystemConfig
+
+logger = logging.getLogger(__name__)
+
+CONFIG_KEY = 'delta_exports'
+STATE_KEY_PREFIX = 'delta_export_state:'
+
+# Datasets whose model has a created_at column to take deltas on
+DELTA_DATASETS = ('analyses', 'detections')
+DELTA_FORMATS = {
+    'ndjson': 'ndjson.gz',
+    'parquet': 'parquet',
+}
+DEFAULT_INTERVAL_MINUTES = 60
+
+JOB_NAME_RE = re.compile(r'^[\w-]+$')
+
+# A run that has not finished after this long is assumed dead and may be taken over
+RUN_CLAIM_TIMEOUT = timedelta(hours=6)
+
+
+class DeltaExportConfigError(ValueError):
+    """Raised when a delta export job is misconfigured"""
+
+
+def validate_job(job):
+    """Check a job entry and fill in defaults. Returns the normalized job."""
+    name = job.get('name', '')
+    if not JOB_NAME_RE.match(name):
+        raise DeltaExportConfigError(f'Invalid job name "{name}". Use letters, digits, "_" and "-".')
+
+    datasets = job.get('datasets') or list(DELTA_DATASETS)
+    unknown = [dataset for dataset in datasets if dataset not in DELTA_DATASETS]
+    if unknown:
+        raise DeltaExportConfigError(
+            f'{name}: unsupported datasets {unknown}. Choose from: {", ".join(DELTA_DATASETS)}'
+        )
+
+    fmt = job.get('format', 'ndjson')
+    if fmt not in DELTA_FORMATS:
+        raise DeltaExportConfigError(f'{name}: unknown format "{fmt}". Choose from: {", ".join(DELTA_FORMATS)}')
+    if fmt == 'parquet':
+        from .columnar_exports import PYARROW_AVAILABLE
+        if not PYARROW_AVAILABLE:
+            raise DeltaExportConfigError(f'{name}: Parquet output needs pyarrow, which is not installed')
+
+    return {
+        'name': name,
+        'datasets': datasets,
+        'format': fmt,
+        'interval_minutes': int(job.get('interval_minutes', DEFAULT_INTERVAL_MINUTES)),
+        'enabled': job.get('enabled', True),
+    }
+
+
+def load_jobs():
+    """Configured jobs; invalid entries are logged and left out"""
+    config = SystemConfig.objects.filter(key=CONFIG_KEY).values_list('value', flat=True).first() or {}
+    jobs = []
+    for job in config.get('jobs', []):
+        try:
+            jobs.append(validate_job(job))
+        except (DeltaExportConfigError, TypeError, ValueError) as e:
+            logger.error(f"❌ Skipping delta export job {job!r}: {e}")
+    return jobs
+
+
+def _state_key(name):
+    return f'{STATE_KEY_PREFIX}{name}'
+
+
+def get_state(name):
+    """Stored watermarks and last run of a job"""
+    value = SystemConfig.objects.filter(key=_state_key(name)).values_list('value', flat=True).first()
+    return value or {'watermarks': {}, 'last_run': None}
+
+
+def is_due(job, now=None):
+    last_run = parse_datetime(get_state(job['name']).get('last_run') or '')
+    if last_run is None:
+        return True
+    return last_run + timedelta(minutes=job['interval_minutes']) <= (now or timezone.now())
+
+
+def delta_queryset(dataset, after, until):
+    """Rows of ``dataset`` with after < created_at <= until (``after`` None for everything)"""
+    queryset = export_queryset(dataset, {}).filter(created_at__lte=until)
+    if after is not None:
+        queryset = queryset.filter(created_at__gt=after)
+    return queryset
+
+
+def _write_ndjson(dataset, queryset, path):
+    headers = [header for header, _ in DATASETS[dataset]['columns']]
+    rows = 0
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    with gzip.open(path, 'wt', encoding='utf-8') as out:
+        for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            out.write(encoder.encode(dict(zip(headers, row))))
+            out.write('\n')
+            rows += 1
+    return rows
+
+
+def _write_parquet(dataset, queryset, path):
+    from .columnar_exports import write_queryset
+    return write_queryset(dataset, queryset, path, fmt='parquet', compression='zstd')
+
+
+WRITERS = {
+    'ndjson': _write_ndjson,
+    'parquet': _write_parquet,
+}
+
+
+def write_delta(job, dataset, after, until):
+    """
+    Write one dataset's delta into the job's outbox.
+
+    Returns ``{'path', 'rows'}``; path is None when there was nothing new.
+    """
+    directory = os.path.join(settings.EXPORT_OUTBOX_DIR, job['name'], dataset)
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{dataset}-{until.strftime('%Y%m%dT%H%M%S%fZ')}.{DELTA_FORMATS[job['format']]}"
+    path = os.path.join(directory, filename)
+    # Dot-prefixed so outbox consumers skip files that are still being written
+    temp_path = os.path.join(directory, f'.{filename}.tmp')
+
+    try:
+        rows = WRITERS[job['format']](dataset, delta_queryset(dataset, after, until), temp_path)
+        if not rows:
+            os.remove(temp_path)
+            return {'path': None, 'rows': 0}
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return {'path': path, 'rows': rows}
+
+
+def _locked_state(state_row):
+    """Re-read the job's state row under a row lock; call inside transaction.atomic()"""
+    state_row = SystemConfig.objects.select_for_update().get(pk=state_row.pk)
+    state_row.value.setdefault('watermarks', {})
+    return state_row
+
+
+def run_job(job, now=None):
+    """
+    Export everything new since the job's last run. Returns a summary.
+
+    The state row is only locked briefly, to claim the run and later to store
+    the new marks; the export itself runs outside any transaction so it never
+    holds the database write lock (the whole database on SQLite).
+    """
+    now = now or timezone.now()
+    until = now - timedelta(seconds=getattr(settings, 'DELTA_EXPORT_LAG_SECONDS', 60))
+    summary = {'job': job['name'], 'until': until.isoformat(), 'datasets': {}}
+
+    state_row, _ = SystemConfig.objects.get_or_create(
+        key=_state_key(job['name']),
+        defaults={
+            'value': {'watermarks': {}, 'last_run': None},
+            'description': f'High-water marks of the "{job["name"]}" delta export job',
+        },
+    )
+
+    # Claim the run so overlapping runs of the same job cannot export a window twice
+    with transaction.atomic():
+        state_row = _locked_state(state_row)
+        running_since = parse_datetime(state_row.value.get('running_since') or '')
+        if running_since is not None and running_since + RUN_CLAIM_TIMEOUT > now:
+            summary['skipped'] = f'already running since {running_since.isoformat()}'
+            return summary
+        state_row.value['running_since'] = now.isoformat()
+        state_row.save(update_fields=['value', 'updated_at'])
+        watermarks = dict(state_row.value['watermarks'])
+
+    exported = {}
+    finished = False
+    try:
+        for dataset in job['datasets']:
+            after = parse_datetime(watermarks[dataset]) if watermarks.get(dataset) else None
+            if after is not None and after >= until:
+                continue
+            try:
+                result = write_delta(job, dataset, after, until)
+            except Exception as e:
+                # The mark stays put, so this window is retried on the next run
+                logger.error(f"❌ {job['name']}: exporting {dataset} failed: {e}")
+                summary['datasets'][dataset] = {'error': str(e)}
+                continue
+            exported[dataset] = until.isoformat()
+            summary['datasets'][dataset] = result
+            if result['rows']:
+                logger.info(f"📤 {job['name']}: exported {result['rows']} new {dataset} rows to {result['path']}")
+        finished = True
+    finally:
+        with transaction.atomic():
+            state_row = _locked_state(state_row)
+            state = state_row.value
+            state['watermarks'].update(exported)
+            if finished:
+                state['last_run'] = now.isoformat()
+            state.pop('running_since', None)
+            state_row.save(update_fields=['value', 'updated_at'])
+
+    return summary
+
+
+def run_scheduled_jobs(job_names=None, force=False):
+    """Run the enabled jobs that are due (or all selected ones with ``force``)"""
+    now = timezone.now()
+    summaries = []
+    for job in load_jobs():
+        if job_names and job['name'] not in job_names:
+            continue
+        if not force and (not job['enabled'] or not is_due(job, now)):
+            continue
+        summaries.append(run_job(job, now))
+    return summaries
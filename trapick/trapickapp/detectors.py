@@ -0,0 +1,222 @@
+# trapickapp/detectors.py
+"""
+Per-process registry of constructed detectors.
+
+Building a detector loads its model weights, which takes seconds, so each
+worker process keeps the detectors it has built, keyed by (module, class,
+hash of config_parameters). Profiles with identical settings share one
+instance. An entry remembers the ``updated_at`` of every profile it was
+handed to; once a profile is saved again its next lookup rebuilds the
+detector, and entries no profile refers to anymore are dropped. At most
+DETECTOR_REGISTRY_SIZE detectors are kept, least recently used first out.
+
+``checkout(profile)`` is what task code should use: it holds the entry's
+lock for the duration of the run, since a model instance is not safe to
+drive from two threads at once (several uploads may be processed on threads
+of one process when no Celery broker is configured), and calls the
+detector's ``reset()`` between videos if it has one.
+
+Celery workers warm the registry for the profiles in use when each worker
+process starts (``worker_process_init``), so the first video no longer pays
+for loading the model.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_DETECTOR = ('ml.vehicle_detector', 'RTXVehicleDetector')
+
+
+class _Entry:
+    def __init__(self, detector):
+        self.detector = detector
+        # profile id -> updated_at of the profile row this detector was built for
+        self.profiles = {}
+        self.lock = threading.RLock()
+
+
+_registry = OrderedDict()
+_profile_keys = {}
+_registry_lock = threading.Lock()
+_build_locks = {}
+
+
+def config_hash(config):
+    return hashlib.sha1(json.dumps(config or {}, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def registry_key(profile):
+    return (profile.detector_module, profile.detector_class, config_hash(profile.config_parameters))
+
+
+def _construct(module_path, class_name, config):
+    module = __import__(module_path, fromlist=[class_name])
+    return getattr(module, class_name)(**config)
+
+
+def _build(profile):
+    started = time.monotonic()
+    try:
+        detector = _construct(profile.detector_module, profile.detector_class, profile.config_parameters)
+    except (ImportError, AttributeError) as e:
+        if (profile.detector_module, profile.detector_class) == FALLBACK_DETECTOR:
+            raise
+        print(f"❌ [DETECTOR] Error loading detector {profile.detector_class}: {e}")
+        detector = _construct(*FALLBACK_DETECTOR, {})
+    elapsed = time.monotonic() - started
+    metrics.incr('detector_registry.build')
+    metrics.set_gauge('detector_registry.last_build_seconds', round(elapsed, 3))
+    logger.info(f"🧠 Built {profile.detector_class} for profile {profile.name} in {elapsed:.2f}s")
+    return detector
+
+
+def _drop_build_lock(key):
+    """Forget the build lock of a key that left the registry, unless a build holds it. Caller holds _registry_lock."""
+    lock = _build_locks.get(key)
+    if lock is not None and not lock.locked():
+        del _build_locks[key]
+
+
+def _forget_profile(profile_id):
+    """Detach a profile from its previous entry, dropping the entry if unused. Caller holds _registry_lock."""
+    old_key = _profile_keys.pop(profile_id, None)
+    entry = _registry.get(old_key)
+    if entry is not None:
+        entry.profiles.pop(profile_id, None)
+        if not entry.profiles:
+            del _registry[old_key]
+            _drop_build_lock(old_key)
+
+
+def _reusable_entry(key, profile):
+    """
+    The registry entry for ``key`` if it is current for ``profile``, attaching
+    the profile to it. Caller holds _registry_lock.
+    """
+    entry = _registry.get(key)
+    if entry is None or entry.profiles.get(profile.pk, profile.updated_at) != profile.updated_at:
+        return None
+    if _profile_keys.get(profile.pk) != key:
+        _forget_profile(profile.pk)
+        entry.profiles[profile.pk] = profile.updated_at
+        _profile_keys[profile.pk] = key
+    _registry.move_to_end(key)
+    metrics.incr('detector_registry.hit')
+    return entry
+
+
+def _get_entry(profile):
+    key = registry_key(profile)
+    with _registry_lock:
+        entry = _reusable_entry(key, profile)
+        if entry is not None:
+            return entry
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    # Built outside the registry lock so other keys stay available meanwhile;
+    # the per-key lock keeps two threads from loading the same weights
+    with build_lock:
+        with _registry_lock:
+            # Built by the thread we waited for, possibly for another profile with the same key
+            entry = _reusable_entry(key, profile)
+            if entry is not None:
+                return entry
+
+        metrics.incr('detector_registry.miss')
+        detector = _build(profile)
+
+        with _registry_lock:
+            _forget_profile(profile.pk)
+            entry = _Entry(detector)
+            # The profile changed, so an instance other profiles shared is rebuilt for them too
+            stale = _registry.pop(key, None)
+            if stale is not None:
+                for profile_id in stale.profiles:
+                    _profile_keys.pop(profile_id, None)
+            entry.profiles[profile.pk] = profile.updated_at
+            _registry[key] = entry
+            _profile_keys[profile.pk] = key
+            while len(_registry) > getattr(settings, 'DETECTOR_REGISTRY_SIZE', 4):
+                evicted_key, evicted = _registry.popitem(last=False)
+                for profile_id in evicted.profiles:
+                    _profile_keys.pop(profile_id, None)
+                _drop_build_lock(evicted_key)
+                metrics.incr('detector_registry.evicted')
+            metrics.set_gauge('detector_registry.size', len(_registry))
+        return entry
+
+
+def get_detector(profile):
+    """The cached detector of a ProcessingProfile, built on first use"""
+    return _get_entry(profile).detector
+
+
+@contextmanager
+def checkout(profile):
+    """Exclusive use of a profile's cached detector for one video"""
+    entry = _get_entry(profile)
+    with entry.lock:
+        reset = getattr(entry.detector, 'reset', None)
+        if callable(reset):
+            reset()
+        yield entry.detector
+
+
+def clear():
+    with _registry_lock:
+        _registry.clear()
+        _profile_keys.clear()
+        for key in list(_build_locks):
+            _drop_build_lock(key)
+        metrics.set_gauge('detector_registry.size', 0)
+
+
+def warm_up(profiles=None):
+    """Build detectors ahead of time; by default for active profiles that a location uses"""
+    from .models import ProcessingProfile
+
+    if profiles is None:
+        profiles = ProcessingProfile.objects.filter(active=True, locations__isnull=False).distinct()
+
+    warmed = 0
+    for profile in profiles:
+        try:
+            get_detector(profile)
+            warmed += 1
+        except ImportError as e:
+            # View-only deployments ship without the ML stack
+            logger.info(f"ℹ️ Skipping detector warmup, ML module not available: {e}")
+            break
+        except Exception as e:
+            logger.error(f"❌ Warming detector for profile {profile.name} failed: {e}")
+    return warmed
+
+
+try:
+    from celery.signals import worker_process_init
+
+    @worker_process_init.connect
+    def warm_up_worker_process(**kwargs):
+        if not getattr(settings, 'DETECTOR_WARMUP', True):
+            return
+        try:
+            warmed = warm_up()
+            logger.info(f"🔥 Warmed {warmed} detector(s) in worker process")
+        except Exception as e:
+            logger.error(f"❌ Detector warmup failed: {e}")
+        finally:
+            # Connections must not be shared with the tasks that follow
+            connections.close_all()
+except ImportError:
+    pass
@@ -0,0 +1,301 @@
+# trapickapp/exports.py
+"""
+Raw data exports of analyses, Detection and FrameAnalysis rows and the
+traffic rollups.
+
+A scope (one video, a LocationDateGroup, or a location and date range) is
+turned into filters on VideoFile, and rows are read with
+``values_list(...).iterator(chunk_size=...)`` (server-side cursors on
+PostgreSQL) so an export never holds more than one chunk in memory,
+however many frames the scope covers.
+"""
+import csv
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+from .models import (
+    DailyTrafficSummary, Detection, FrameAnalysis, HourlyTrafficSummary, Location, LocationDateGroup,
+    TrafficAnalysis, VideoFile,
+)
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# Rows joined into one string per yielded chunk, so the response is not
+# written a few dozen bytes at a time
+CSV_ROWS_PER_CHUNK = 500
+
+# Column header -> ORM lookup on the dataset's model. 'video_lookup' is the
+# path from the model to VideoFile used to apply the export scope; rollups
+# have none and are scoped on their own location/date. 'partitions' give the
+# lookups used for date/location partitioned (columnar) output.
+DATASETS = {
+    'analyses': {
+        'model': TrafficAnalysis,
+        'video_lookup': 'video_file',
+        'order_by': ('created_at', 'id'),
+        'partitions': {
+            'date': 'video_file__location_date_group__date',
+            'location_id': 'video_file__location_date_group__location_id',
+        },
+        'columns': [
+            ('analysis_id', 'id'),
+            ('video_id', 'video_file_id'),
+            ('location_id', 'location_id'),
+            ('analyzed_at', 'analyzed_at'),
+            ('total_vehicles', 'total_vehicles'),
+            ('car_count', 'car_count'),
+            ('truck_count', 'truck_count'),
+            ('motorcycle_count', 'motorcycle_count'),
+            ('bus_count', 'bus_count'),
+            ('bicycle_count', 'bicycle_count'),
+            ('other_count', 'other_count'),
+            ('peak_traffic', 'peak_traffic'),
+            ('average_traffic', 'average_traffic'),
+            ('congestion_level', 'congestion_level'),
+            ('traffic_pattern', 'traffic_pattern'),
+            ('processing_time_seconds', 'processing_time_seconds'),
+            ('created_at', 'created_at'),
+        ],
+    },
+    'detections': {
+        'model': Detection,
+        'video_lookup': 'video_file',
+        'order_by': ('video_file_id', 'frame_number', 'id'),
+        'partitions': {
+            'date': 'video_file__location_date_group__date',
+            'location_id': 'video_file__location_date_group__location_id',
+        },
+        'columns': [
+            ('detection_id', 'id'),
+            ('video_id', 'video_file_id'),
+            ('analysis_id', 'traffic_analysis_id'),
+            ('location_id', 'location_id'),
+            ('timestamp', 'timestamp'),
+            ('frame_number', 'frame_number'),
+            ('vehicle_type', 'vehicle_type__name'),
+            ('confidence', 'confidence'),
+            ('bbox_x', 'bbox_x'),
+            ('bbox_y', 'bbox_y'),
+            ('bbox_width', 'bbox_width'),
+            ('bbox_height', 'bbox_height'),
+            ('track_id', 'track_id'),
+            ('in_counting_zone', 'in_counting_zone'),
+            ('speed_estimate', 'speed_estimate'),
+            ('direction', 'direction'),
+            ('created_at', 'created_at'),
+        ],
+    },
+    'frames': {
+        'model': FrameAnalysis,
+        'video_lookup': 'traffic_analysis__video_file',
+        'order_by': ('traffic_analysis_id', 'frame_number'),
+        'partitions': {
+            'date': 'traffic_analysis__video_file__location_date_group__date',
+            'location_id': 'traffic_analysis__video_file__location_date_group__location_id',
+        },
+        'columns': [
+            ('frame_id', 'id'),
+            ('analysis_id', 'traffic_analysis_id'),
+            ('video_id', 'traffic_analysis__video_file_id'),
+            ('frame_number', 'frame_number'),
+            ('timestamp_seconds', 'timestamp_seconds'),
+            ('car_count', 'car_count'),
+            ('truck_count', 'truck_count'),
+            ('motorcycle_count', 'motorcycle_count'),
+            ('bus_count', 'bus_count'),
+            ('bicycle_count', 'bicycle_count'),
+            ('total_vehicles', 'total_vehicles'),
+            ('congestion_level', 'congestion_level'),
+            ('detection_data', 'detection_data'),
+        ],
+    },
+    'hourly_summaries': {
+        'model': HourlyTrafficSummary,
+        'video_lookup': None,
+        'order_by': ('date', 'hour', 'location_id', 'vehicle_type_id'),
+        'partitions': {'date': 'date', 'location_id': 'location_id'},
+        'columns': [
+            ('date', 'date'),
+            ('hour', 'hour'),
+            ('location_id', 'location_id'),
+            ('vehicle_type', 'vehicle_type__name'),
+            ('count', 'count'),
+            ('average_confidence', 'average_confidence'),
+            ('peak_5min_count', 'peak_5min_count'),
+        ],
+    },
+    'daily_summaries': {
+        'model': DailyTrafficSummary,
+        'video_lookup': None,
+        'order_by': ('date', 'location_id', 'vehicle_type_id'),
+        'partitions': {'date': 'date', 'location_id': 'location_id'},
+        'columns': [
+            ('date', 'date'),
+            ('location_id', 'location_id'),
+            ('vehicle_type', 'vehicle_type__name'),
+            ('total_count', 'total_count'),
+            ('peak_hour', 'peak_hour'),
+            ('peak_hour_count', 'peak_hour_count'),
+            ('average_daily_congestion', 'average_daily_congestion'),
+        ],
+    },
+}
+
+# Prefix of scope filters that address the video's location and date
+GROUP_PREFIX = 'location_date_group__'
+
+
+class ExportScopeError(ValueError):
+    """Raised when export parameters do not describe a valid scope"""
+
+
+class Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def resolve_scope(video_id=None, group_id=None, location_id=None, start_date=None, end_date=None):
+    """
+    Turn export parameters into ``(video_filters, label)``.
+
+    ``video_filters`` are lookups on VideoFile; ``label`` is used in
+    filenames. Exactly one of video_id, group_id or location_id is expected.
+    """
+    if sum(1 for value in (video_id, group_id, location_id) if value) != 1:
+        raise ExportScopeError('Specify exactly one of video_id, group_id or location_id.')
+
+    if video_id:
+        if not VideoFile.objects.filter(id=video_id).exists():
+            raise ExportScopeError('Video not found')
+        return {'id': video_id}, f'video_{video_id}'
+
+    if group_id:
+        group = LocationDateGroup.objects.filter(id=group_id).first()
+        if group is None:
+            raise ExportScopeError('Group not found')
+        # Groups are unique per (location, date), which rollups can filter on too
+        return {
+            f'{GROUP_PREFIX}location_id': group.location_id,
+            f'{GROUP_PREFIX}date': group.date,
+        }, f'group_{group_id}'
+
+    location = Location.objects.filter(id=location_id).first()
+    if location is None:
+        raise ExportScopeError('Location not found')
+
+    filters = {f'{GROUP_PREFIX}location_id': location.id}
+    label = f'location_{location.id}'
+    for value, lookup in ((start_date, 'gte'), (end_date, 'lte')):
+        if not value:
+            continue
+        parsed = parse_date(value) if isinstance(value, str) else value
+        if parsed is None:
+            raise ExportScopeError(f'Invalid date "{value}". Use YYYY-MM-DD.')
+        filters[f'{GROUP_PREFIX}date__{lookup}'] = parsed
+        label += f'_{parsed.isoformat()}'
+    return filters, label
+
+
+def dataset_filters(dataset, video_filters):
+    """Translate VideoFile scope filters into lookups on the dataset's model"""
+    spec = DATASETS[dataset]
+    if spec['video_lookup']:
+        return {f"{spec['video_lookup']}__{key}": value for key, value in video_filters.items()}
+
+    filters = {}
+    for key, value in video_filters.items():
+        if not key.startswith(GROUP_PREFIX):
+            raise ExportScopeError(f'{dataset} can only be exported by group or location, not per video.')
+        filters[key[len(GROUP_PREFIX):]] = value
+    return filters
+
+
+def export_queryset(dataset, video_filters, extra_lookups=(), partitioned=False):
+    """
+    values_list queryset of the dataset's columns in the scope.
+
+    ``extra_lookups`` are appended after the columns. With ``partitioned``
+    rows are ordered by the partition lookups first, so each partition
+    comes out as one contiguous run.
+    """
+    spec = DATASETS[dataset]
+    order_by = spec['order_by']
+    if partitioned:
+        order_by = tuple(spec['partitions'].values()) + order_by
+    return (
+        spec['model'].objects
+        .filter(**dataset_filters(dataset, video_filters))
+        .order_by(*order_by)
+        .values_list(*[lookup for _, lookup in spec['columns']], *extra_lookups)
+    )
+
+
+def export_rows(dataset, video_filters, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate the dataset's rows in the scope as tuples, in column order"""
+    return export_queryset(dataset, video_filters).iterator(chunk_size=chunk_size)
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(dataset, rows):
+    """Yield CSV text for the dataset's header and rows, a few hundred rows per chunk"""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in DATASETS[dataset]['columns']])
+
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(buffer) >= CSV_ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def _aiter_sync(iterator):
+    # thread_sensitive keeps every step on the request's DB connection
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_response(request, content, content_type, filename):
+    """
+    StreamingHttpResponse over a sync generator, sent as an attachment.
+
+    Under ASGI the generator is handed over through an async iterator;
+    Django 4.2 would otherwise buffer a sync iterator completely before
+    sending.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _aiter_sync(content)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_csv_response(request, dataset, video_filters, label):
+    """Stream a dataset export as CSV"""
+    # Built eagerly so scope errors surface before the response starts
+    content = iter_csv(dataset, export_rows(dataset, video_filters))
+    return streaming_response(
+        request, content, 'text/csv', f'{dataset}_{label}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    )
@@ -0,0 +1,125 @@
+# trapickapp/live_stats.py
+"""
+Live per-second vehicle counts of a video while it is being processed.
+
+Detectors whose ``analyze_video`` accepts a ``frame_callback`` get one; they
+call it for every analyzed frame with the values that later become its
+FrameAnalysis row::
+
+    {'frame_number', 'timestamp_seconds', 'car_count', 'truck_count',
+     'motorcycle_count', 'bus_count', 'bicycle_count', 'total_vehicles',
+     'congestion_level'}
+
+LiveStatsPublisher keeps, per second of video, the most vehicles seen in any
+one frame of that second, by type. Every LIVE_STATS_INTERVAL_SECONDS it sends
+the seconds that changed since its previous message to the video's progress
+group (``video_progress_<id>``) as a ``live_stats`` event:
+
+    {"type": "live_stats", "video_id", "seq",
+     "fields": ["second", "cars", ...],        # first message only
+     "rows": [[12, 3, 0, 1, 0, 0, 4], [1, 1, 0, -1, 0, 0, 0]],
+     "frames": 250, "congestion": "medium"}     # congestion only when it changed
+
+The first row is absolute, every further row is the difference to the row
+before it, so a client sums the rows up to get each second. A second that
+was sent while still in progress is sent again once it has grown; clients
+replace it.
+"""
+import inspect
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .series import FRAME_COUNT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['second'] + [name for name, _ in FRAME_COUNT_FIELDS]
+
+
+class LiveStatsPublisher:
+    """Collects frames of one video and publishes them as batched, delta-encoded seconds"""
+
+    def __init__(self, video_id):
+        self.video_id = str(video_id)
+        self.channel_layer = get_channel_layer()
+        self.room_group_name = f'video_progress_{self.video_id}'
+        self.interval = getattr(settings, 'LIVE_STATS_INTERVAL_SECONDS', 1.0)
+        # second -> [cars, trucks, motorcycles, buses, bicycles, total]
+        self.seconds = {}
+        self.changed = set()
+        self.frames = 0
+        self.congestion = None
+        self.sent_congestion = None
+        self.seq = 0
+        self.last_sent_at = time.monotonic()
+
+    def record_frame(self, frame):
+        """Add one analyzed frame; publishes when the interval has passed"""
+        second = int(frame.get('timestamp_seconds') or 0)
+        counts = [int(frame.get(field) or 0) for _, field in FRAME_COUNT_FIELDS]
+        bucket = self.seconds.get(second)
+        if bucket is None:
+            self.seconds[second] = counts
+            self.changed.add(second)
+        elif any(new > old for new, old in zip(counts, bucket)):
+            self.seconds[second] = [max(new, old) for new, old in zip(counts, bucket)]
+            self.changed.add(second)
+        self.frames += 1
+        if frame.get('congestion_level'):
+            self.congestion = frame['congestion_level']
+
+        if time.monotonic() - self.last_sent_at >= self.interval:
+            self.flush()
+
+    def build_message(self):
+        """The next live_stats event, or None when nothing changed"""
+        if not self.changed and self.congestion == self.sent_congestion:
+            return None
+
+        rows, previous = [], None
+        for second in sorted(self.changed):
+            row = [second, *self.seconds[second]]
+            rows.append(row if previous is None else [value - last for value, last in zip(row, previous)])
+            previous = row
+
+        message = {'type': 'live_stats', 'video_id': self.video_id, 'seq': self.seq, 'rows': rows, 'frames': self.frames}
+        if self.seq == 0:
+            message['fields'] = FIELDS
+        if self.congestion != self.sent_congestion:
+            message['congestion'] = self.congestion
+        return message
+
+    def flush(self):
+        """Publish what changed since the last message"""
+        self.last_sent_at = time.monotonic()
+        message = self.build_message()
+        if message is None:
+            return
+        self.changed.clear()
+        self.sent_congestion = self.congestion
+        self.seq += 1
+        try:
+            async_to_sync(self.channel_layer.group_send)(self.room_group_name, message)
+        except Exception as e:
+            # Live counts are a preview; the final analysis does not depend on them
+            logger.debug(f"Live stats for {self.video_id} not sent: {e}")
+
+
+def analyze_with_live_stats(detector, video_path, video_id):
+    """Run ``detector.analyze_video``, streaming live stats if the detector supports it"""
+    try:
+        accepts_callback = 'frame_callback' in inspect.signature(detector.analyze_video).parameters
+    except (TypeError, ValueError):
+        accepts_callback = False
+    if not accepts_callback:
+        return detector.analyze_video(video_path)
+
+    publisher = LiveStatsPublisher(video_id)
+    try:
+        return detector.analyze_video(video_path, frame_callback=publisher.record_frame)
+    finally:
+        publisher.flush()
@@ -0,0 +1,52 @@
+# trapickapp/management/commands/archive_media.py
+"""
+Move old video originals to the cold storage tier.
+
+Candidates are originals older than MEDIA_ARCHIVE_AFTER_DAYS (or
+--older-than-days) whose processing has finished. Run it from cron, or let
+Celery beat run the archive_old_originals task, which does the same thing
+daily.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from trapickapp.storage_tiers import archive_candidates, archive_original
+
+
+class Command(BaseCommand):
+    help = 'Archive old video originals to cold storage and report the space freed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='Override settings.MEDIA_ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--limit', type=int, default=None, help='Only archive this many videos')
+        parser.add_argument('--dry-run', action='store_true', help='List candidates without moving anything')
+
+    def handle(self, *args, **options):
+        candidates = archive_candidates(options['older_than_days']).order_by('uploaded_at')
+        if options['limit']:
+            candidates = candidates[:options['limit']]
+
+        summary = {'archived': 0, 'freed_bytes': 0, 'skipped': 0, 'errors': 0}
+        if options['dry_run']:
+            summary['candidates'] = []
+
+        for video in candidates.iterator(chunk_size=200):
+            if options['dry_run']:
+                summary['candidates'].append({'video_id': str(video.id), 'file': video.file_path.name})
+                continue
+            try:
+                freed = archive_original(video)
+            except Exception as e:
+                self.stderr.write(f'❌ Could not archive video {video.id}: {e}')
+                summary['errors'] += 1
+                continue
+
+            if freed:
+                summary['archived'] += 1
+                summary['freed_bytes'] += freed
+            else:
+                summary['skipped'] += 1
+
+        self.stdout.write(json.dumps(summary, indent=2))
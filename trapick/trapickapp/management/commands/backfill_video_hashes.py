@@ -0,0 +1,98 @@
+# trapickapp/management/commands/backfill_video_hashes.py
+"""
+Compute content_hash for videos uploaded before deduplication existed.
+
+Files are hashed in parallel on a thread pool (hashlib releases the GIL
+while digesting large blocks), with a bounded number of files in flight so
+memory stays flat however many rows need backfilling. Rows whose content
+matches an already-hashed video are reported as duplicates and left
+unhashed, since the unique index allows only one row per hash. Archived
+originals are hashed straight from the cold tier without rehydrating them.
+"""
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from trapickapp.models import VideoFile
+from trapickapp.storage_tiers import get_cold_storage
+from trapickapp.uploads import hash_file, hash_stream
+
+
+class Command(BaseCommand):
+    help = 'Hash existing video originals in parallel and fill VideoFile.content_hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Hashing threads')
+        parser.add_argument('--limit', type=int, default=None, help='Only hash this many videos')
+        parser.add_argument('--dry-run', action='store_true', help='Compute hashes but do not save them')
+
+    def handle(self, *args, **options):
+        queryset = (
+            VideoFile.objects
+            .filter(content_hash__isnull=True)
+            .exclude(file_path='')
+            .order_by('uploaded_at')
+            .values_list('id', 'file_path', 'storage_tier')
+        )
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        summary = {'hashed': 0, 'missing': 0, 'duplicates': [], 'errors': 0}
+        # Dry runs save nothing, so remember this run's hashes to still spot duplicates
+        self._dry_run_hashes = {}
+        max_in_flight = options['workers'] * 4
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            pending = {}
+            for video_id, relative_path, storage_tier in queryset.iterator(chunk_size=500):
+                pending[pool.submit(self._hash, relative_path, storage_tier)] = video_id
+
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._record(pending.pop(future), future, summary, options['dry_run'])
+
+            for future in list(pending):
+                self._record(pending.pop(future), future, summary, options['dry_run'])
+
+        self.stdout.write(json.dumps(summary, indent=2))
+
+    def _hash(self, relative_path, storage_tier):
+        if storage_tier == 'cold':
+            cold = get_cold_storage()
+            if not cold.exists(relative_path):
+                return None
+            with cold.open(relative_path) as f:
+                return hash_stream(f)
+
+        file_path = VideoFile.file_path.field.storage.path(relative_path)
+        if not os.path.exists(file_path):
+            return None
+        return hash_file(file_path)
+
+    def _record(self, video_id, future, summary, dry_run):
+        try:
+            content_hash = future.result()
+        except OSError as e:
+            self.stderr.write(f'❌ Could not read video {video_id}: {e}')
+            summary['errors'] += 1
+            return
+
+        if content_hash is None:
+            summary['missing'] += 1
+            return
+
+        original = self._dry_run_hashes.get(content_hash) or (
+            VideoFile.objects.filter(content_hash=content_hash).exclude(id=video_id).values_list('id', flat=True).first()
+        )
+        if original:
+            summary['duplicates'].append({'video_id': str(video_id), 'duplicate_of': str(original)})
+            return
+
+        if dry_run:
+            self._dry_run_hashes[content_hash] = video_id
+        else:
+            VideoFile.objects.filter(id=video_id, content_hash__isnull=True).update(content_hash=content_hash)
+        summary['hashed'] += 1
@@ -0,0 +1,147 @@
+# trapickapp/management/commands/channel_layer_benchmark.py
+"""
+Throughput benchmark for the channel layer that carries progress and
+notifications.
+
+Subscribes ``--consumers`` receivers to one group and publishes
+``--messages`` group messages to it, reporting delivered messages per
+second, drops and latency. ``--threaded`` publishes from a separate thread
+through ``async_to_sync``, the way ProgressTracker and the notification
+signals do. Compare layers with ``--layer``:
+
+    python manage.py channel_layer_benchmark --layer bounded --layer inmemory
+    python manage.py channel_layer_benchmark --layer default --threaded   # as configured (Redis if REDIS_URL)
+"""
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+LAYERS = {
+    'bounded': 'trapickapp.channel_layers.BoundedInMemoryChannelLayer',
+    'inmemory': 'channels.layers.InMemoryChannelLayer',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure messages/sec through the channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--layer', action='append', choices=['default', *LAYERS],
+            help='Layer to test (repeat to compare); "default" is CHANNEL_LAYERS as configured'
+        )
+        parser.add_argument('--messages', type=int, default=5000, help='Group messages to publish')
+        parser.add_argument('--consumers', type=int, default=10, help='Receivers subscribed to the group')
+        parser.add_argument('--capacity', type=int, default=200, help='Channel capacity for the in-process layers')
+        parser.add_argument('--threaded', action='store_true', help='Publish from another thread via async_to_sync')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if options['messages'] < 1 or options['consumers'] < 1:
+            raise CommandError('--messages and --consumers must be positive')
+
+        results = []
+        for name in options['layer'] or ['default']:
+            if name == 'default':
+                layer = get_channel_layer()
+                if layer is None:
+                    raise CommandError('CHANNEL_LAYERS is not configured')
+            else:
+                from django.utils.module_loading import import_string
+                layer = import_string(LAYERS[name])(capacity=options['capacity'])
+            self.stderr.write(
+                f'📨 {name}: {options["messages"]} messages to {options["consumers"]} consumers'
+                f'{" from a thread" if options["threaded"] else ""}'
+            )
+            result = asyncio.run(self._run(layer, options))
+            result['layer'] = name
+            result['backend'] = f'{type(layer).__module__}.{type(layer).__name__}'
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        header = f'{"layer":<10} {"delivered":>10} {"dropped":>8} {"msg/s":>10} {"p50 ms":>8} {"p95 ms":>8}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for r in results:
+            self.stdout.write(
+                f'{r["layer"]:<10} {r["delivered"]:>10} {r["dropped"]:>8} '
+                f'{r["messages_per_second"]:>10.0f} {r["latency_p50_ms"]:>8.2f} {r["latency_p95_ms"]:>8.2f}'
+            )
+
+    async def _run(self, layer, options):
+        group = f'benchmark_{time.monotonic_ns()}'
+        total = options['messages']
+        channels = [await layer.new_channel('benchmark.') for _ in range(options['consumers'])]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        latencies = []
+        received = [0]
+        finished = asyncio.Event()
+
+        async def consume(channel):
+            while True:
+                message = await layer.receive(channel)
+                if message['type'] == 'benchmark.done':
+                    return
+                latencies.append(time.perf_counter() - message['sent'])
+                received[0] += 1
+
+        async def publish():
+            for seq in range(total):
+                await layer.group_send(group, {'type': 'benchmark.message', 'seq': seq, 'sent': time.perf_counter()})
+
+        consumers = [asyncio.ensure_future(consume(channel)) for channel in channels]
+        started = time.perf_counter()
+        if options['threaded']:
+            loop = asyncio.get_running_loop()
+
+            def run_publisher():
+                async_to_sync(publish)()
+                loop.call_soon_threadsafe(finished.set)
+
+            threading.Thread(target=run_publisher, daemon=True).start()
+            await finished.wait()
+        else:
+            await publish()
+
+        # Let the consumers drain, then stop them
+        expected = total * len(channels)
+        deadline = time.monotonic() + 10
+        last = -1
+        while received[0] < expected and time.monotonic() < deadline:
+            if received[0] == last:
+                # Nothing moved for a while: the rest was dropped
+                await asyncio.sleep(0.2)
+                if received[0] == last:
+                    break
+            last = received[0]
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        for channel in channels:
+            await layer.send(channel, {'type': 'benchmark.done'})
+        await asyncio.wait(consumers, timeout=5)
+        for channel in channels:
+            await layer.group_discard(group, channel)
+
+        latencies.sort()
+        return {
+            'messages': total,
+            'consumers': len(channels),
+            'delivered': received[0],
+            'dropped': expected - received[0],
+            'seconds': round(elapsed, 3),
+            'messages_per_second': received[0] / elapsed if elapsed else 0,
+            'latency_p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+            'latency_p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+        }
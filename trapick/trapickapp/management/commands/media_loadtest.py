@@ -0,0 +1,164 @@
+# trapickapp/management/commands/media_loadtest.py
+"""
+Load test for the video streaming endpoints.
+
+Opens many concurrent slow viewers against one or more targets and reports
+how many of them were actually being served. Run the same video through
+the WSGI server and the ASGI server to compare concurrent-viewer capacity:
+
+    gunicorn trapick.wsgi:application -w 4 --bind 127.0.0.1:8000
+    daphne -b 127.0.0.1 -p 8001 trapick.asgi:application
+
+    python manage.py media_loadtest \\
+        --target wsgi=http://127.0.0.1:8000/api/api/video/<id>/view/ \\
+        --target asgi=http://127.0.0.1:8001/api/api/video/<id>/stream/ \\
+        --clients 200 --read-rate 32768 --duration 20
+"""
+import asyncio
+import json
+import ssl
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent slow-viewer capacity of video streaming endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='label=url of a video endpoint to test (repeat to compare, e.g. wsgi=... asgi=...)'
+        )
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent viewers per target')
+        parser.add_argument(
+            '--read-rate', type=int, default=64 * 1024,
+            help='Bytes per second each viewer consumes (simulates slow mobile clients)'
+        )
+        parser.add_argument('--duration', type=float, default=15.0, help='Seconds each viewer stays connected')
+        parser.add_argument(
+            '--ttfb-timeout', type=float, default=5.0,
+            help='Viewers that wait longer than this for the first byte count as not served'
+        )
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        targets = []
+        for raw in options['target']:
+            label, sep, url = raw.partition('=')
+            if not sep or not url:
+                raise CommandError(f'Invalid --target "{raw}", expected label=url')
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https'):
+                raise CommandError(f'Unsupported scheme in {url}')
+            targets.append((label, parts))
+
+        results = []
+        for label, parts in targets:
+            self.stderr.write(f'🚦 Running {options["clients"]} viewers against {label} ({parts.geturl()})')
+            result = asyncio.run(self._run_target(parts, options))
+            result['target'] = label
+            result['url'] = parts.geturl()
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        header = f'{"target":<10} {"served":>8} {"errors":>7} {"ttfb p50":>9} {"ttfb p95":>9} {"peak":>6} {"MB/s":>8}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for r in results:
+            self.stdout.write(
+                f'{r["target"]:<10} {r["served"]:>8} {r["errors"]:>7} '
+                f'{r["ttfb_p50"]:>9.3f} {r["ttfb_p95"]:>9.3f} {r["peak_concurrent"]:>6} {r["throughput_mb_s"]:>8.2f}'
+            )
+
+    async def _run_target(self, parts, options):
+        stats = {
+            'ttfb': [],
+            'errors': 0,
+            'bytes': 0,
+            'active': 0,
+            'peak_concurrent': 0,
+        }
+        started = time.monotonic()
+        await asyncio.gather(*[
+            self._viewer(parts, options, stats) for _ in range(options['clients'])
+        ])
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        served = [t for t in stats['ttfb'] if t <= options['ttfb_timeout']]
+        ttfb_sorted = sorted(stats['ttfb'])
+        return {
+            'clients': options['clients'],
+            'served': len(served),
+            'errors': stats['errors'],
+            'ttfb_p50': statistics.median(ttfb_sorted) if ttfb_sorted else 0.0,
+            'ttfb_p95': ttfb_sorted[int(len(ttfb_sorted) * 0.95) - 1] if len(ttfb_sorted) >= 20 else (ttfb_sorted[-1] if ttfb_sorted else 0.0),
+            'peak_concurrent': stats['peak_concurrent'],
+            'throughput_mb_s': stats['bytes'] / elapsed / (1024 * 1024),
+            'elapsed_seconds': elapsed,
+        }
+
+    async def _viewer(self, parts, options, stats):
+        host = parts.hostname
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        ssl_context = ssl.create_default_context() if parts.scheme == 'https' else None
+
+        started = time.monotonic()
+        writer = None
+        streaming = False
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context),
+                timeout=options['ttfb_timeout'] + options['duration'],
+            )
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                f'User-Agent: trapick-media-loadtest\r\nConnection: close\r\n\r\n'.encode('latin-1')
+            )
+            await writer.drain()
+
+            # Wait as long as the test runs; how long the first byte took
+            # decides whether this viewer counts as served.
+            status_line = await asyncio.wait_for(reader.readline(), timeout=options['duration'])
+            stats['ttfb'].append(time.monotonic() - started)
+            if b' 200 ' not in status_line and b' 206 ' not in status_line:
+                stats['errors'] += 1
+                return
+
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+            streaming = True
+            stats['active'] += 1
+            stats['peak_concurrent'] = max(stats['peak_concurrent'], stats['active'])
+
+            tick = 0.1
+            per_tick = max(1, int(options['read_rate'] * tick))
+            deadline = started + options['duration']
+            while time.monotonic() < deadline:
+                chunk = await reader.read(per_tick)
+                if not chunk:
+                    break
+                stats['bytes'] += len(chunk)
+                await asyncio.sleep(tick)
+        except (OSError, asyncio.TimeoutError):
+            stats['errors'] += 1
+        finally:
+            if streaming:
+                stats['active'] -= 1
+            if writer is not None:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
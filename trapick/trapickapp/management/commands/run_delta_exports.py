@@ -0,0 +1,42 @@
+# trapickapp/management/commands/run_delta_exports.py
+"""
+Run the incremental export jobs configured in the 'delta_exports' SystemConfig.
+
+    python manage.py run_delta_exports               # jobs that are due
+    python manage.py run_delta_exports --job warehouse --force
+    python manage.py run_delta_exports --list
+
+Celery beat runs the same thing through the run_scheduled_exports task.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trapickapp.delta_exports import get_state, is_due, load_jobs, run_scheduled_jobs
+
+
+class Command(BaseCommand):
+    help = 'Export analyses/detections created since the last run of each delta export job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', action='append', dest='jobs', help='Only this job (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Run even if not due or disabled')
+        parser.add_argument('--list', action='store_true', help='Show jobs and their watermarks')
+
+    def handle(self, *args, **options):
+        jobs = load_jobs()
+        names = {job['name'] for job in jobs}
+        missing = [name for name in options['jobs'] or [] if name not in names]
+        if missing:
+            raise CommandError(f'Unknown or invalid job(s): {", ".join(missing)}')
+
+        if options['list']:
+            self.stdout.write(json.dumps([
+                {**job, 'due': is_due(job), 'state': get_state(job['name'])} for job in jobs
+            ], indent=2))
+            return
+
+        summaries = run_scheduled_jobs(job_names=options['jobs'], force=options['force'])
+        if not summaries:
+            self.stderr.write('Nothing due.')
+        self.stdout.write(json.dumps(summaries, indent=2))
@@ -0,0 +1,317 @@
+# trapickapp/management/commands/scan_media.py
+"""
+Cross-check MEDIA_ROOT against the database.
+
+Two passes, both in constant memory apart from the set of video filename
+stems:
+
+1. Walk MEDIA_ROOT on a thread pool (one directory per task). Workers hand
+   files over in small batches through a bounded queue, and each batch is
+   checked with a few bulk ``__in`` queries. Files no row refers to are
+   orphans, left behind by rows deleted through the admin or cascades.
+   Files in processed_videos/ also count as referenced when their name
+   contains a video's id or is named after a video's filename stem (see
+   _candidate_stems), which is how the processed video views find them.
+2. Stream VideoFile rows and stat their files on the same pool. Rows whose
+   original or processed video is gone get ``files_missing_since`` set;
+   rows whose files are back get it cleared. Archived originals are looked
+   up in the cold tier rather than MEDIA_ROOT.
+
+Orphans are only reported unless --delete is given, and files younger than
+--min-age-minutes are never touched since they may still be being written.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trapickapp.models import TrafficReport, UploadSession, VideoFile
+from trapickapp.storage_tiers import get_cold_storage
+
+UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+# Below SQLite's default limit on query parameters
+BATCH_SIZE = 500
+
+PROCESSED_DIR = 'processed_videos/'
+
+_DONE = object()
+
+# Where a processed file name may continue after the original's stem
+STEM_SEPARATOR_RE = re.compile(r'[_\-. ]')
+
+
+def _candidate_stems(basename):
+    """
+    Stems of originals a processed file may be named after: its name without
+    extension and ``processed_`` prefix, and every prefix of that ending at a
+    separator (``processed_clip_annotated.mp4`` -> ``clip_annotated``, ``clip``)
+    """
+    stem = os.path.splitext(basename)[0]
+    candidates = {stem}
+    if stem.startswith('processed_'):
+        stem = stem[len('processed_'):]
+        candidates.add(stem)
+    candidates.update(stem[:match.start()] for match in STEM_SEPARATOR_RE.finditer(stem) if match.start())
+    return candidates
+
+
+class MediaWalker:
+    """Parallel directory walk that yields batches of ``(relative_path, size, mtime)``"""
+
+    def __init__(self, root, pool, workers, exclude=(), batch_size=BATCH_SIZE):
+        self.root = root
+        self.pool = pool
+        self.exclude = {os.path.abspath(path) for path in exclude}
+        self.batch_size = batch_size
+        # Bounded so a fast walk cannot run ahead of the database checks
+        self._results = queue.Queue(maxsize=workers * 2)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def __iter__(self):
+        self._submit(self.root)
+        try:
+            while True:
+                item = self._results.get()
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            # Unblock workers if the consumer bailed out early
+            self._stopped.set()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._results.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _submit(self, directory):
+        if self._stopped.is_set():
+            return
+        with self._lock:
+            self._pending += 1
+        self.pool.submit(self._scan, directory)
+
+    def _scan(self, directory):
+        batch = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if os.path.abspath(entry.path) not in self.exclude:
+                            self._submit(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        relative_path = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                        batch.append((relative_path, stat.st_size, stat.st_mtime))
+                        if len(batch) >= self.batch_size:
+                            self._put(('files', batch))
+                            batch = []
+        except OSError as e:
+            self._put(('error', f'{directory}: {e}'))
+        finally:
+            if batch:
+                self._put(('files', batch))
+            with self._lock:
+                self._pending -= 1
+                finished = self._pending == 0
+            if finished:
+                self._put(_DONE)
+
+
+class Command(BaseCommand):
+    help = 'Find orphaned media files and videos whose files are missing, with a JSON summary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 4) * 2),
+                            help='Threads used for directory scanning and file checks')
+        parser.add_argument('--delete', action='store_true', help='Delete orphaned files')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report only: do not delete orphans or mark rows')
+        parser.add_argument('--min-age-minutes', type=int, default=60,
+                            help='Ignore orphans modified more recently than this')
+        parser.add_argument('--exclude', action='append', default=[],
+                            help='Directory under MEDIA_ROOT to skip (repeatable)')
+        parser.add_argument('--report-limit', type=int, default=100,
+                            help='Maximum paths/ids listed per category in the summary')
+
+    def handle(self, *args, **options):
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        self.report_limit = options['report_limit']
+        self.dry_run = options['dry_run']
+        self.video_stems = None
+        self.summary = {
+            'media_root': media_root,
+            'files_scanned': 0,
+            'bytes_scanned': 0,
+            'orphans': 0,
+            'orphan_bytes': 0,
+            'orphans_deleted': 0,
+            'videos_checked': 0,
+            'videos_missing_files': 0,
+            'videos_marked_missing': 0,
+            'videos_recovered': 0,
+            'orphan_paths': [],
+            'missing_videos': [],
+            'errors': [],
+        }
+
+        if not os.path.isdir(media_root):
+            self.summary['errors'].append(f'MEDIA_ROOT {media_root} does not exist')
+            self.stdout.write(json.dumps(self.summary, indent=2))
+            return
+
+        # Partial uploads are owned by cleanup_stale_uploads, cached charts by charts.prune_cache
+        exclude = [settings.UPLOAD_TEMP_DIR, settings.CHART_CACHE_DIR]
+        exclude += [os.path.join(media_root, path) for path in options['exclude']]
+        min_mtime = time.time() - options['min_age_minutes'] * 60
+        delete = options['delete'] and not self.dry_run
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for kind, payload in MediaWalker(media_root, pool, options['workers'], exclude):
+                if kind == 'error':
+                    self._error(payload)
+                else:
+                    self._check_files(media_root, payload, min_mtime, delete)
+
+            self._check_videos(pool)
+
+        self.stdout.write(json.dumps(self.summary, indent=2))
+
+    def _error(self, message):
+        if len(self.summary['errors']) < self.report_limit:
+            self.summary['errors'].append(message)
+
+    def _referenced(self, names):
+        """Subset of ``names`` that some row points at"""
+        referenced = set(VideoFile.objects.filter(file_path__in=names).values_list('file_path', flat=True))
+        referenced.update(
+            VideoFile.objects.filter(processed_video_path__in=names).values_list('processed_video_path', flat=True)
+        )
+        referenced.update(
+            UploadSession.objects.filter(temp_path__in=names, status='active').values_list('temp_path', flat=True)
+        )
+        referenced.update(
+            TrafficReport.objects.filter(artifact__in=names).values_list('artifact', flat=True)
+        )
+
+        # Processed videos are also found by a video id in their filename
+        ids_by_name = {}
+        for name in names:
+            if name not in referenced:
+                match = UUID_RE.search(os.path.basename(name))
+                if match:
+                    ids_by_name[name] = match.group(0).lower()
+        if ids_by_name:
+            known_ids = {
+                str(video_id) for video_id in
+                VideoFile.objects.filter(id__in=set(ids_by_name.values())).values_list('id', flat=True)
+            }
+            referenced.update(name for name, video_id in ids_by_name.items() if video_id in known_ids)
+
+        # ... or just by the original's filename stem (see find_processed_video_path)
+        for name in names:
+            if name not in referenced and name.startswith(PROCESSED_DIR):
+                if not self._video_stems().isdisjoint(_candidate_stems(os.path.basename(name))):
+                    referenced.add(name)
+        return referenced
+
+    def _video_stems(self):
+        """Filename stems of all videos, loaded once per run"""
+        if self.video_stems is None:
+            filenames = VideoFile.objects.order_by().values_list('filename', flat=True).distinct()
+            self.video_stems = {
+                stem for stem in (os.path.splitext(filename)[0] for filename in filenames.iterator()) if stem
+            }
+        return self.video_stems
+
+    def _check_files(self, media_root, batch, min_mtime, delete):
+        self.summary['files_scanned'] += len(batch)
+        self.summary['bytes_scanned'] += sum(size for _, size, _ in batch)
+
+        referenced = self._referenced([name for name, _, _ in batch])
+        for name, size, mtime in batch:
+            if name in referenced or mtime > min_mtime:
+                continue
+
+            self.summary['orphans'] += 1
+            self.summary['orphan_bytes'] += size
+            if len(self.summary['orphan_paths']) < self.report_limit:
+                self.summary['orphan_paths'].append(name)
+
+            if delete:
+                try:
+                    os.remove(os.path.join(media_root, name))
+                    self.summary['orphans_deleted'] += 1
+                except OSError as e:
+                    self._error(f'{name}: {e}')
+
+    def _check_videos(self, pool):
+        storage = VideoFile.file_path.field.storage
+        cold = get_cold_storage()
+
+        def missing_files(row):
+            _, file_path, processed_path, storage_tier, _ = row
+            missing = []
+            if file_path:
+                if storage_tier == 'cold':
+                    found = cold.exists(file_path)
+                else:
+                    found = os.path.exists(storage.path(file_path))
+                if not found:
+                    missing.append('original')
+            if processed_path and not os.path.exists(storage.path(processed_path)):
+                missing.append('processed')
+            return missing
+
+        rows = (
+            VideoFile.objects
+            .order_by()
+            .values_list('id', 'file_path', 'processed_video_path', 'storage_tier', 'files_missing_since')
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= BATCH_SIZE:
+                self._record_videos(chunk, pool.map(missing_files, chunk))
+                chunk = []
+        if chunk:
+            self._record_videos(chunk, pool.map(missing_files, chunk))
+
+    def _record_videos(self, rows, results):
+        newly_missing = []
+        recovered = []
+        for row, missing in zip(rows, results):
+            video_id, missing_since = row[0], row[4]
+            self.summary['videos_checked'] += 1
+            if missing:
+                self.summary['videos_missing_files'] += 1
+                if len(self.summary['missing_videos']) < self.report_limit:
+                    self.summary['missing_videos'].append({'video_id': str(video_id), 'missing': missing})
+                if missing_since is None:
+                    newly_missing.append(video_id)
+            elif missing_since is not None:
+                recovered.append(video_id)
+
+        self.summary['videos_marked_missing'] += len(newly_missing)
+        self.summary['videos_recovered'] += len(recovered)
+        if self.dry_run:
+            return
+        if newly_missing:
+            VideoFile.objects.filter(id__in=newly_missing).update(files_missing_since=timezone.now())
+        if recovered:
+            VideoFile.objects.filter(id__in=recovered).update(files_missing_since=None)
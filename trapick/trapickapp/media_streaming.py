@@ -0,0 +1,161 @@
+# trapickapp/media_streaming.py
+"""
+Helpers for streaming media files without pinning a worker per viewer.
+
+The async views in ``async_views.py`` use these to serve processed videos
+under ASGI (daphne/uvicorn). File reads are offloaded to a thread one chunk
+at a time, so a slow client only holds an idle coroutine between chunks
+instead of a whole WSGI worker thread. Under WSGI the same responses are
+streamed from a plain generator, since Django 4.2 would collect an async
+iterator into memory before sending it there.
+"""
+import asyncio
+import os
+import re
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, HttpResponse
+
+# Size of each read handed to the event loop. Small enough to keep memory
+# per viewer tiny, large enough that thread hand-offs stay cheap.
+STREAM_CHUNK_SIZE = getattr(settings, 'MEDIA_STREAM_CHUNK_SIZE', 256 * 1024)
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def find_processed_video_path(video_obj):
+    """
+    Locate the processed video file for a VideoFile.
+
+    Mirrors the lookup order of ProcessedVideoViewAPI: the stored
+    processed_video_path first, then a filename match in the
+    processed_videos directory. Returns an absolute path or None.
+    """
+    if video_obj.processed_video_path:
+        try:
+            file_path = video_obj.processed_video_path.path
+        except (ValueError, NotImplementedError):
+            file_path = None
+        if file_path and os.path.exists(file_path):
+            return file_path
+
+    processed_videos_dir = os.path.join(settings.MEDIA_ROOT, 'processed_videos')
+    if not os.path.isdir(processed_videos_dir):
+        return None
+
+    video_base_name = os.path.splitext(video_obj.filename)[0]
+    with os.scandir(processed_videos_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if video_base_name in entry.name or str(video_obj.id) in entry.name:
+                return entry.path
+    return None
+
+
+def parse_range_header(range_header, file_size):
+    """
+    Parse a single-range ``Range: bytes=start-end`` header.
+
+    Returns ``(start, end)`` inclusive, ``None`` when no usable range was
+    sent, or raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header:
+        return None
+
+    match = _RANGE_RE.match(range_header.strip())
+    if not match:
+        # Multi-range or malformed requests fall back to the full file
+        return None
+
+    start_str, end_str = match.groups()
+    if not start_str and not end_str:
+        return None
+
+    if not start_str:
+        # Suffix range: the last N bytes
+        length = int(end_str)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        start = max(0, file_size - length)
+        end = file_size - 1
+    else:
+        start = int(start_str)
+        end = int(end_str) if end_str else file_size - 1
+        end = min(end, file_size - 1)
+
+    if start >= file_size or start > end:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+async def aiter_file_range(file_path, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield ``length`` bytes of a file from ``start`` using thread-offloaded reads."""
+    handle = await asyncio.to_thread(open, file_path, 'rb')
+    try:
+        if start:
+            await asyncio.to_thread(handle.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(handle.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+
+def iter_file_range(file_path, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield ``length`` bytes of a file from ``start``; the WSGI counterpart of aiter_file_range"""
+    with open(file_path, 'rb') as handle:
+        if start:
+            handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def build_streaming_file_response(request, file_path, filename, content_type='video/mp4', disposition='inline'):
+    """
+    Build a StreamingHttpResponse over the file, read through an async
+    iterator under ASGI and a sync one under WSGI.
+
+    Honours single byte ranges so browsers can seek within a video without
+    downloading it from the start.
+    """
+    file_size = os.path.getsize(file_path)
+    iter_range = aiter_file_range if isinstance(request, ASGIRequest) else iter_file_range
+
+    try:
+        byte_range = parse_range_header(request.headers.get('Range'), file_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{file_size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_range(file_path, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+    else:
+        length = file_size
+        response = StreamingHttpResponse(
+            iter_range(file_path, 0, length),
+            content_type=content_type,
+        )
+
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'{disposition}; filename="processed_{filename}"'
+    return response
@@ -0,0 +1,49 @@
+# trapickapp/metrics.py
+"""
+In-process counters and gauges for operational metrics.
+
+Values live in the memory of the process that records them (each gunicorn
+worker or Celery process has its own set) and are exposed through
+/api/debug/metrics/. They are meant for spotting trends like cache hit rates
+or queue drops, not as durable statistics.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_started_at = time.time()
+
+
+def incr(name, value=1):
+    """Add ``value`` to counter ``name``"""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name, value):
+    """Record the current value of gauge ``name``"""
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot(prefix=''):
+    """Copy of the counters and gauges whose names start with ``prefix``"""
+    with _lock:
+        counters = {name: value for name, value in _counters.items() if name.startswith(prefix)}
+        gauges = {name: value for name, value in _gauges.items() if name.startswith(prefix)}
+    return {
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started_at, 1),
+        'counters': dict(sorted(counters.items())),
+        'gauges': dict(sorted(gauges.items())),
+    }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
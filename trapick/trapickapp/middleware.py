@@ -0,0 +1,231 @@
+# trapickapp/middleware.py
+"""
+Response middleware for the API.
+
+CompressionMiddleware: negotiated response compression.
+
+Picks Brotli or gzip from the client's Accept-Encoding (honouring q-values;
+Brotli only when the ``brotli`` package is installed) and compresses text,
+JSON and MessagePack responses, streamed ones included. Videos, images,
+archives and other binary downloads, partial content (Range) responses and
+anything that already has a Content-Encoding pass through untouched, so
+seeking in videos keeps working and nothing is compressed twice.
+
+DataVersionETagMiddleware: conditional GET for read-mostly analytics
+endpoints. The ETag is derived from the DataVersion counters (bumped by
+model signals) before the view runs, so a matching If-None-Match gets a 304
+without the view computing anything. Writes that bypass signals (queryset
+``update()``, ``bulk_create``) and "today"-relative figures are covered by
+a time bucket in the tag, so no response is reused for longer than
+ETAG_TIME_BUCKET_SECONDS.
+"""
+import gzip
+import hashlib
+import time
+import zlib
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+
+from .models import DataVersion
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/msgpack',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# Not worth the CPU (or the headers) below this size
+MIN_COMPRESS_SIZE = 200
+
+GZIP_LEVEL = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+BROTLI_QUALITY = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+
+def choose_encoding(accept_encoding):
+    """Best supported encoding in an Accept-Encoding header, or None"""
+    supported = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+    best, best_q = None, 0.0
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if coding == '*':
+            coding = supported[0]
+        if coding not in supported:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        # Ties go to the earlier entry of ``supported``, i.e. Brotli
+        if q > best_q or (q == best_q and best and supported.index(coding) < supported.index(best)):
+            best, best_q = coding, q
+    return best
+
+
+def compress_bytes(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL)
+
+
+class _StreamCompressor:
+    """Compresses chunk by chunk, flushing each one so streamed data is not held back"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _compress_sequence(iterator, encoding):
+    compressor = _StreamCompressor(encoding)
+    for chunk in iterator:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _acompress_sequence(iterator, encoding):
+    compressor = _StreamCompressor(encoding)
+    async for chunk in iterator:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """gzip/Brotli compression of compressible responses"""
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < MIN_COMPRESS_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_sequence(response.streaming_content, encoding)
+            else:
+                response.streaming_content = _compress_sequence(response.streaming_content, encoding)
+            # The compressed size is not known until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag would promise byte-identical bodies across encodings
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# URL names of the endpoints answered from DataVersion ETags
+ETAG_URL_NAMES = getattr(settings, 'ETAG_URL_NAMES', (
+    'analysis_overview', 'vehicle_stats', 'congestion_data',
+    'all_groups', 'group_analysis_detail', 'location_groups', 'location_group_videos',
+    'location_group_list', 'location_groups_with_videos',
+    'get_predictions', 'prediction_insights', 'peak_hours',
+))
+
+
+def data_version_etag(request, location_id=None):
+    """Weak ETag of a request against the current data version"""
+    key = DataVersion.location_key(location_id) if location_id else DataVersion.GLOBAL
+    version = DataVersion.current([key])[key]
+    bucket = int(time.time() // getattr(settings, 'ETAG_TIME_BUCKET_SECONDS', 300))
+    digest = hashlib.sha1('|'.join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        key, str(version), str(bucket),
+    ]).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _etag_matches(etag, if_none_match):
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison (RFC 9110 13.1.2)
+    bare = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == bare for candidate in parse_etags(if_none_match))
+
+
+class DataVersionETagMiddleware(MiddlewareMixin):
+    """Answer unchanged GETs of the ETAG_URL_NAMES endpoints with 304 Not Modified"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.url_name not in ETAG_URL_NAMES:
+            return None
+
+        location_id = view_kwargs.get('location_id') or request.GET.get('location_id')
+        etag = data_version_etag(request, location_id if str(location_id or '').isdigit() else None)
+        request.data_version_etag = etag
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and _etag_matches(etag, if_none_match):
+            response = HttpResponseNotModified()
+            self._tag(response, etag)
+            return response
+        return None
+
+    def process_response(self, request, response):
+        etag = getattr(request, 'data_version_etag', None)
+        if (etag and response.status_code == 200 and not response.has_header('ETag')
+                and 'no-store' not in response.get('Cache-Control', '')):
+            self._tag(response, etag)
+        return response
+
+    @staticmethod
+    def _tag(response, etag):
+        response.headers['ETag'] = etag
+        # Let browsers keep the body but revalidate it on every poll
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept',))
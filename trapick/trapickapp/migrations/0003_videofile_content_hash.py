@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0002_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0003_videofile_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='storage_tier',
+            field=models.CharField(choices=[('hot', 'Hot (MEDIA_ROOT)'), ('cold', 'Cold (archived)')], default='hot', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='tier_changed_at',
+            field=models.DateTimeField(blank=True, help_text='When the original last moved between tiers', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['storage_tier', 'uploaded_at'], name='trapickapp__storage_5fa925_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0004_videofile_storage_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='files_missing_since',
+            field=models.DateTimeField(blank=True, help_text='When a referenced media file was first found missing', null=True),
+        ),
+    ]
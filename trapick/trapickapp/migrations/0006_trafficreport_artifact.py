@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0005_videofile_files_missing_since'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trafficreport',
+            name='artifact',
+            field=models.FileField(blank=True, null=True, upload_to='reports/'),
+        ),
+        migrations.AddField(
+            model_name='trafficreport',
+            name='file_format',
+            field=models.CharField(blank=True, choices=[('pdf', 'PDF'), ('excel', 'Excel')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='trafficreport',
+            name='source_analyzed_at',
+            field=models.DateTimeField(blank=True, help_text='analyzed_at of the analysis this file was rendered from', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='trafficreport',
+            index=models.Index(fields=['traffic_analysis', 'file_format', 'source_analyzed_at'], name='trapickapp__traffic_53d5e9_idx'),
+        ),
+    ]
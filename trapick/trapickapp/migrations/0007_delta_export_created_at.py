@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-19 00:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0006_trafficreport_artifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='trafficanalysis',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
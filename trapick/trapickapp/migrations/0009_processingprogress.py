@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-19 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0008_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.CharField(max_length=64, unique=True)),
+                ('data', models.JSONField(default=dict)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -1,5 +1,5 @@
 # trapickapp/models.py
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 import uuid
 import os
@@ -62,15 +62,9 @@ class ProcessingProfile(models.Model):
         return f"{self.display_name} ({self.get_road_type_display()})"
     
     def get_detector_instance(self):
-        """Dynamically import and return the detector instance"""
-        try:
-            module = __import__(self.detector_module, fromlist=[self.detector_class])
-            detector_class = getattr(module, self.detector_class)
-            return detector_class(**self.config_parameters)
-        except (ImportError, AttributeError) as e:
-            print(f"❌ [DETECTOR] Error loading detector {self.detector_class}: {e}")
-            from ml.vehicle_detector import RTXVehicleDetector
-            return RTXVehicleDetector()
+        """Detector for this profile, shared per worker process (see detectors.py)"""
+        from .detectors import get_detector
+        return get_detector(self)
 
 class Location(models.Model):
     name = models.CharField(max_length=100)
@@ -186,11 +180,29 @@ class VideoFile(models.Model):
     title = models.CharField(max_length=200, null=True, blank=True)
     resolution = models.CharField(max_length=20, null=True, blank=True)
 
+    # SHA-256 of the original file, used to detect re-uploads of the same footage
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    # STORAGE TIER OF THE ORIGINAL (processed outputs always stay hot)
+    storage_tier = models.CharField(
+        max_length=10,
+        choices=[
+            ('hot', 'Hot (MEDIA_ROOT)'),
+            ('cold', 'Cold (archived)'),
+        ],
+        default='hot'
+    )
+    tier_changed_at = models.DateTimeField(null=True, blank=True, help_text="When the original last moved between tiers")
+
+    # Set by the scan_media command when a referenced file is gone, cleared when it is back
+    files_missing_since = models.DateTimeField(null=True, blank=True, help_text="When a referenced media file was first found missing")
+
     class Meta:
         ordering = ['-uploaded_at']
         indexes = [
             models.Index(fields=['processing_status']),
             models.Index(fields=['location_date_group', 'video_date']),
+            models.Index(fields=['storage_tier', 'uploaded_at']),
         ]
 
     def __str__(self):
@@ -201,6 +213,53 @@ class VideoFile(models.Model):
             return f"{self.video_start_time.strftime('%H:%M')} - {self.video_end_time.strftime('%H:%M')}"
         return "Time unknown"
 
+    def get_original_path(self):
+        """Absolute path of the original upload, rehydrated from cold storage if archived"""
+        from .storage_tiers import ensure_original_local
+        return ensure_original_local(self)
+
+class UploadSession(models.Model):
+    """Resumable chunked upload of a single video file"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(help_text="Expected size of the complete file in bytes")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received and written to disk so far")
+    temp_path = models.CharField(max_length=500, help_text="Partial file path relative to MEDIA_ROOT")
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('active', 'Active'),
+            ('completed', 'Completed'),
+            ('aborted', 'Aborted'),
+        ],
+        default='active'
+    )
+    # Video metadata supplied when the session was created (title, location_id, video_date, ...)
+    metadata = models.JSONField(default=dict, blank=True)
+    video_file = models.ForeignKey(
+        VideoFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_sessions'
+    )
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.total_size} bytes, {self.status})"
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.total_size
+
 class TrafficAnalysis(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     video_file = models.OneToOneField(
@@ -214,6 +273,8 @@ class TrafficAnalysis(models.Model):
     total_vehicles = models.IntegerField(default=0)
     processing_time_seconds = models.FloatField(default=0)
     analyzed_at = models.DateTimeField(default=timezone.now)
+    # Insert time, used as the high-water mark of incremental exports
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     
     # VEHICLE TYPE COUNTS
     car_count = models.IntegerField(default=0)
@@ -316,6 +377,7 @@ class Detection(models.Model):
         null=True,
         blank=True
     )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         indexes = [
@@ -383,11 +445,21 @@ class TrafficReport(models.Model):
     average_daily_traffic = models.FloatField(default=0)
     peak_hours = models.JSONField(default=list)
     congestion_trends = models.JSONField(default=dict)
+
+    # RENDERED EXPORT (PDF/Excel), cached per analysis version
+    FILE_FORMATS = [
+        ('pdf', 'PDF'),
+        ('excel', 'Excel'),
+    ]
+    file_format = models.CharField(max_length=10, choices=FILE_FORMATS, blank=True, default='')
+    artifact = models.FileField(upload_to='reports/', null=True, blank=True)
+    source_analyzed_at = models.DateTimeField(null=True, blank=True, help_text="analyzed_at of the analysis this file was rendered from")
     
     class Meta:
         indexes = [
             models.Index(fields=['generated_at']),
             models.Index(fields=['location', 'generated_at']),
+            models.Index(fields=['traffic_analysis', 'file_format', 'source_analyzed_at']),
         ]
         ordering = ['-generated_at']
 
@@ -482,11 +554,156 @@ class SystemConfig(models.Model):
         ordering = ['key']
 
 
+class ProcessingProgress(models.Model):
+    """Latest progress of a video being processed, for DatabaseProgressBackend (see progress.py)"""
+    video_id = models.CharField(max_length=64, unique=True)
+    data = models.JSONField(default=dict)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.video_id}: {self.data.get('progress')}%"
+
+
+class DataVersion(models.Model):
+    """
+    Change counter for a slice of the analytics data ('global' or
+    'location:<id>'), bumped by the signal handlers below. Read-mostly
+    endpoints derive their ETags from it instead of recomputing responses.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    GLOBAL = 'global'
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+    @staticmethod
+    def location_key(location_id):
+        return f'location:{location_id}'
+
+    @classmethod
+    def current(cls, keys):
+        """{key: version} for ``keys``, 0 for counters never bumped"""
+        versions = dict(cls.objects.filter(key__in=keys).values_list('key', 'version'))
+        return {key: versions.get(key, 0) for key in keys}
+
+    @classmethod
+    def bump(cls, *keys):
+        """Increment counters once the current transaction commits"""
+        def apply():
+            for key in keys:
+                updated = cls.objects.filter(key=key).update(
+                    version=models.F('version') + 1, updated_at=timezone.now()
+                )
+                if not updated:
+                    try:
+                        with transaction.atomic():
+                            cls.objects.create(key=key, version=1)
+                    except IntegrityError:
+                        # Created concurrently; count this change on top of it
+                        cls.objects.filter(key=key).update(version=models.F('version') + 1)
+
+        # After commit, so readers never see a new version before the new data,
+        # and writers do not queue up on the counter row inside long transactions
+        transaction.on_commit(apply)
+
+
 # SIGNAL HANDLERS
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 
 
+def _location_id_of(instance):
+    if isinstance(instance, Location):
+        return instance.pk
+    if isinstance(instance, VideoFile):
+        group = instance.location_date_group_id and LocationDateGroup.objects.filter(
+            pk=instance.location_date_group_id
+        ).values_list('location_id', flat=True).first()
+        return group or None
+    return getattr(instance, 'location_id', None)
+
+
+def bump_data_version(sender, instance, origin=None, **kwargs):
+    """Mark analytics data as changed, globally and for the instance's location"""
+    keys = [DataVersion.GLOBAL]
+    location_id = _location_id_of(instance)
+    if location_id:
+        keys.append(DataVersion.location_key(location_id))
+
+    if origin is not None and origin is not instance:
+        # Rows deleted by a queryset or cascade: bump each key once per delete(),
+        # not once per detection
+        bumped = origin.__dict__.get('_data_versions_bumped')
+        if bumped is None:
+            bumped = origin.__dict__['_data_versions_bumped'] = set()
+            transaction.on_commit(lambda: origin.__dict__.pop('_data_versions_bumped', None))
+        keys = [key for key in keys if key not in bumped]
+        if not keys:
+            return
+        bumped.update(keys)
+    DataVersion.bump(*keys)
+
+
+for _model in (VideoFile, TrafficAnalysis, Detection, Location, LocationDateGroup,
+               HourlyTrafficSummary, DailyTrafficSummary, TrafficPrediction):
+    post_save.connect(bump_data_version, sender=_model, dispatch_uid=f'data_version_save_{_model.__name__}')
+    post_delete.connect(bump_data_version, sender=_model, dispatch_uid=f'data_version_delete_{_model.__name__}')
+
+
+def _group_locations(group_ids):
+    group_ids = [group_id for group_id in group_ids if group_id]
+    if not group_ids:
+        return []
+    return list(LocationDateGroup.objects.filter(pk__in=group_ids).values_list('location_id', flat=True))
+
+
+@receiver(post_init, sender=VideoFile)
+def remember_video_state(sender, instance, **kwargs):
+    """Keep the loaded status and group, to tell what a later save changed"""
+    # __dict__ so deferred fields are not fetched just for this
+    instance._notified_state = (
+        instance.__dict__.get('processing_status'), instance.__dict__.get('location_date_group_id')
+    )
+
+
+@receiver(post_save, sender=VideoFile)
+def notify_video_change(sender, instance, created, **kwargs):
+    """Publish status and group membership changes of a video"""
+    from .notifications import publish
+
+    old_status, old_group_id = (None, None) if created else instance._notified_state
+    status, group_id = instance.processing_status, instance.location_date_group_id
+    instance._notified_state = (status, group_id)
+
+    if created or old_group_id != group_id:
+        publish('video_group', instance.pk, group_id, old_group_id,
+                location_ids=_group_locations([group_id, old_group_id]), status=status)
+    elif old_status != status:
+        publish('video_status', instance.pk, group_id,
+                location_ids=_group_locations([group_id]), status=status)
+
+
+@receiver(post_delete, sender=VideoFile)
+def notify_video_deleted(sender, instance, **kwargs):
+    from .notifications import publish
+
+    group_id = instance.location_date_group_id
+    publish('video_deleted', instance.pk, group_id, location_ids=_group_locations([group_id]))
+
+
+@receiver(post_save, sender=TrafficAnalysis)
+def notify_analysis_created(sender, instance, created, **kwargs):
+    from .notifications import publish
+
+    if created:
+        group_id = instance.video_file.location_date_group_id if instance.video_file_id else None
+        publish('analysis_created', instance.video_file_id, group_id,
+                location_ids=[instance.location_id] + _group_locations([group_id]), status='completed')
+
+
 @receiver(post_save, sender=TrafficAnalysis)
 def update_video_file_status(sender, instance, created, **kwargs):
     """Update VideoFile status when analysis is created"""
@@ -546,6 +763,22 @@ def update_traffic_analysis_counts(sender, instance, created, **kwargs):
         )
         analysis.save()
 
+@receiver(post_save, sender=TrafficAnalysis)
+def invalidate_rendered_reports(sender, instance, created, **kwargs):
+    """Drop cached PDF/Excel renders once the analysis they were built from changes"""
+    if not created:
+        TrafficReport.objects.filter(traffic_analysis=instance).exclude(file_format='').delete()
+
+
+@receiver(post_delete, sender=TrafficReport)
+def delete_report_artifact(sender, instance, **kwargs):
+    """Remove the rendered file with its report, including cascaded deletes"""
+    if instance.artifact:
+        name = instance.artifact.name
+        storage = instance.artifact.storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
 @receiver(post_save, sender=TrafficAnalysis)
 def auto_group_video_after_analysis(sender, instance, created, **kwargs):
     """
@@ -0,0 +1,68 @@
+# trapickapp/notifications.py
+"""
+Data-change notifications pushed to NotificationConsumer (ws/notifications/).
+
+Model signals (see the handlers at the end of models.py) publish compact
+events once the transaction commits:
+
+    {"type": "data_changed", "kind": "video_status" | "video_group" |
+     "video_deleted" | "analysis_created",
+     "id", "video_id", "group_id", "previous_group_id", "location_id", "status"}
+
+Each event goes to the channel group of the video's location-date group and
+of its location (old and new, when a video moves between groups), and to the
+``all`` group for overview pages. A connection subscribed to several of them
+forwards an event once, by its ``id``. Clients subscribe to what they
+display and refetch only that when an event arrives, instead of polling.
+"""
+import logging
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ALL_GROUP = 'notify_all'
+
+
+def location_group_name(location_id):
+    return f'notify_location_{location_id}'
+
+
+def group_group_name(group_id):
+    return f'notify_group_{group_id}'
+
+
+def _send(event, targets):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        for target in targets:
+            async_to_sync(channel_layer.group_send)(target, event)
+    except Exception as e:
+        # Notifications are a hint to refetch; never fail the write over one
+        logger.warning(f"⚠️ Could not publish {event['kind']} notification: {e}")
+
+
+def publish(kind, video_id=None, group_id=None, previous_group_id=None, location_ids=(), status=None):
+    """Send a data_changed event to the given groups and locations after commit"""
+    group_id = str(group_id) if group_id else None
+    previous_group_id = str(previous_group_id) if previous_group_id and str(previous_group_id) != group_id else None
+    location_ids = [location_id for location_id in dict.fromkeys(location_ids) if location_id]
+    event = {
+        'type': 'data_changed',
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'video_id': str(video_id) if video_id else None,
+        'group_id': group_id,
+        'previous_group_id': previous_group_id,
+        'location_id': location_ids[0] if location_ids else None,
+        'status': status,
+    }
+    targets = [ALL_GROUP]
+    targets += [group_group_name(value) for value in (group_id, previous_group_id) if value]
+    targets += [location_group_name(location_id) for location_id in location_ids]
+    transaction.on_commit(lambda: _send(event, targets))
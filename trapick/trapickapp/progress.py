@@ -1,49 +1,288 @@
 # trapickapp/progress.py
+"""
+Video processing progress, shared between the process running the analysis
+and whichever process serves the WebSocket or polling request.
+
+The store is pluggable through PROGRESS_BACKEND:
+
+- RedisProgressBackend: one key per video with a Redis TTL (used when
+  REDIS_URL is configured)
+- DatabaseProgressBackend: the ProcessingProgress table, for single-host
+  deployments without Redis
+- MemoryProgressBackend: a per-process dict, only for tests and scripts
+
+Each write replaces a video's whole record in one operation, so a reader
+never sees the progress of one update with the message of another. Entries
+expire PROGRESS_TTL_SECONDS (600) after their last update.
+
+ProgressTracker.set_progress only hands the update to a background sender,
+so a detector can report every frame: the sender coalesces to the latest
+value per video and sends at most every PROGRESS_MIN_INTERVAL_SECONDS, and
+only changes of PROGRESS_MIN_DELTA percent or more. 100% and the completion
+event are sent synchronously, after any pending update.
+"""
 import json
-import os
+import threading
 import time
+from datetime import timedelta
+
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+def progress_ttl():
+    return getattr(settings, 'PROGRESS_TTL_SECONDS', 600)
+
+
+class MemoryProgressBackend:
+    """Per-process store; progress is not visible to other processes"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def set(self, video_id, data):
+        with self._lock:
+            self._data[video_id] = (time.time() + progress_ttl(), data)
+
+    def get(self, video_id):
+        with self._lock:
+            entry = self._data.get(video_id)
+            if entry is None:
+                return None
+            expires, data = entry
+            if time.time() > expires:
+                del self._data[video_id]
+                return None
+            return data
+
+    def delete(self, video_id):
+        with self._lock:
+            self._data.pop(video_id, None)
+
+
+class DatabaseProgressBackend:
+    """Store in the ProcessingProgress table; expired rows are purged while writing"""
+
+    # Seconds between purges of expired rows, per process
+    PURGE_INTERVAL = 60
+
+    def __init__(self):
+        self._last_purge = 0.0
+
+    def set(self, video_id, data):
+        from .models import ProcessingProgress
+
+        expires_at = timezone.now() + timedelta(seconds=progress_ttl())
+        updated = ProcessingProgress.objects.filter(video_id=video_id).update(data=data, expires_at=expires_at)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    ProcessingProgress.objects.create(video_id=video_id, data=data, expires_at=expires_at)
+            except IntegrityError:
+                # Created concurrently by another writer; ours is the newer update
+                ProcessingProgress.objects.filter(video_id=video_id).update(data=data, expires_at=expires_at)
+
+        if time.monotonic() - self._last_purge > self.PURGE_INTERVAL:
+            self._last_purge = time.monotonic()
+            ProcessingProgress.objects.filter(expires_at__lt=timezone.now()).delete()
+
+    def get(self, video_id):
+        from .models import ProcessingProgress
+
+        return ProcessingProgress.objects.filter(
+            video_id=video_id, expires_at__gte=timezone.now()
+        ).values_list('data', flat=True).first()
+
+    def delete(self, video_id):
+        from .models import ProcessingProgress
+
+        ProcessingProgress.objects.filter(video_id=video_id).delete()
+
+
+class RedisProgressBackend:
+    """Store in Redis, one JSON value per video expiring by itself"""
+
+    KEY_PREFIX = 'trapick:progress:'
+
+    def __init__(self, url=None):
+        import redis
+
+        self._client = redis.Redis.from_url(url or settings.PROGRESS_REDIS_URL)
+
+    def set(self, video_id, data):
+        self._client.set(self.KEY_PREFIX + video_id, json.dumps(data), ex=progress_ttl())
+
+    def get(self, video_id):
+        value = self._client.get(self.KEY_PREFIX + video_id)
+        return json.loads(value) if value else None
+
+    def delete(self, video_id):
+        self._client.delete(self.KEY_PREFIX + video_id)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_progress_backend():
+    """The configured progress backend, created once per process"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(
+                    settings, 'PROGRESS_BACKEND', 'trapickapp.progress.DatabaseProgressBackend'
+                ))()
+    return _backend
+
+
+def get_progress(video_id):
+    """Latest progress of a video, or None when unknown or expired"""
+    try:
+        return get_progress_backend().get(str(video_id))
+    except Exception as e:
+        print(f"Progress store error: {e}")
+        return None
+
+
+class _ProgressSender:
+    """
+    Background thread sending progress for every tracker in the process.
+
+    Only the latest pending update of a video is kept. It is sent once
+    PROGRESS_MIN_INTERVAL_SECONDS have passed since that video's previous
+    send and it differs by at least PROGRESS_MIN_DELTA percent (or has a new
+    message); smaller changes wait, replaced by whatever comes next.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, tracker, data):
+        with self._cond:
+            self._pending[tracker.video_id] = (tracker, data)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='progress-sender', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def take(self, video_id):
+        """Remove and return a video's pending update, if any"""
+        with self._cond:
+            entry = self._pending.pop(video_id, None)
+        return entry[1] if entry else None
+
+    def _due(self, now):
+        """Pop the updates that may be sent now; also return when the next one becomes due"""
+        interval = getattr(settings, 'PROGRESS_MIN_INTERVAL_SECONDS', 0.5)
+        due, next_at = [], None
+        for video_id, (tracker, data) in list(self._pending.items()):
+            if not tracker.is_significant(data):
+                continue
+            send_at = tracker.last_sent_at + interval
+            if send_at <= now:
+                due.append(self._pending.pop(video_id))
+            elif next_at is None or send_at < next_at:
+                next_at = send_at
+        return due, next_at
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due, next_at = self._due(time.monotonic())
+                while not due:
+                    self._cond.wait(None if next_at is None else max(0.0, next_at - time.monotonic()))
+                    due, next_at = self._due(time.monotonic())
+            for tracker, data in due:
+                try:
+                    tracker.send(data)
+                except Exception as e:
+                    print(f"Progress sender error: {e}")
+            close_old_connections()
+
+
+_sender = _ProgressSender()
 
-# Simple in-memory progress storage for development
-progress_store = {}
 
 class ProgressTracker:
     def __init__(self, video_id):
         self.video_id = str(video_id)
         self.channel_layer = get_channel_layer()
         self.room_group_name = f'video_progress_{self.video_id}'
-    
+        self.store = get_progress_backend()
+        self.last_sent = None
+        self.last_sent_at = 0.0
+        self._send_lock = threading.Lock()
+
     def set_progress(self, progress, message=""):
-        """Set progress percentage and message with WebSocket broadcast"""
+        """
+        Record progress; it is stored and broadcast from the background
+        sender, rate limited and coalesced, so this never blocks the caller.
+        100% is delivered straight away.
+        """
         data = {
             'progress': max(0, min(100, progress)),
             'message': message,
             'timestamp': time.time()
         }
-        
-        progress_store[self.video_id] = data
-        
-        # Broadcast progress update via WebSocket
-        try:
-            async_to_sync(self.channel_layer.group_send)(
-                self.room_group_name,
-                {
-                    'type': 'progress_update',
-                    'progress': data['progress'],
-                    'message': data['message']
-                }
-            )
-            print(f"✓ Progress broadcast: {data['progress']}% - {message}")
-        except Exception as e:
-            print(f"WebSocket error: {e}")
-            # Fallback: store in progress_store for HTTP polling
-            progress_store[self.video_id] = data
-        
-        print(f"Progress updated for {self.video_id}: {progress}% - {message}")
-    
+        if data['progress'] >= 100:
+            _sender.take(self.video_id)
+            self.send(data)
+        else:
+            _sender.submit(self, data)
+
+    def is_significant(self, data):
+        """Whether an update differs enough from the last one sent to be worth sending"""
+        if self.last_sent is None or data['message'] != self.last_sent['message']:
+            return True
+        min_delta = getattr(settings, 'PROGRESS_MIN_DELTA', 1.0)
+        return abs(data['progress'] - self.last_sent['progress']) >= min_delta
+
+    def send(self, data):
+        """Store and broadcast an update now"""
+        with self._send_lock:
+            # The sender thread may hand over an update older than one sent meanwhile
+            if self.last_sent is not None and data['timestamp'] < self.last_sent['timestamp']:
+                return
+            self.last_sent = data
+            self.last_sent_at = time.monotonic()
+
+            # Stored first, so pollers and late WebSocket joiners get it either way
+            try:
+                self.store.set(self.video_id, data)
+            except Exception as e:
+                print(f"Progress store error: {e}")
+
+            # Broadcast progress update via WebSocket
+            try:
+                async_to_sync(self.channel_layer.group_send)(
+                    self.room_group_name,
+                    {
+                        'type': 'progress_update',
+                        'video_id': self.video_id,
+                        'progress': data['progress'],
+                        'message': data['message']
+                    }
+                )
+            except Exception as e:
+                print(f"WebSocket error: {e}")
+
+    def flush(self):
+        """Send the pending update, if any, regardless of throttling"""
+        data = _sender.take(self.video_id)
+        if data is not None:
+            self.send(data)
+
     def complete_processing(self, message="Processing completed!"):
         """Notify that processing is complete"""
+        self.flush()
         try:
             async_to_sync(self.channel_layer.group_send)(
                 self.room_group_name,
@@ -56,17 +295,12 @@ class ProgressTracker:
             print(f"✓ Processing complete broadcast: {message}")
         except Exception as e:
             print(f"WebSocket completion error: {e}")
-    
+
     def get_progress(self):
         """Get current progress"""
-        data = progress_store.get(self.video_id)
-        if data:
-            # Check if data is older than 10 minutes
-            if time.time() - data['timestamp'] > 600:
-                return None
-            return data
-        return None
-    
+        return get_progress(self.video_id)
+
     def clear_progress(self):
         """Clear progress data"""
-        progress_store.pop(self.video_id, None)
\ No newline at end of file
+        _sender.take(self.video_id)
+        self.store.delete(self.video_id)
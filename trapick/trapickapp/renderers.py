@@ -0,0 +1,74 @@
+# trapickapp/renderers.py
+"""
+DRF renderers for API responses.
+
+ORJSONRenderer is the default JSON renderer. orjson serializes UUIDs,
+dataclasses and NumPy arrays natively and is several times faster than the
+stdlib encoder on large group and prediction payloads. Datetimes, dates
+and times are passed through to DRF's own encoder, like anything else
+orjson does not know (Decimal, lazy strings, querysets), so they are written
+exactly as JSONRenderer writes them. Without orjson installed it falls back
+to JSONRenderer.
+
+MessagePackRenderer serves the same data as MessagePack to clients that
+send ``Accept: application/msgpack`` (or ``?format=msgpack``).
+"""
+import decimal
+import uuid
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+_drf_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_AVAILABLE:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        # Datetimes go through DRF's encoder so their format follows JSONRenderer's
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        # orjson only indents by two spaces; any requested indent enables it
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_drf_encoder.default, option=option)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _drf_encoder.default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders response data as MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError('msgpack is not installed. Install it with: pip install msgpack')
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
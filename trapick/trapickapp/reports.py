@@ -0,0 +1,617 @@
+# trapickapp/reports.py
+"""
+Rendering of PDF/Excel/CSV analysis reports.
+
+A render is stored as a TrafficReport with the file in ``artifact`` and
+keyed by (analysis, file_format, analysis.analyzed_at). Later downloads of
+the same analysis reuse the file instead of rebuilding the document. Saving
+the TrafficAnalysis deletes its renders (see the signal handlers in
+models.py), so a cached file never outlives the data it was built from.
+Workbooks are built in openpyxl's write-only mode and every document is
+rendered into a temp file, so row count does not drive memory use.
+
+Consolidated reports cover a LocationDateGroup or a location over a date
+range. Their totals come from aggregate queries, per-video rows are
+streamed from an iterator into a write-only workbook or the CSV, and charts
+come from the chart cache in charts.py, so unchanged data is never redrawn.
+"""
+import csv
+import json
+import logging
+import tempfile
+import uuid
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from io import BytesIO
+
+import openpyxl
+from django.core.cache import cache
+from django.core.files import File
+from django.utils import timezone
+from django.db.models import Avg, Case, Count, FloatField, Max, Sum, Value, When
+from django.db.models.functions import ExtractHour
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import charts
+from .exports import Echo
+from .models import TrafficAnalysis, TrafficReport
+
+logger = logging.getLogger(__name__)
+
+
+def write_pdf(analysis, fileobj):
+    """Write the PDF analysis report for a TrafficAnalysis to ``fileobj``"""
+    video_obj = analysis.video_file
+    doc = SimpleDocTemplate(fileobj, pagesize=letter)
+    styles = getSampleStyleSheet()
+
+    # Create custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        textColor=colors.HexColor('#1e40af')
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=12,
+        spaceAfter=12,
+        textColor=colors.HexColor('#374151')
+    )
+
+    # Build PDF content
+    content = []
+
+    # Title
+    content.append(Paragraph('Traffic Analysis Report', title_style))
+    content.append(Paragraph(f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', styles['Normal']))
+    content.append(Spacer(1, 20))
+
+    # Video Information
+    content.append(Paragraph('Video Information', heading_style))
+    video_info = [
+        ['Filename:', video_obj.filename],
+        ['Upload Date:', video_obj.uploaded_at.strftime("%Y-%m-%d %H:%M:%S")],
+        ['Duration:', f"{video_obj.duration_seconds or 0} seconds"],
+        ['Processing Status:', video_obj.processing_status]
+    ]
+    video_table = Table(video_info, colWidths=[150, 300])
+    video_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    content.append(video_table)
+    content.append(Spacer(1, 20))
+
+    # Analysis Summary
+    content.append(Paragraph('Analysis Summary', heading_style))
+    summary_data = [
+        ['Total Vehicles:', str(analysis.total_vehicles)],
+        ['Processing Time:', f"{analysis.processing_time_seconds} seconds"],
+        ['Congestion Level:', analysis.congestion_level],
+        ['Traffic Pattern:', analysis.traffic_pattern]
+    ]
+    summary_table = Table(summary_data, colWidths=[150, 300])
+    summary_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+    ]))
+    content.append(summary_table)
+    content.append(Spacer(1, 20))
+
+    # Vehicle Breakdown
+    content.append(Paragraph('Vehicle Breakdown', heading_style))
+    vehicle_data = [
+        ['Vehicle Type', 'Count'],
+        ['Cars', str(analysis.car_count)],
+        ['Trucks', str(analysis.truck_count)],
+        ['Motorcycles', str(analysis.motorcycle_count)],
+        ['Buses', str(analysis.bus_count)],
+        ['Bicycles', str(analysis.bicycle_count)],
+        ['Other Vehicles', str(analysis.other_count)]
+    ]
+    vehicle_table = Table(vehicle_data, colWidths=[200, 100])
+    vehicle_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
+    ]))
+    content.append(vehicle_table)
+
+    doc.build(content)
+
+
+# Rows per worksheet allowed by Excel; longer sheets continue on "<title> (2)"
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def _excel_value(value):
+    """Coerce a DB value into something a worksheet cell accepts"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    if isinstance(value, datetime):
+        # Excel has no time zones; timestamps are written as naive UTC
+        return timezone.make_naive(value, dt_timezone.utc) if timezone.is_aware(value) else value
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def append_rows(wb, title, headers, rows):
+    """Append iterator rows to write-only sheets, starting a new sheet whenever one fills up"""
+    sheet_number = 1
+    ws = wb.create_sheet(title)
+    ws.append(headers)
+    written = 1
+    for row in rows:
+        if written >= EXCEL_MAX_ROWS:
+            sheet_number += 1
+            ws = wb.create_sheet(f'{title} ({sheet_number})')
+            ws.append(headers)
+            written = 1
+        ws.append([_excel_value(value) for value in row])
+        written += 1
+
+
+def write_excel(analysis, fileobj):
+    """
+    Write the Excel analysis report for a TrafficAnalysis to ``fileobj``.
+
+    The workbook is write-only: each row is serialised to the sheet's temp
+    file as it is appended, so the Detections and Frames sheets, fed straight
+    from DB iterators, keep memory flat however busy the video was.
+    """
+    from .exports import DATASETS, export_rows
+
+    video_obj = analysis.video_file
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Traffic Analysis")
+
+    # Add headers and data
+    ws.append(['Traffic Analysis Report', f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'])
+    ws.append(['Video File:', video_obj.filename])
+    ws.append([])
+
+    # Summary section
+    ws.append(['SUMMARY'])
+    ws.append(['Total Vehicles:', analysis.total_vehicles])
+    ws.append(['Processing Time:', analysis.processing_time_seconds])
+    ws.append(['Congestion Level:', analysis.congestion_level])
+    ws.append([])
+
+    # Vehicle breakdown
+    ws.append(['VEHICLE BREAKDOWN'])
+    ws.append(['Vehicle Type', 'Count'])
+    ws.append(['Cars', analysis.car_count])
+    ws.append(['Trucks', analysis.truck_count])
+    ws.append(['Motorcycles', analysis.motorcycle_count])
+    ws.append(['Buses', analysis.bus_count])
+    ws.append(['Bicycles', analysis.bicycle_count])
+    ws.append(['Others', analysis.other_count])
+
+    # Raw rows, one sheet per dataset
+    scope = {'id': video_obj.id}
+    for dataset, title in (('detections', 'Detections'), ('frames', 'Frames')):
+        headers = [header for header, _ in DATASETS[dataset]['columns']]
+        append_rows(wb, title, headers, export_rows(dataset, scope))
+
+    wb.save(fileobj)
+
+
+REPORT_FORMATS = {
+    'pdf': {
+        'write': write_pdf,
+        'extension': 'pdf',
+        'content_type': 'application/pdf',
+    },
+    'excel': {
+        'write': write_excel,
+        'extension': 'xlsx',
+        'content_type': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+}
+
+
+def get_cached_report(analysis, file_format):
+    """Return the up-to-date rendered TrafficReport for this analysis, or None"""
+    report = (
+        TrafficReport.objects
+        .filter(traffic_analysis=analysis, file_format=file_format, source_analyzed_at=analysis.analyzed_at)
+        .exclude(artifact='')
+        .exclude(artifact__isnull=True)
+        .order_by('-generated_at')
+        .first()
+    )
+    if report and report.artifact.storage.exists(report.artifact.name):
+        return report
+    return None
+
+
+def render_report(analysis, file_format):
+    """Render a report, store the file and record it as a TrafficReport"""
+    spec = REPORT_FORMATS[file_format]
+
+    report = TrafficReport(
+        traffic_analysis=analysis,
+        location=analysis.location,
+        report_type='quick',
+        title=f'Traffic Analysis Report - {analysis.video_file.filename}',
+        total_vehicles_period=analysis.total_vehicles,
+        file_format=file_format,
+        source_analyzed_at=analysis.analyzed_at,
+    )
+    version = analysis.analyzed_at.strftime('%Y%m%d%H%M%S%f')
+    # Rendered into a temp file and copied to storage in chunks, never held in memory whole
+    with tempfile.TemporaryFile() as rendered:
+        spec['write'](analysis, rendered)
+        size = rendered.tell()
+        rendered.seek(0)
+        report.artifact.save(f'{analysis.id}_{version}.{spec["extension"]}', File(rendered), save=False)
+    report.save()
+
+    # Earlier renders of this analysis/format are superseded; newer ones from
+    # a concurrent render are left alone
+    (
+        TrafficReport.objects
+        .filter(traffic_analysis=analysis, file_format=file_format, generated_at__lt=report.generated_at)
+        .delete()
+    )
+
+    logger.info(f"📄 Rendered {file_format} report for analysis {analysis.id} ({size} bytes)")
+    return report
+
+
+def get_or_render_report(analysis, file_format):
+    """Cached render if there is one, otherwise render now. Returns ``(report, cached)``."""
+    report = get_cached_report(analysis, file_format)
+    if report:
+        return report, True
+    return render_report(analysis, file_format), False
+
+
+# A queued render that has not finished by then is assumed dead and may be queued again
+RENDER_LOCK_TIMEOUT = 600
+
+
+def _render_lock_key(analysis, file_format):
+    version = analysis.analyzed_at.strftime('%Y%m%d%H%M%S%f') if analysis.analyzed_at else ''
+    return f'report_render:{analysis.id}:{file_format}:{version}'
+
+
+def queue_report_render(analysis, file_format):
+    """
+    Render a report in the background unless a render of this analysis
+    version is already pending. Returns True when a render was queued now.
+    """
+    from .tasks import dispatch_task, render_analysis_report
+
+    key = _render_lock_key(analysis, file_format)
+    if not cache.add(key, 1, RENDER_LOCK_TIMEOUT):
+        return False
+    try:
+        dispatch_task(render_analysis_report, str(analysis.id), file_format)
+    except Exception:
+        cache.delete(key)
+        raise
+    return True
+
+
+def release_report_render(analysis, file_format):
+    """Drop the pending marker set by queue_report_render"""
+    cache.delete(_render_lock_key(analysis, file_format))
+
+
+# ==================== CONSOLIDATED (GROUP / LOCATION) REPORTS ====================
+
+CONGESTION_SCORES = {
+    'very_low': 0,
+    'low': 1,
+    'medium': 2,
+    'high': 3,
+    'severe': 4
+}
+
+VEHICLE_FIELDS = [
+    ('Cars', 'car_count'),
+    ('Trucks', 'truck_count'),
+    ('Motorcycles', 'motorcycle_count'),
+    ('Buses', 'bus_count'),
+    ('Bicycles', 'bicycle_count'),
+    ('Others', 'other_count'),
+]
+
+VIDEO_ROW_HEADERS = [
+    'Date', 'Video', 'Start Time', 'End Time', 'Duration (s)', 'Total Vehicles',
+    'Cars', 'Trucks', 'Motorcycles', 'Buses', 'Bicycles', 'Others', 'Peak Traffic', 'Congestion Level',
+]
+
+# Per-video rows beyond this are left out of the PDF (CSV/Excel carry them all)
+PDF_MAX_VIDEO_ROWS = 500
+
+
+def _congestion_label(score):
+    if score is None:
+        return 'low'
+    for level, level_score in CONGESTION_SCORES.items():
+        if score <= level_score:
+            return level
+    return 'severe'
+
+
+def consolidated_analyses(video_filters):
+    """TrafficAnalysis rows of the videos in an export scope (see exports.resolve_scope)"""
+    return TrafficAnalysis.objects.filter(**{f'video_file__{key}': value for key, value in video_filters.items()})
+
+
+def consolidated_summary(video_filters):
+    """Totals, per-day, per-hour and congestion breakdowns of a scope, all from aggregate queries"""
+    analyses = consolidated_analyses(video_filters)
+    congestion_score = Case(
+        *[When(congestion_level=level, then=Value(score)) for level, score in CONGESTION_SCORES.items()],
+        default=Value(0),
+        output_field=FloatField(),
+    )
+
+    totals = analyses.aggregate(
+        video_count=Count('id'),
+        total_vehicles=Sum('total_vehicles'),
+        total_processing_time=Sum('processing_time_seconds'),
+        peak_traffic=Max('peak_traffic'),
+        congestion_score=Avg(congestion_score),
+        **{field: Sum(field) for _, field in VEHICLE_FIELDS},
+    )
+    totals = {key: (value or 0) if key != 'congestion_score' else value for key, value in totals.items()}
+    totals['average_congestion'] = _congestion_label(totals.pop('congestion_score'))
+
+    daily = list(
+        analyses
+        .values('video_file__location_date_group__date')
+        .annotate(
+            videos=Count('id'),
+            total_vehicles=Sum('total_vehicles'),
+            peak_traffic=Max('peak_traffic'),
+            **{field: Sum(field) for _, field in VEHICLE_FIELDS},
+        )
+        .order_by('video_file__location_date_group__date')
+    )
+
+    hourly = {
+        row['hour']: row['total']
+        for row in analyses
+        .exclude(video_file__video_start_time=None)
+        .annotate(hour=ExtractHour('video_file__video_start_time'))
+        .values('hour')
+        .annotate(total=Sum('total_vehicles'))
+        .order_by('hour')
+    }
+
+    congestion = {
+        row['congestion_level']: row['count']
+        for row in analyses.values('congestion_level').annotate(count=Count('id')).order_by()
+    }
+
+    return {
+        'totals': totals,
+        'vehicle_breakdown': {label: totals[field] for label, field in VEHICLE_FIELDS},
+        'daily': daily,
+        'hourly': hourly,
+        'congestion': congestion,
+    }
+
+
+def consolidated_video_rows(video_filters, chunk_size=500):
+    """Iterate one row per analysed video in the scope, in VIDEO_ROW_HEADERS order"""
+    rows = (
+        consolidated_analyses(video_filters)
+        .order_by('video_file__location_date_group__date', 'video_file__video_start_time', 'video_file__filename')
+        .values_list(
+            'video_file__location_date_group__date', 'video_file__filename',
+            'video_file__video_start_time', 'video_file__video_end_time', 'video_file__duration_seconds',
+            'total_vehicles', *[field for _, field in VEHICLE_FIELDS], 'peak_traffic', 'congestion_level',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        day, filename, start, end = row[:4]
+        yield [
+            day.isoformat() if day else '',
+            filename,
+            start.strftime('%H:%M') if start else '',
+            end.strftime('%H:%M') if end else '',
+            *row[4:],
+        ]
+
+
+def consolidated_chart_data(summary):
+    """Input series of each consolidated report chart, by chart kind"""
+    return {
+        'vehicle_breakdown': summary['vehicle_breakdown'],
+        'hourly_profile': summary['hourly'],
+        'congestion': summary['congestion'],
+    }
+
+
+def render_consolidated_charts(summary, fmt='png'):
+    """Each chart of a consolidated report, through the chart cache"""
+    return {
+        kind: charts.get_chart(kind, data, fmt)
+        for kind, data in consolidated_chart_data(summary).items()
+    }
+
+
+def _summary_rows(title, summary):
+    totals = summary['totals']
+    return [
+        ['Traffic Analysis Report', title],
+        ['Generated:', datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
+        [],
+        ['SUMMARY'],
+        ['Videos Analyzed:', totals['video_count']],
+        ['Total Vehicles:', totals['total_vehicles']],
+        ['Peak Traffic:', totals['peak_traffic']],
+        ['Average Congestion:', totals['average_congestion']],
+        ['Total Processing Time:', f"{totals['total_processing_time']:.1f} seconds"],
+        [],
+        ['VEHICLE BREAKDOWN'],
+        ['Vehicle Type', 'Count'],
+        *[[label, count] for label, count in summary['vehicle_breakdown'].items()],
+    ]
+
+
+def _daily_rows(summary):
+    return [
+        [
+            row['video_file__location_date_group__date'].isoformat() if row['video_file__location_date_group__date'] else 'Ungrouped',
+            row['videos'],
+            row['total_vehicles'] or 0,
+            *[row[field] or 0 for _, field in VEHICLE_FIELDS],
+            row['peak_traffic'] or 0,
+        ]
+        for row in summary['daily']
+    ]
+
+
+DAILY_HEADERS = ['Date', 'Videos', 'Total Vehicles', *[label for label, _ in VEHICLE_FIELDS], 'Peak Traffic']
+
+
+def iter_consolidated_csv(title, summary, video_filters):
+    """Yield the consolidated CSV: summary and daily sections, then the per-video rows"""
+    writer = csv.writer(Echo())
+    for row in _summary_rows(title, summary):
+        yield writer.writerow(row)
+    yield writer.writerow([])
+    yield writer.writerow(['DAILY TOTALS'])
+    yield writer.writerow(DAILY_HEADERS)
+    for row in _daily_rows(summary):
+        yield writer.writerow(row)
+    yield writer.writerow([])
+    yield writer.writerow(['VIDEOS'])
+    yield writer.writerow(VIDEO_ROW_HEADERS)
+    for row in consolidated_video_rows(video_filters):
+        yield writer.writerow(row)
+
+
+def write_consolidated_excel(fileobj, title, summary, chart_images, video_filters):
+    """
+    Write the consolidated workbook to ``fileobj``.
+
+    Uses openpyxl's write-only mode: rows are serialised as they are
+    appended instead of being kept as cell objects, so the Videos sheet can
+    hold any number of rows.
+    """
+    from openpyxl.drawing.image import Image as ExcelImage
+
+    wb = openpyxl.Workbook(write_only=True)
+
+    ws = wb.create_sheet('Summary')
+    for row in _summary_rows(title, summary):
+        ws.append(row)
+    anchor_row = 2
+    for name in ('vehicle_breakdown', 'hourly_profile', 'congestion'):
+        image = ExcelImage(BytesIO(chart_images[name]))
+        image.anchor = f'E{anchor_row}'
+        ws.add_image(image)
+        anchor_row += 17
+
+    ws = wb.create_sheet('Daily')
+    ws.append(DAILY_HEADERS)
+    for row in _daily_rows(summary):
+        ws.append(row)
+
+    append_rows(wb, 'Videos', VIDEO_ROW_HEADERS, consolidated_video_rows(video_filters))
+
+    wb.save(fileobj)
+
+
+def write_consolidated_pdf(fileobj, title, summary, chart_images, video_filters):
+    """Write the consolidated PDF report, charts included, to ``fileobj``"""
+    from reportlab.platypus import Image as PdfImage
+
+    doc = SimpleDocTemplate(fileobj, pagesize=letter)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        textColor=colors.HexColor('#1e40af')
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=12,
+        spaceAfter=12,
+        textColor=colors.HexColor('#374151')
+    )
+    header_table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
+    ])
+    totals = summary['totals']
+
+    content = [
+        Paragraph('Traffic Analysis Report', title_style),
+        Paragraph(title, styles['Heading3']),
+        Paragraph(f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', styles['Normal']),
+        Spacer(1, 20),
+        Paragraph('Summary', heading_style),
+    ]
+    summary_table = Table([
+        ['Videos Analyzed:', str(totals['video_count'])],
+        ['Total Vehicles:', str(totals['total_vehicles'])],
+        ['Peak Traffic:', str(totals['peak_traffic'])],
+        ['Average Congestion:', totals['average_congestion']],
+        ['Total Processing Time:', f"{totals['total_processing_time']:.1f} seconds"],
+    ], colWidths=[150, 300])
+    summary_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+    ]))
+    content += [summary_table, Spacer(1, 20)]
+
+    for name in ('vehicle_breakdown', 'hourly_profile', 'congestion'):
+        content += [PdfImage(BytesIO(chart_images[name]), width=432, height=230), Spacer(1, 12)]
+
+    content.append(Paragraph('Daily Totals', heading_style))
+    daily_table = Table([DAILY_HEADERS] + [[str(value) for value in row] for row in _daily_rows(summary)], repeatRows=1)
+    daily_table.setStyle(header_table_style)
+    content += [daily_table, Spacer(1, 20)]
+
+    content.append(Paragraph('Videos', heading_style))
+    video_headers = ['Date', 'Video', 'Start', 'End', 'Vehicles', 'Peak', 'Congestion']
+    video_rows = []
+    truncated = False
+    for row in consolidated_video_rows(video_filters):
+        if len(video_rows) >= PDF_MAX_VIDEO_ROWS:
+            truncated = True
+            break
+        video_rows.append([row[0], row[1][:40], row[2], row[3], str(row[5]), str(row[12]), row[13]])
+    video_table = Table([video_headers] + video_rows, repeatRows=1)
+    video_table.setStyle(header_table_style)
+    content.append(video_table)
+    if truncated:
+        content.append(Paragraph(
+            f'Only the first {PDF_MAX_VIDEO_ROWS} videos are listed. Use the CSV or Excel export for all of them.',
+            styles['Italic']
+        ))
+
+    doc.build(content)
@@ -0,0 +1,74 @@
+# trapickapp/result_cache.py
+"""
+Versioned result cache for the analytics functions in services.py.
+
+``@versioned_cache()`` keys a function's result by its qualified name, its
+arguments and the current 'global' DataVersion counter, which the model
+signals bump whenever videos, analyses, groups, rollups or predictions
+change. A change therefore never has to delete anything: the next call
+simply looks under a new key, and old entries age out of the cache.
+
+Results are stored in the RESULT_CACHE_ALIAS cache (Redis when REDIS_URL is
+configured, otherwise a per-process LRU-bounded LocMemCache; see CACHES in
+settings.py). RESULT_CACHE_TIMEOUT caps how long a result is reused, which
+also covers functions whose output depends on the current date. Hits and
+misses are counted per function in metrics.py.
+"""
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+from .models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _cache():
+    return caches[getattr(settings, 'RESULT_CACHE_ALIAS', 'default')]
+
+
+def result_key(name, args, kwargs, version):
+    payload = repr((name, args, sorted(kwargs.items()), version))
+    return f'results:{name}:{hashlib.sha1(payload.encode()).hexdigest()}'
+
+
+def versioned_cache(timeout=None):
+    """Cache a function's return value until the data version changes or ``timeout`` passes"""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                version = DataVersion.current([DataVersion.GLOBAL])[DataVersion.GLOBAL]
+                key = result_key(name, args, kwargs, version)
+                value = _cache().get(key, _MISSING)
+            except Exception as e:
+                # An unreachable cache backend only costs the recomputation
+                logger.warning(f"⚠️ Result cache lookup for {name} failed: {e}")
+                metrics.incr(f'result_cache.error.{name}')
+                return func(*args, **kwargs)
+
+            if value is not _MISSING:
+                metrics.incr(f'result_cache.hit.{name}')
+                return value
+
+            metrics.incr(f'result_cache.miss.{name}')
+            value = func(*args, **kwargs)
+            try:
+                _cache().set(key, value, timeout or getattr(settings, 'RESULT_CACHE_TIMEOUT', 300))
+            except Exception as e:
+                logger.warning(f"⚠️ Could not cache result of {name}: {e}")
+                metrics.incr(f'result_cache.error.{name}')
+            return value
+
+        # The undecorated function, for callers that need fresh numbers
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -1,6 +1,6 @@
 # trapickapp/serializers.py
 from rest_framework import serializers
-from .models import LocationDateGroup, VehicleType, Location, VideoFile, TrafficAnalysis, Detection, TrafficPrediction, ProcessingProfile
+from .models import LocationDateGroup, VehicleType, Location, VideoFile, TrafficAnalysis, Detection, TrafficPrediction, ProcessingProfile, UploadSession
 
 
 class VehicleTypeSerializer(serializers.ModelSerializer):
@@ -110,6 +110,29 @@ class UploadVideoSerializer(serializers.Serializer):
     title = serializers.CharField(required=False, allow_blank=True)
     location_id = serializers.UUIDField(required=False)
 
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer for starting a resumable chunked upload"""
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    title = serializers.CharField(required=False, allow_blank=True)
+    location_id = serializers.IntegerField(required=False)
+    video_date = serializers.DateField(required=False)
+    video_start_time = serializers.TimeField(required=False)
+    video_end_time = serializers.TimeField(required=False)
+
+    def validate_location_id(self, value):
+        if not Location.objects.filter(id=value).exists():
+            raise serializers.ValidationError('Location not found')
+        return value
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    upload_id = serializers.UUIDField(source='id', read_only=True)
+    size = serializers.IntegerField(source='total_size', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['upload_id', 'filename', 'size', 'offset', 'status', 'video_file', 'created_at', 'updated_at']
+
 class TrafficPredictionSerializer(serializers.ModelSerializer):
     location_name = serializers.CharField(source='location.display_name', read_only=True, allow_null=True)
     
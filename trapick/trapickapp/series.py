@@ -0,0 +1,180 @@
+# trapickapp/series.py
+"""
+Chart-ready time series for the frontend.
+
+Instead of row-level JSON that the browser has to aggregate, each series is
+returned column-wise as one array of epoch-millisecond timestamps plus one
+array of values per vehicle type:
+
+    {"timestamps": [...], "series": {"cars": [...], "trucks": [...], ...},
+     "points": 800, "source_points": 54000}
+
+Long series are downsampled on the server with Largest-Triangle-Three-Buckets
+to about one point per pixel of the requested chart width. The points are
+chosen on the total (or main) series and the same indices are kept for every
+other series, so all arrays stay aligned on one time axis.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .exports import GROUP_PREFIX
+from .models import FrameAnalysis, HourlyTrafficSummary, TrafficPrediction
+
+DEFAULT_WIDTH = 800
+MAX_WIDTH = 4000
+
+FRAME_COUNT_FIELDS = [
+    ('cars', 'car_count'),
+    ('trucks', 'truck_count'),
+    ('motorcycles', 'motorcycle_count'),
+    ('buses', 'bus_count'),
+    ('bicycles', 'bicycle_count'),
+    ('total', 'total_vehicles'),
+]
+
+
+def lttb_indices(xs, ys, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps out of
+    ``(xs, ys)``. The first and last points are always kept.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def clamp_width(width):
+    """Parse the requested chart width into a point budget"""
+    try:
+        width = int(width) if width not in (None, '') else DEFAULT_WIDTH
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid width "{width}"')
+    return max(3, min(width, MAX_WIDTH))
+
+
+def compact_series(timestamps, series, width, key='total'):
+    """Downsample aligned arrays to ``width`` points, chosen on ``series[key]``"""
+    source_points = len(timestamps)
+    if source_points > width:
+        keep = lttb_indices(timestamps, series[key], width)
+        timestamps = [timestamps[i] for i in keep]
+        series = {name: [values[i] for i in keep] for name, values in series.items()}
+    return {
+        'timestamps': timestamps,
+        'series': series,
+        'points': len(timestamps),
+        'source_points': source_points,
+    }
+
+
+def _epoch_ms(value):
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return int(value.timestamp() * 1000)
+
+
+def traffic_series(video_filters, width=DEFAULT_WIDTH):
+    """
+    Per-frame vehicle counts of the videos in an export scope.
+
+    Frames are placed on the wall clock at the group date and the video's
+    start time, or the upload time for videos without one.
+    """
+    filters = {f'traffic_analysis__video_file__{key}': value for key, value in video_filters.items()}
+    rows = (
+        FrameAnalysis.objects
+        .filter(**filters)
+        .order_by()
+        .values_list(
+            f'traffic_analysis__video_file__{GROUP_PREFIX}date',
+            'traffic_analysis__video_file__video_start_time',
+            'traffic_analysis__video_file__uploaded_at',
+            'timestamp_seconds',
+            *[field for _, field in FRAME_COUNT_FIELDS],
+        )
+        .iterator(chunk_size=5000)
+    )
+
+    points = []
+    starts = {}
+    for day, start_time, uploaded_at, offset, *counts in rows:
+        video_key = (day, start_time, uploaded_at)
+        if video_key not in starts:
+            start = datetime.combine(day, start_time) if day and start_time else uploaded_at
+            starts[video_key] = _epoch_ms(start)
+        points.append((starts[video_key] + int(offset * 1000), *counts))
+    # Videos of one group may overlap, so the axis is sorted after placement
+    points.sort()
+
+    timestamps = [point[0] for point in points]
+    series = {name: [point[i + 1] for point in points] for i, (name, _) in enumerate(FRAME_COUNT_FIELDS)}
+    return compact_series(timestamps, series, width)
+
+
+def hourly_series(start_date, end_date, location_id=None, width=DEFAULT_WIDTH):
+    """Vehicles per hour and vehicle type from the hourly rollups, summed over locations"""
+    queryset = HourlyTrafficSummary.objects.filter(date__gte=start_date, date__lte=end_date)
+    if location_id:
+        queryset = queryset.filter(location_id=location_id)
+
+    buckets = {}
+    names = set()
+    for day, hour, name, count in queryset.order_by().values_list('date', 'hour', 'vehicle_type__name', 'count'):
+        bucket = buckets.setdefault(_epoch_ms(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)), {})
+        bucket[name] = bucket.get(name, 0) + count
+        names.add(name)
+
+    timestamps = sorted(buckets)
+    series = {name: [buckets[ts].get(name, 0) for ts in timestamps] for name in sorted(names)}
+    series['total'] = [sum(buckets[ts].values()) for ts in timestamps]
+    return compact_series(timestamps, series, width)
+
+
+def prediction_series(start_date, end_date, location_id=None, width=DEFAULT_WIDTH):
+    """Predicted vehicles per hour with the confidence band"""
+    queryset = TrafficPrediction.objects.filter(prediction_date__gte=start_date, prediction_date__lte=end_date)
+    if location_id:
+        queryset = queryset.filter(location_id=location_id)
+
+    buckets = {}
+    for day, hour, predicted, lower, upper in queryset.order_by().values_list(
+        'prediction_date', 'hour_of_day', 'predicted_vehicle_count',
+        'confidence_interval_lower', 'confidence_interval_upper',
+    ):
+        ts = _epoch_ms(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+        bucket = buckets.setdefault(ts, [0.0, 0.0, 0.0])
+        bucket[0] += predicted
+        bucket[1] += lower
+        bucket[2] += upper
+
+    timestamps = sorted(buckets)
+    series = {
+        'predicted': [round(buckets[ts][0], 2) for ts in timestamps],
+        'lower': [round(buckets[ts][1], 2) for ts in timestamps],
+        'upper': [round(buckets[ts][2], 2) for ts in timestamps],
+    }
+    return compact_series(timestamps, series, width, key='predicted')
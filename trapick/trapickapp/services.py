@@ -4,6 +4,7 @@ from django.utils import timezone
 from datetime import timedelta, datetime
 from .models import Location, TrafficAnalysis, Detection, VideoFile, HourlyTrafficSummary, DailyTrafficSummary, TrafficPrediction
 import numpy as np
+from .result_cache import versioned_cache
 
 def calculate_real_weekly_data():
     """Calculate weekly vehicle counts from all available data"""
@@ -45,6 +46,46 @@ def calculate_real_weekly_data():
         print(f"Error calculating weekly data: {e}")
         return [0, 0, 0, 0, 0, 0, 0]
     
+def build_overview_data():
+    """Overview payload of the Home page (weekly counts, system stats, peak hours per area)"""
+    weekly_data = calculate_real_weekly_data()
+    system_stats = get_system_overview_stats()
+    areas_data = get_peak_hours_analysis()
+
+    # Ensure weekly_data is always a 7-element array
+    if not weekly_data or len(weekly_data) != 7:
+        weekly_data = [0, 0, 0, 0, 0, 0, 0]
+
+    total_vehicles = sum(weekly_data)
+
+    # Ensure we have valid peak hour data
+    peak_hour = '8:00 AM'
+    if system_stats.get('peak_hour'):
+        peak_hour = system_stats['peak_hour']
+
+    # Ensure we have valid areas data
+    if not areas_data:
+        areas_data = [
+            {
+                'name': 'No data available',
+                'morning_peak': 'N/A',
+                'evening_peak': 'N/A',
+                'morning_volume': 0,
+                'evening_volume': 0,
+                'total_analysis_vehicles': 0
+            }
+        ]
+
+    return {
+        'weekly_data': weekly_data,
+        'total_vehicles': total_vehicles,
+        'congested_roads': system_stats.get('congested_roads', 0),
+        'peak_hour': peak_hour,
+        'daily_average': total_vehicles // 7 if total_vehicles > 0 else 0,
+        'system_stats': system_stats,
+        'areas': areas_data
+    }
+
 def calculate_real_vehicle_stats(period='today', location_id=None, date_range='last_7_days'):
     """Calculate actual vehicle statistics from TrafficAnalysis with filtering"""
     try:
@@ -180,6 +221,7 @@ def get_fallback_data(reason):
         }
     }
         
+@versioned_cache()
 def calculate_real_congestion_data():
     """Calculate real congestion data from recent TrafficAnalysis"""
     try:
@@ -240,6 +282,7 @@ def calculate_hourly_traffic_summary():
     
     return hourly_summary
 
+@versioned_cache()
 def get_system_overview_stats():
     """Get real system overview statistics"""
     total_videos = VideoFile.objects.count()
@@ -264,6 +307,7 @@ def get_system_overview_stats():
         'processing_success_rate': (processed_videos / total_videos * 100) if total_videos > 0 else 0
     }
 
+@versioned_cache()
 def get_vehicle_type_distribution():
     """Get distribution of vehicle types across all detections"""
     distribution = (
@@ -275,6 +319,7 @@ def get_vehicle_type_distribution():
     
     return {item['vehicle_type__name']: item['count'] for item in distribution}
 
+@versioned_cache()
 def get_peak_hours_analysis():
     """Get peak hours analysis for each location from TrafficAnalysis data"""
     try:
@@ -0,0 +1,144 @@
+# trapickapp/snapshots.py
+"""
+Stale-while-revalidate snapshots of expensive dashboard payloads.
+
+A snapshot is the builder's result plus the DataVersion and time it was
+built from, stored in the default cache without expiry. Requests always get
+the stored snapshot straight away. Once it is older than
+SNAPSHOT_MAX_AGE_SECONDS or the data version has moved on, the first request
+to notice takes a short-lived lock (``cache.add``) and schedules a rebuild in
+the background; everyone else keeps being served the previous snapshot, so a
+burst of page loads triggers one rebuild, not one per request. Only a cold cache builds inline, and then also only in
+the worker holding the lock. Rebuilds go to Celery when the cache is shared
+(Redis); with the per-process LocMemCache they run on a thread of the
+process that owns the snapshot.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_BUILDERS = {
+    'overview': 'trapickapp.services.build_overview_data',
+}
+
+# A rebuild that has not finished by then is assumed dead and may be retried
+LOCK_TIMEOUT = 120
+# How long a request on a cold cache waits for another worker's build
+COLD_WAIT_SECONDS = 10
+
+
+def _cache():
+    return caches[getattr(settings, 'RESULT_CACHE_ALIAS', 'default')]
+
+
+def _key(name):
+    return f'snapshot:{name}'
+
+
+def _lock_key(name):
+    return f'snapshot:{name}:lock'
+
+
+def _current_version():
+    return DataVersion.current([DataVersion.GLOBAL])[DataVersion.GLOBAL]
+
+
+def build_snapshot(name):
+    """Run the builder and store its result. Returns the new snapshot."""
+    # Read before building: changes made meanwhile leave the snapshot stale
+    version = _current_version()
+    started = time.monotonic()
+    data = import_string(SNAPSHOT_BUILDERS[name])()
+    snapshot = {
+        'data': data,
+        'version': version,
+        'built_at': timezone.now().isoformat(),
+        'built_ts': time.time(),
+    }
+    _cache().set(_key(name), snapshot, None)
+    metrics.incr(f'snapshot.build.{name}')
+    logger.info(f"📸 Rebuilt {name} snapshot in {time.monotonic() - started:.2f}s (data version {version})")
+    return snapshot
+
+
+def refresh_snapshot(name):
+    """Rebuild a snapshot and release its refresh lock"""
+    try:
+        return build_snapshot(name)
+    finally:
+        _cache().delete(_lock_key(name))
+
+
+def _schedule_refresh(name, cache):
+    if isinstance(cache, LocMemCache):
+        # A Celery worker could not write into this process's memory
+        def run():
+            try:
+                refresh_snapshot(name)
+            except Exception as e:
+                logger.error(f"❌ Refreshing {name} snapshot failed: {e}")
+            finally:
+                connections.close_all()
+
+        threading.Thread(target=run, name=f'snapshot-{name}', daemon=True).start()
+    else:
+        from .tasks import dispatch_task, refresh_dashboard_snapshot
+        dispatch_task(refresh_dashboard_snapshot, name)
+
+
+def _is_stale(snapshot):
+    max_age = getattr(settings, 'SNAPSHOT_MAX_AGE_SECONDS', 60)
+    return time.time() - snapshot['built_ts'] > max_age or snapshot['version'] != _current_version()
+
+
+def _build_cold(name):
+    cache = _cache()
+    if cache.add(_lock_key(name), 1, LOCK_TIMEOUT):
+        return refresh_snapshot(name)
+
+    # Another worker is building it; wait for that instead of piling on
+    deadline = time.monotonic() + COLD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        snapshot = cache.get(_key(name))
+        if snapshot is not None:
+            return snapshot
+    return build_snapshot(name)
+
+
+def get_snapshot(name):
+    """
+    Current snapshot as ``{'data', 'built_at', 'stale'}``, scheduling a
+    background rebuild when it is stale
+    """
+    cache = _cache()
+    snapshot = cache.get(_key(name))
+    if snapshot is None:
+        metrics.incr(f'snapshot.cold.{name}')
+        snapshot = _build_cold(name)
+        return {'data': snapshot['data'], 'built_at': snapshot['built_at'], 'stale': False}
+
+    stale = _is_stale(snapshot)
+    if stale:
+        metrics.incr(f'snapshot.stale.{name}')
+        if cache.add(_lock_key(name), 1, LOCK_TIMEOUT):
+            try:
+                _schedule_refresh(name, cache)
+            except Exception as e:
+                cache.delete(_lock_key(name))
+                logger.error(f"❌ Could not schedule {name} snapshot refresh: {e}")
+    else:
+        metrics.incr(f'snapshot.fresh.{name}')
+    return {'data': snapshot['data'], 'built_at': snapshot['built_at'], 'stale': stale}
@@ -0,0 +1,195 @@
+# trapickapp/storage_tiers.py
+"""
+Storage lifecycle for original video uploads.
+
+Originals are only needed again for re-processing, so once they are older
+than MEDIA_ARCHIVE_AFTER_DAYS they are moved to a cheaper "cold" tier and
+removed from MEDIA_ROOT. Processed outputs stay hot because the viewers
+stream them. Anything that needs the original calls
+``VideoFile.get_original_path()``, which copies it back transparently.
+
+The cold tier is pluggable through ``settings.MEDIA_COLD_STORAGE``. The
+bundled LocalDirectoryColdStorage writes to another directory (a cheaper
+mounted volume, NFS share, ...), optionally gzip-compressed.
+"""
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ColdStorageBackend:
+    """Interface for cold-tier backends. Paths are the FileField names, relative to MEDIA_ROOT."""
+
+    def store(self, name, source_path):
+        """Copy the hot file at ``source_path`` into the cold tier under ``name``"""
+        raise NotImplementedError
+
+    def open(self, name):
+        """Return a readable binary file object for an archived file"""
+        raise NotImplementedError
+
+    def exists(self, name):
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def retrieve(self, name, dest_path):
+        """Copy an archived file back to ``dest_path`` atomically"""
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix='.rehydrate-')
+        try:
+            with os.fdopen(fd, 'wb') as out, self.open(name) as src:
+                shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class LocalDirectoryColdStorage(ColdStorageBackend):
+    """Cold tier backed by a local or mounted directory"""
+
+    def __init__(self, location, compress=False):
+        self.location = os.path.abspath(location)
+        self.compress = compress
+
+    def _path(self, name):
+        path = os.path.abspath(os.path.join(self.location, name))
+        if not path.startswith(self.location + os.sep):
+            raise ValueError(f'Refusing to access {name} outside the cold storage directory')
+        return path + '.gz' if self.compress else path
+
+    def store(self, name, source_path):
+        dest_path = self._path(name)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), prefix='.archive-')
+        try:
+            with open(source_path, 'rb') as src, os.fdopen(fd, 'wb') as raw_out:
+                if self.compress:
+                    with gzip.GzipFile(fileobj=raw_out, mode='wb', compresslevel=6) as out:
+                        shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+                else:
+                    shutil.copyfileobj(src, raw_out, COPY_BUFFER_SIZE)
+                raw_out.flush()
+                os.fsync(raw_out.fileno())
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, name):
+        path = self._path(name)
+        return gzip.open(path, 'rb') if self.compress else open(path, 'rb')
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def delete(self, name):
+        path = self._path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@lru_cache(maxsize=1)
+def get_cold_storage():
+    """Instantiate the backend configured in settings.MEDIA_COLD_STORAGE"""
+    config = settings.MEDIA_COLD_STORAGE
+    backend_class = import_string(config['BACKEND'])
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+def archive_original(video):
+    """
+    Move a video's original upload to the cold tier.
+
+    The row is switched to 'cold' before the hot copy is deleted, so an
+    interruption can leave an extra copy behind but never lose the file.
+    Returns the number of hot bytes freed.
+    """
+    if video.storage_tier == 'cold' or not video.file_path:
+        return 0
+
+    name = video.file_path.name
+    hot_path = video.file_path.path
+    if not os.path.exists(hot_path):
+        logger.warning(f"⚠️ Original for video {video.id} missing at {hot_path}, not archiving")
+        return 0
+
+    cold = get_cold_storage()
+    size = os.path.getsize(hot_path)
+    # A rehydrated original (tier_changed_at set) still has its own cold
+    # copy, no need to write it again
+    if not (video.tier_changed_at and cold.exists(name)):
+        cold.store(name, hot_path)
+
+    video.storage_tier = 'cold'
+    video.tier_changed_at = timezone.now()
+    video.save(update_fields=['storage_tier', 'tier_changed_at'])
+    os.remove(hot_path)
+
+    logger.info(f"🧊 Archived original of video {video.id} ({size} bytes)")
+    return size
+
+
+def ensure_original_local(video):
+    """Return the hot path of a video's original, rehydrating it from the cold tier if needed"""
+    hot_path = video.file_path.path
+    if video.storage_tier != 'cold':
+        return hot_path
+
+    if not os.path.exists(hot_path):
+        get_cold_storage().retrieve(video.file_path.name, hot_path)
+        logger.info(f"🔥 Rehydrated original of video {video.id} from cold storage")
+
+    # Stays hot for another archive period; the cold copy is kept so the
+    # next archive run only has to delete the hot file.
+    video.storage_tier = 'hot'
+    video.tier_changed_at = timezone.now()
+    video.save(update_fields=['storage_tier', 'tier_changed_at'])
+    return hot_path
+
+
+def open_original(video):
+    """Open a video's original for reading from whichever tier holds it, without rehydrating"""
+    if video.storage_tier == 'cold':
+        return get_cold_storage().open(video.file_path.name)
+    return open(video.file_path.path, 'rb')
+
+
+def delete_cold_copy(video):
+    """Remove a video's archived original, if any"""
+    if video.file_path:
+        get_cold_storage().delete(video.file_path.name)
+
+
+def archive_candidates(older_than_days=None):
+    """Videos whose hot originals are old enough to move to the cold tier"""
+    from .models import VideoFile
+
+    days = settings.MEDIA_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    return (
+        VideoFile.objects
+        .filter(storage_tier='hot', uploaded_at__lt=cutoff)
+        # Never pull an original out from under a job that still needs it
+        .filter(processing_status__in=['completed', 'failed'])
+        .filter(Q(tier_changed_at__isnull=True) | Q(tier_changed_at__lt=cutoff))
+        .exclude(file_path='')
+    )
@@ -1,15 +1,179 @@
 # trapickapp/tasks.py
 import os
+import threading
+from datetime import timedelta
 from celery import shared_task
 from django.conf import settings
+from django.db import connections
 from django.utils import timezone
-from .models import VideoFile, TrafficAnalysis, Location, LocationDateGroup
+from .models import VideoFile, TrafficAnalysis, Location, LocationDateGroup, ProcessingProfile, UploadSession, DataVersion
+from .detectors import FALLBACK_DETECTOR, checkout, get_detector
+from .live_stats import analyze_with_live_stats
+from .notifications import publish
 from .progress import ProgressTracker
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def dispatch_task(task, *args, **kwargs):
+    """
+    Queue a task on Celery, or run it on a daemon thread when no broker is
+    configured (CELERY_TASK_ALWAYS_EAGER), so requests never block on it.
+    """
+    if not getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        return task.delay(*args, **kwargs)
+
+    def run():
+        try:
+            task(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"❌ Background task {task.name} failed: {e}")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name=f'task-{task.name}', daemon=True)
+    thread.start()
+    return None
+
+
+@shared_task
+def process_uploaded_video(video_id, location_id=None):
+    """
+    Run the location's detector over an uploaded video and store the TrafficAnalysis
+    """
+    try:
+        video = VideoFile.objects.get(id=video_id)
+    except VideoFile.DoesNotExist:
+        return {'status': 'error', 'error': 'Video not found'}
+
+    location = Location.objects.filter(id=location_id).select_related('processing_profile').first() if location_id else None
+
+    profile = location.processing_profile if location else ProcessingProfile(
+        name='default', detector_module=FALLBACK_DETECTOR[0], detector_class=FALLBACK_DETECTOR[1]
+    )
+    try:
+        # Loads the model now, so a missing ML stack is caught before the video is touched
+        get_detector(profile)
+    except ImportError as e:
+        # View-only deployments ship without the ML stack; leave the video pending
+        logger.warning(f"⚠️ ML module not available, video {video_id} left pending: {e}")
+        return {'status': 'skipped', 'reason': 'ML module not available'}
+
+    tracker = ProgressTracker(video_id)
+    video.processing_status = 'processing'
+    video.save(update_fields=['processing_status'])
+
+    try:
+        tracker.set_progress(0, 'Starting analysis')
+        with checkout(profile) as detector:
+            report = analyze_with_live_stats(detector, video.get_original_path(), video_id)
+
+        analysis = TrafficAnalysis.objects.create(
+            video_file=video,
+            location=location,
+            total_vehicles=report['summary']['total_vehicles_counted'],
+            processing_time_seconds=report['metadata']['processing_time'],
+            analyzed_at=timezone.now(),
+            car_count=report['summary']['vehicle_breakdown'].get('car', 0),
+            truck_count=report['summary']['vehicle_breakdown'].get('truck', 0),
+            motorcycle_count=report['summary']['vehicle_breakdown'].get('motorcycle', 0),
+            bus_count=report['summary']['vehicle_breakdown'].get('bus', 0),
+            bicycle_count=report['summary']['vehicle_breakdown'].get('bicycle', 0),
+            peak_traffic=report['summary']['peak_traffic'],
+            average_traffic=report['summary']['average_traffic_density'],
+            congestion_level=report['metrics']['congestion_level'],
+            traffic_pattern=report['metrics']['traffic_pattern'],
+            analysis_data=report
+        )
+
+        tracker.set_progress(100, 'Analysis complete')
+        tracker.complete_processing()
+        logger.info(f"✅ Processed uploaded video {video_id}: {analysis.total_vehicles} vehicles")
+        return {'status': 'completed', 'analysis_id': str(analysis.id)}
+
+    except Exception as e:
+        logger.error(f"❌ Processing failed for uploaded video {video_id}: {e}")
+        tracker.flush()
+        VideoFile.objects.filter(id=video_id).update(processing_status='failed')
+        # update() skips the model signals that announce status changes and move the ETags on
+        group_location_id = LocationDateGroup.objects.filter(
+            pk=video.location_date_group_id
+        ).values_list('location_id', flat=True).first() if video.location_date_group_id else None
+        location_ids = list(dict.fromkeys(str(value) for value in (location_id, group_location_id) if value))
+        DataVersion.bump(DataVersion.GLOBAL, *(DataVersion.location_key(value) for value in location_ids))
+        publish('video_status', video_id, video.location_date_group_id,
+                location_ids=location_ids, status='failed')
+        return {'status': 'error', 'error': str(e)}
+
+
+@shared_task
+def archive_old_originals(older_than_days=None, limit=None):
+    """
+    Move originals older than MEDIA_ARCHIVE_AFTER_DAYS to the cold storage tier
+    """
+    from .storage_tiers import archive_candidates, archive_original
+
+    candidates = archive_candidates(older_than_days)
+    if limit:
+        candidates = candidates[:limit]
+
+    archived = 0
+    freed_bytes = 0
+    errors = 0
+    for video in candidates.iterator(chunk_size=200):
+        try:
+            freed = archive_original(video)
+            if freed:
+                archived += 1
+                freed_bytes += freed
+        except Exception as e:
+            errors += 1
+            logger.error(f"❌ Failed to archive original of video {video.id}: {e}")
+
+    logger.info(f"🧊 Archived {archived} originals, freed {freed_bytes} bytes ({errors} errors)")
+    return {'archived': archived, 'freed_bytes': freed_bytes, 'errors': errors}
+
+
+@shared_task
+def render_analysis_report(analysis_id, file_format):
+    """
+    Render and cache the PDF/Excel report of an analysis ahead of download
+    """
+    from .reports import get_or_render_report, release_report_render
+
+    try:
+        analysis = TrafficAnalysis.objects.select_related('video_file', 'location').get(id=analysis_id)
+    except TrafficAnalysis.DoesNotExist:
+        return {'status': 'error', 'error': 'Analysis not found'}
+
+    try:
+        report, cached = get_or_render_report(analysis, file_format)
+    finally:
+        release_report_render(analysis, file_format)
+    return {'status': 'ready', 'report_id': str(report.id), 'cached': cached}
+
+
+@shared_task
+def cleanup_stale_uploads(max_age_hours=None):
+    """
+    Abort upload sessions that have not received a chunk for a while and
+    delete their partial files
+    """
+    from .uploads import abort_upload
+
+    max_age_hours = max_age_hours or settings.UPLOAD_SESSION_MAX_AGE_HOURS
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale_sessions = UploadSession.objects.filter(status='active', updated_at__lt=cutoff)
+
+    aborted = 0
+    for session in stale_sessions.iterator():
+        abort_upload(session)
+        aborted += 1
+
+    logger.info(f"🧹 Aborted {aborted} stale upload sessions")
+    return {'aborted': aborted}
+
 
 @shared_task
 def bulk_group_videos():
@@ -81,4 +245,28 @@ def verify_video_grouping(video_id):
             
     except Exception as e:
         logger.error(f"❌ Verify grouping failed for {video_id}: {e}")
-        return {'status': 'error', 'error': str(e)}
\ No newline at end of file
+        return {'status': 'error', 'error': str(e)}
+
+@shared_task
+def run_scheduled_exports(job_names=None, force=False):
+    """
+    Run the delta export jobs that are due; scheduled by celery beat
+    """
+    from .delta_exports import run_scheduled_jobs
+
+    summaries = run_scheduled_jobs(job_names=job_names, force=force)
+    for summary in summaries:
+        rows = sum(result.get('rows', 0) for result in summary['datasets'].values())
+        logger.info(f"📤 Delta export {summary['job']}: {rows} rows up to {summary['until']}")
+    return summaries
+
+
+@shared_task
+def refresh_dashboard_snapshot(name):
+    """
+    Rebuild a stale-while-revalidate dashboard snapshot (see snapshots.py)
+    """
+    from .snapshots import refresh_snapshot
+
+    snapshot = refresh_snapshot(name)
+    return {'name': name, 'built_at': snapshot['built_at'], 'version': snapshot['version']}
@@ -0,0 +1,400 @@
+# trapickapp/uploads.py
+"""
+Resumable chunked video uploads.
+
+Protocol (tus-style, over the UploadSession API):
+
+1. ``POST   /api/uploads/``            create a session with filename + size
+2. ``HEAD   /api/uploads/<id>/``       ask for the current ``Upload-Offset``
+3. ``PATCH  /api/uploads/<id>/``       send the next chunk as the raw body with
+                                      ``Upload-Offset`` and optional
+                                      ``Upload-Checksum: sha256 <base64>``
+4. When the offset reaches the declared size the partial file is moved into
+   ``videos/``, a VideoFile is created and processing is queued. If a video
+   with the same SHA-256 already exists the upload is discarded and linked
+   to that video instead, which is processed again unless its analysis
+   completed.
+
+Chunks are copied from the request stream straight to the partial file in
+small blocks, so a multi-GB upload never sits in memory and a dropped
+connection only loses the chunk in flight. Writes to one session are
+serialized by an exclusive lock on its partial file; a request that finds
+the lock taken gets 409 and re-checks the offset.
+"""
+import base64
+import hashlib
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a per-process lock
+    fcntl = None
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import TrafficAnalysis, UploadSession, VideoFile
+
+logger = logging.getLogger(__name__)
+
+# Block size used when copying the request body to disk
+COPY_BLOCK_SIZE = 1024 * 1024
+
+SUPPORTED_CHECKSUM_ALGORITHMS = {
+    'sha256': hashlib.sha256,
+    'sha1': hashlib.sha1,
+    'md5': hashlib.md5,
+}
+
+# Running SHA-256 of each session's file, fed as chunks arrive in order.
+# hashlib state cannot be persisted, so when chunks land on different
+# workers (or after a restart) finalize_upload re-hashes from disk instead.
+_running_hashes = {}
+_running_hashes_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Raised when a chunk cannot be accepted; carries the HTTP status to return"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+# Per-process session locks, only used where fcntl is unavailable
+_session_locks = {}
+_session_locks_lock = threading.Lock()
+
+
+def _absolute_temp_path(session):
+    return os.path.join(settings.MEDIA_ROOT, session.temp_path)
+
+
+@contextmanager
+def _locked_session(session):
+    """
+    Hold the session's exclusive lock and refresh its offset and status.
+
+    The lock is taken on the partial file, so it also holds across worker
+    processes; it is never waited for, a busy session raises UploadError.
+    """
+    busy = UploadError('Another request is writing to this upload. Re-check the offset.', status_code=409)
+    if fcntl is None:
+        with _session_locks_lock:
+            lock = _session_locks.setdefault(session.id, threading.Lock())
+        if not lock.acquire(blocking=False):
+            raise busy
+        try:
+            session.refresh_from_db(fields=['offset', 'status'])
+            yield
+        finally:
+            lock.release()
+        return
+
+    try:
+        f = open(_absolute_temp_path(session), 'r+b')
+    except FileNotFoundError:
+        session.refresh_from_db(fields=['offset', 'status'])
+        if session.status != 'active':
+            raise UploadError(f'Upload session is {session.status}.', status_code=409)
+        raise UploadError('Partial upload file is missing.', status_code=410)
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise busy
+        session.refresh_from_db(fields=['offset', 'status'])
+        yield
+
+
+def hash_stream(fileobj, block_size=COPY_BLOCK_SIZE):
+    """Return the hex SHA-256 of a readable binary file object, read in blocks"""
+    hasher = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(block_size), b''):
+        hasher.update(block)
+    return hasher.hexdigest()
+
+
+def hash_file(file_path, block_size=COPY_BLOCK_SIZE):
+    """Return the hex SHA-256 of a file, read in blocks"""
+    with open(file_path, 'rb') as f:
+        return hash_stream(f, block_size)
+
+
+def _pop_running_hash(session):
+    """Return the hex digest if the in-process hash covers the whole file"""
+    with _running_hashes_lock:
+        entry = _running_hashes.pop(session.id, None)
+    if entry and entry[0] == session.total_size:
+        return entry[1].hexdigest()
+    return None
+
+
+def parse_checksum_header(header):
+    """
+    Parse an ``Upload-Checksum: <algorithm> <base64 digest>`` header.
+
+    Returns ``(algorithm, digest_bytes)`` or ``None`` if no header was sent.
+    """
+    if not header:
+        return None
+    try:
+        algorithm, encoded = header.strip().split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise UploadError('Malformed Upload-Checksum header. Use "<algorithm> <base64 digest>".')
+
+    algorithm = algorithm.lower()
+    if algorithm not in SUPPORTED_CHECKSUM_ALGORITHMS:
+        raise UploadError(
+            f'Unsupported checksum algorithm "{algorithm}". '
+            f'Supported: {", ".join(sorted(SUPPORTED_CHECKSUM_ALGORITHMS))}'
+        )
+    return algorithm, digest
+
+
+def create_upload_session(filename, total_size, metadata=None, user=None):
+    """Create an UploadSession and its empty partial file"""
+    if total_size <= 0:
+        raise UploadError('Upload size must be greater than zero.')
+    if total_size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'Upload exceeds maximum size of {settings.UPLOAD_MAX_SIZE} bytes.', status_code=413)
+
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+
+    session = UploadSession(
+        filename=os.path.basename(filename),
+        total_size=total_size,
+        metadata=metadata or {},
+        uploaded_by=user if user is not None and user.is_authenticated else None,
+    )
+    temp_abs = os.path.join(settings.UPLOAD_TEMP_DIR, f'{session.id}.part')
+    session.temp_path = os.path.relpath(temp_abs, settings.MEDIA_ROOT)
+
+    # Create the file up front so chunks can always be written with r+b
+    open(temp_abs, 'wb').close()
+    session.save()
+
+    logger.info(f"📤 Upload session {session.id} created for {session.filename} ({total_size} bytes)")
+    return session
+
+
+def write_chunk(session, stream, offset, content_length, checksum=None):
+    """
+    Append one chunk from ``stream`` to the session's partial file.
+
+    ``offset`` must match the bytes already stored. The chunk is only
+    committed (the session offset advanced) after it is fully on disk and
+    the optional checksum matches; otherwise the partial file is truncated
+    back so the client can retry the same chunk.
+    """
+    with _locked_session(session):
+        return _write_chunk(session, stream, offset, content_length, checksum)
+
+
+def _write_chunk(session, stream, offset, content_length, checksum):
+    if session.status != 'active':
+        raise UploadError(f'Upload session is {session.status}.', status_code=409)
+    if offset != session.offset:
+        raise UploadError(
+            f'Upload-Offset {offset} does not match current offset {session.offset}.',
+            status_code=409
+        )
+    if content_length is None:
+        raise UploadError('Content-Length header is required.', status_code=411)
+    if offset + content_length > session.total_size:
+        raise UploadError('Chunk extends past the declared upload size.', status_code=413)
+
+    hasher = SUPPORTED_CHECKSUM_ALGORITHMS[checksum[0]]() if checksum else None
+    temp_abs = _absolute_temp_path(session)
+
+    with _running_hashes_lock:
+        running = _running_hashes.get(session.id)
+    if running is None and offset == 0:
+        running = (0, hashlib.sha256())
+    if running is not None and running[0] != offset:
+        running = None
+    content_hasher = running[1].copy() if running else None
+
+    written = 0
+    try:
+        with open(temp_abs, 'r+b') as f:
+            f.seek(offset)
+            while written < content_length:
+                block = stream.read(min(COPY_BLOCK_SIZE, content_length - written))
+                if not block:
+                    break
+                f.write(block)
+                if hasher:
+                    hasher.update(block)
+                if content_hasher:
+                    content_hasher.update(block)
+                written += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if written != content_length:
+            raise UploadError(
+                f'Connection closed after {written} of {content_length} bytes.',
+                status_code=400
+            )
+        if hasher and hasher.digest() != checksum[1]:
+            raise UploadError('Chunk checksum mismatch.', status_code=460)
+    except Exception:
+        # Drop whatever part of this chunk reached the disk
+        with open(temp_abs, 'r+b') as f:
+            f.truncate(offset)
+        raise
+
+    # Only advance if nobody else moved the offset meanwhile (e.g. an abort)
+    updated = UploadSession.objects.filter(
+        id=session.id, offset=offset, status='active'
+    ).update(offset=offset + written, updated_at=timezone.now())
+    if not updated:
+        raise UploadError('Upload session was modified concurrently. Re-check the offset.', status_code=409)
+
+    session.offset = offset + written
+    with _running_hashes_lock:
+        if content_hasher:
+            _running_hashes[session.id] = (session.offset, content_hasher)
+        else:
+            _running_hashes.pop(session.id, None)
+    return written
+
+
+def _available_video_name(filename):
+    """
+    Pick a free name under videos/. Archived originals no longer exist in
+    MEDIA_ROOT but still own their name, so the database is checked too.
+    """
+    root, ext = os.path.splitext(filename)
+    name = os.path.join('videos', filename)
+    while default_storage.exists(name) or VideoFile.objects.filter(file_path=name).exists():
+        name = os.path.join('videos', default_storage.get_alternative_name(root, ext))
+    return name
+
+
+def _link_duplicate(session, existing, temp_abs):
+    """
+    Discard an upload whose content is already stored and point it at the
+    existing video. Its analysis is only reused when processing completed;
+    otherwise (pending, failed, or completed without an analysis) the
+    existing video is queued for processing again.
+    """
+    from .tasks import dispatch_task, process_uploaded_video
+
+    if os.path.exists(temp_abs):
+        os.remove(temp_abs)
+
+    reusable = (
+        existing.processing_status == 'completed'
+        and TrafficAnalysis.objects.filter(video_file=existing).exists()
+    )
+    with transaction.atomic():
+        session.video_file = existing
+        session.status = 'completed'
+        session.save(update_fields=['video_file', 'status', 'updated_at'])
+
+        if not reusable and existing.processing_status != 'processing':
+            existing.processing_status = 'pending'
+            existing.save(update_fields=['processing_status'])
+            location_id = (session.metadata or {}).get('location_id')
+            transaction.on_commit(
+                lambda: dispatch_task(process_uploaded_video, str(existing.id), location_id)
+            )
+
+    if reusable:
+        logger.info(f"♻️ Upload {session.id} duplicates video {existing.id}, skipped storage and processing")
+    else:
+        logger.info(f"♻️ Upload {session.id} duplicates unfinished video {existing.id}, skipped storage")
+    return existing, True
+
+
+def finalize_upload(session):
+    """
+    Move a complete partial file into place and create its VideoFile.
+
+    Returns ``(video_file, duplicate)``. When the content hash matches an
+    existing video, the partial file is dropped and that video is returned
+    with ``duplicate=True``, so a completed analysis is reused rather than
+    recomputed (see _link_duplicate for unfinished ones).
+    Processing is queued after the transaction commits so the worker always
+    sees the new row.
+    """
+    with _locked_session(session):
+        return _finalize_upload(session)
+
+
+def _finalize_upload(session):
+    from .tasks import dispatch_task, process_uploaded_video
+
+    if session.status != 'active':
+        raise UploadError(f'Upload session is {session.status}.', status_code=409)
+    if not session.is_complete:
+        raise UploadError('Upload is not complete yet.', status_code=409)
+
+    temp_abs = _absolute_temp_path(session)
+    if not os.path.exists(temp_abs):
+        raise UploadError('Partial upload file is missing.', status_code=410)
+    if os.path.getsize(temp_abs) != session.total_size:
+        raise UploadError('Assembled file size does not match the declared size.', status_code=500)
+
+    content_hash = _pop_running_hash(session) or hash_file(temp_abs)
+    existing = VideoFile.objects.filter(content_hash=content_hash).first()
+    if existing:
+        return _link_duplicate(session, existing, temp_abs)
+
+    relative_path = _available_video_name(get_valid_filename(session.filename) or f'{session.id}.mp4')
+    final_abs = os.path.join(settings.MEDIA_ROOT, relative_path)
+    os.makedirs(os.path.dirname(final_abs), exist_ok=True)
+    os.replace(temp_abs, final_abs)
+
+    metadata = session.metadata or {}
+    try:
+        with transaction.atomic():
+            video_obj = VideoFile.objects.create(
+                filename=session.filename,
+                file_path=relative_path,
+                uploaded_by=session.uploaded_by,
+                title=metadata.get('title') or None,
+                video_date=metadata.get('video_date') or None,
+                video_start_time=metadata.get('video_start_time') or None,
+                video_end_time=metadata.get('video_end_time') or None,
+                processing_status='pending',
+                content_hash=content_hash,
+            )
+            session.video_file = video_obj
+            session.status = 'completed'
+            session.save(update_fields=['video_file', 'status', 'updated_at'])
+
+            location_id = metadata.get('location_id')
+            transaction.on_commit(
+                lambda: dispatch_task(process_uploaded_video, str(video_obj.id), location_id)
+            )
+    except IntegrityError:
+        # Same file finished uploading concurrently; keep the first one
+        existing = VideoFile.objects.filter(content_hash=content_hash).first()
+        if existing is None:
+            raise
+        return _link_duplicate(session, existing, final_abs)
+
+    logger.info(f"✅ Upload {session.id} assembled into {relative_path} (video {video_obj.id})")
+    return video_obj, False
+
+
+def abort_upload(session):
+    """Mark a session aborted and delete its partial file"""
+    with _running_hashes_lock:
+        _running_hashes.pop(session.id, None)
+    temp_abs = _absolute_temp_path(session)
+    if os.path.exists(temp_abs):
+        os.remove(temp_abs)
+    session.status = 'aborted'
+    session.save(update_fields=['status', 'updated_at'])
@@ -1,16 +1,20 @@
 # trapickapp/urls.py
 from django.urls import path, re_path
-from . import api_views
+from . import api_views, async_views
 
 urlpatterns = [
     # ==================== VIDEO PROCESSING ENDPOINTS ====================
     #path('api/upload/video/', api_views.VideoUploadAPI.as_view(), name='upload_video'),
+    path('api/uploads/', api_views.UploadSessionListAPI.as_view(), name='upload_session_list'),
+    path('api/uploads/<uuid:upload_id>/', api_views.UploadSessionDetailAPI.as_view(), name='upload_session_detail'),
     path('api/analysis/<uuid:upload_id>/', api_views.AnalysisResultsAPI.as_view(), name='analysis_results'),
 
     # ==================== VIDEO FILE SERVING ====================
     path('api/video/<uuid:video_id>/view/', api_views.ProcessedVideoViewAPI.as_view(), name='view_processed_video'),
     path('api/video/<uuid:video_id>/download/', api_views.ProcessedVideoDownloadAPI.as_view(), name='download_processed_video'),
     path('api/video/<uuid:video_id>/direct/', api_views.ProcessedVideoDirectAPI.as_view(), name='direct_processed_video'),
+    path('api/video/<uuid:video_id>/stream/', async_views.stream_processed_video, name='stream_processed_video'),
+    path('api/video/<uuid:video_id>/stream/download/', async_views.stream_processed_video_download, name='stream_processed_video_download'),
 
     # ==================== VIDEO MANAGEMENT ====================
     path('api/videos/', api_views.VideoListAPI.as_view(), name='video_list'),
@@ -50,6 +54,12 @@ urlpatterns = [
     path('api/export/<uuid:video_id>/csv/', api_views.ExportAnalysisCSVAPI.as_view(), name='export_csv'),
     path('api/export/<uuid:video_id>/pdf/', api_views.ExportAnalysisPDFAPI.as_view(), name='export_pdf'),
     path('api/export/<uuid:video_id>/excel/', api_views.ExportAnalysisExcelAPI.as_view(), name='export_excel'),
+    path('api/export/raw/<str:dataset>/csv/', api_views.RawDataExportCSVAPI.as_view(), name='export_raw_csv'),
+    path('api/export/raw/<str:dataset>/<str:export_format>/', api_views.ColumnarExportAPI.as_view(), name='export_raw_columnar'),
+    path('api/groups/<uuid:group_id>/report/<str:report_format>/', api_views.ConsolidatedReportAPI.as_view(), name='group_report'),
+    path('api/locations/<int:location_id>/report/<str:report_format>/', api_views.ConsolidatedReportAPI.as_view(), name='location_report'),
+    path('api/charts/<str:chart>/<str:chart_format>/', api_views.ChartImageAPI.as_view(), name='chart_image'),
+    path('api/series/<str:series>/', api_views.ChartSeriesAPI.as_view(), name='chart_series'),
 
     # ==================== PREDICTION ENDPOINTS ====================
     path('api/predictions/generate/', api_views.GeneratePredictionsAPI.as_view(), name='generate_predictions'),
@@ -61,6 +71,7 @@ urlpatterns = [
     path('api/health/', api_views.HealthCheckAPI.as_view(), name='health_check'),
     path('api/debug/data/', api_views.DebugDataAPI.as_view(), name='debug_data'),
     path('api/debug/urls/', api_views.DebugURLsAPI.as_view(), name='debug_urls'),
+    path('api/debug/metrics/', api_views.DebugMetricsAPI.as_view(), name='debug_metrics'),
     path('api/groups/<uuid:group_id>/videos/simple/', 
      api_views.SimpleGroupVideosAPI.as_view(), 
      name='simple_group_videos'),